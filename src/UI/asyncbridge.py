@@ -0,0 +1,76 @@
+import asyncio, concurrent.futures, logging, threading, typing
+
+from PyQt5.QtCore import pyqtSignal, QObject
+
+logger = logging.getLogger(__name__)
+
+class AsyncRunner(QObject):
+    '''
+    Runs coroutines (ProjectInformation.execute_async, for instance) on a single
+    asyncio event loop that lives beside the Qt event loop, and reports each
+    result back to the GUI thread through Qt signals.
+
+    Every build shares the one loop thread; it sleeps in the loop's selector
+    until a process produces output or exits, so nothing polls.
+    '''
+    finished = pyqtSignal(object, object) #(tag, result)
+    failed = pyqtSignal(object, str) #(tag, error)
+
+    _instance = None
+
+    def __init__(self, parent=None):
+        super(AsyncRunner, self).__init__(parent)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="cppbuilder-asyncio", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def instance() -> "AsyncRunner":
+        if AsyncRunner._instance is None:
+            AsyncRunner._instance = AsyncRunner()
+        return AsyncRunner._instance
+
+    @staticmethod
+    def shutdown_instance() -> None:
+        '''
+        Shuts the shared runner down, if one was started.
+        '''
+        if AsyncRunner._instance is not None:
+            AsyncRunner._instance.shutdown()
+            AsyncRunner._instance = None
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+        self._loop.close()
+
+    def submit(self, coroutine: typing.Coroutine, tag: typing.Any=None) -> concurrent.futures.Future:
+        '''
+        Schedules coroutine on the loop.  When it completes, finished(tag, result)
+        or failed(tag, error) is emitted; Qt queues the signal into the GUI thread.
+        The returned future can be used to cancel it.
+        '''
+        future = asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+        future.add_done_callback(lambda f: self._done(tag, f))
+        return future
+
+    def _done(self, tag: typing.Any, future: concurrent.futures.Future) -> None:
+        if future.cancelled():
+            self.failed.emit(tag, "cancelled")
+        elif future.exception() is not None:
+            logger.error(f"Asynchronous task {tag!r} failed: {future.exception()!r}")
+            self.failed.emit(tag, repr(future.exception()))
+        else:
+            self.finished.emit(tag, future.result())
+
+    def shutdown(self) -> None:
+        '''
+        Cancels everything still running and stops the loop thread.
+        '''
+        def cancel_all() -> None:
+            for task in asyncio.all_tasks(self._loop):
+                task.cancel()
+            self._loop.call_soon(self._loop.stop)
+        if self._thread.is_alive():
+            self._loop.call_soon_threadsafe(cancel_all)
+            self._thread.join(timeout=5)
@@ -2,7 +2,8 @@ import logging
 
 from PyQt5.QtWidgets import QMainWindow
 from PyQt5.Qt import * # noqa: F403
-from UI.widgets import ProjectSelectionMenu
+from UI.asyncbridge import AsyncRunner
+from UI.widgets import MainBuildMenu, ProjectSelectionMenu
 from UI.stdredirect import OutputWindow
 
 from globaldata import CONFIG
@@ -18,12 +19,20 @@ class MainWindow(QMainWindow):
 
         #an aditional output window can be enabled by simply uncommenting the following line:
         #self._init_outputwindow()
-        self.setCentralWidget(ProjectSelectionMenu(self))
+        selection = ProjectSelectionMenu(self)
+        selection.projectOpened.connect(self.openProject)
+        self.setCentralWidget(selection)
         self.show()
+
+    @pyqtSlot(object) # noqa: F405
+    def openProject(self, project) -> None:
+        logger.debug(self.openProject.__qualname__ + ": " + repr(project))
+        self.setCentralWidget(MainBuildMenu(self, project))
     
     def closeEvent(self, event) -> None:
         logger.debug(MainWindow.closeEvent.__qualname__ + ": Triggered")
         self._close_outputwindow()
+        AsyncRunner.shutdown_instance()
         CONFIG.save()
     
     def _init_outputwindow(self) -> None:
@@ -1,7 +1,7 @@
-import logging, sys, re
+import logging, sys, threading
 
 from PyQt5.QtWidgets import QVBoxLayout, QPlainTextEdit, QWidget
-from PyQt5.QtCore import pyqtSignal, QObject, pyqtSlot
+from PyQt5.QtCore import pyqtSignal, QObject, pyqtSlot, QTimer, Qt
 
 logger = logging.getLogger(__name__)
 
@@ -46,11 +46,16 @@ class STDOutWidget(QWidget):
     it tracks its instances in order to self-manage.
     When the last instance is deleted the stdout and stderr streams are reset to the
     original objects.
+
+    Only the last maxlines lines are kept; older lines are dropped as new ones
+    arrive, so a long build can not grow the widget without bound.
     '''
     _instance_count = 0
+    default_maxlines = 10000
 
-    def __init__(self, parent):
+    def __init__(self, parent, maxlines: int=0):
         super(STDOutWidget, self).__init__(parent)
+        self.maxlines = maxlines if maxlines > 0 else STDOutWidget.default_maxlines
         self._init_layout()
         self._connect_handlers()
         STDOutWidget._instance_count += 1
@@ -66,6 +71,8 @@ class STDOutWidget(QWidget):
 
         #set up the output box configuration
         self.output_box.setReadOnly(True)
+        self.output_box.setUndoRedoEnabled(False)
+        self.output_box.setMaximumBlockCount(self.maxlines) #drops the oldest lines past the limit
         self.output_box.setBackgroundVisible(False)
         self.output_box.setStyleSheet(r"QPlainTextEdit {color: white; " + 
             r"background-color: black; font-family: consolas, monospace; font-size: 11pt;}")
@@ -80,6 +87,9 @@ class STDOutWidget(QWidget):
     
     @pyqtSlot(str)
     def write_message(self, message: str="") -> None:
+        '''
+        Appends a batch of one or more lines.
+        '''
         self.output_box.appendPlainText(message)
 
 class UIStream(QObject):
@@ -92,54 +102,109 @@ class UIStream(QObject):
         if you tear your arm off with a tree pruner because you don't
         know what you're doing: you know who to blame.
         Also you deserve it.
+
+    Writes are not sent to the UI one at a time.  They are buffered and sent as
+    a single messageWritten signal every flush_interval milliseconds, or as soon
+    as flush_threshold characters are waiting.  write() may be called from any thread;
+    flushes always happen on the thread this object belongs to, so batches arrive
+    in the order they were written.  If the GUI thread falls behind and more than
+    buffer_limit characters pile up, the oldest lines are dropped and a marker
+    line says how much was lost.
     '''
     _streamsdifferent = False
     _stdout = None
     _stderr = None
-    messageWritten = pyqtSignal(str)
+    messageWritten = pyqtSignal(str) #one or more lines, without the trailing newline
+    _flushRequested = pyqtSignal()
+    _flushNowRequested = pyqtSignal()
+
+    flush_interval = 50 #milliseconds
+    flush_threshold = 2**16 #characters
+    buffer_limit = 2**22 #characters held while the GUI thread catches up
 
     def __init__(self, original_stream=None, set_back=None):
         super(UIStream, self).__init__(None)
         self.original = original_stream
         self._set_back = set_back
+        self._buffer = []
+        self._buffered = 0
+        self._dropped = 0 #characters
+        self._flush_pending = False
+        self._flush_now_pending = False
+        self._lock = threading.Lock()
+        self._flushRequested.connect(self._startFlushTimer, Qt.QueuedConnection)
+        self._flushNowRequested.connect(self.flush_ui, Qt.QueuedConnection)
 
     def flush(self):
-        pass
+        #the UI is flushed on its own schedule; logging flushes after every record.
+        self.original.flush()
     
     def fileno(self):
         return -1
     
     def write(self, msg):
-        if(not self.signalsBlocked()):
-            if msg != "\n":
-                self.messageWritten.emit(self.uiformatted(msg))
-            self.original.write(msg)
-
-    def uiformatted(self, message: str="") -> str:
+        if self.signalsBlocked():
+            return
+        self.original.write(msg)
+        with self._lock:
+            self._buffer.append(msg)
+            self._buffered += len(msg)
+            if self._buffered > UIStream.buffer_limit:
+                self._drop_oldest()
+            full = (self._buffered >= UIStream.flush_threshold)
+            flushnow = full and not self._flush_now_pending
+            if flushnow:
+                self._flush_now_pending = True
+            schedule = not (full or self._flush_pending)
+            if schedule:
+                self._flush_pending = True
+        if flushnow:
+            self._flushNowRequested.emit()
+        elif schedule:
+            self._flushRequested.emit()
+
+    def _drop_oldest(self) -> None:
+        #down to half the limit, so a lagging GUI thread does not make every write pay for this
+        text = "".join(self._buffer)
+        cut = len(text) - UIStream.buffer_limit // 2
+        newline = text.find("\n", cut)
+        cut = newline + 1 if newline >= 0 else cut
+        self._dropped += cut
+        self._buffer = [text[cut:]]
+        self._buffered = len(text) - cut
+
+    @pyqtSlot()
+    def _startFlushTimer(self) -> None:
+        QTimer.singleShot(UIStream.flush_interval, self.flush_ui)
+
+    @pyqtSlot()
+    def flush_ui(self) -> None:
         '''
-        Some messages look goofy (added newlines, whatever).
-        We have to try to grab them and make them not fucked up.
+        Sends everything buffered so far to the UI as one message.
         '''
-        chars = [
-            ("\n", "\\n"), 
-            ("\r", "\\r")]
-        if self.islogmessage(message):
-            for c in chars:
-                message = message.replace(c[0], "")
-        return message
+        with self._lock:
+            text = "".join(self._buffer)
+            if self._dropped > 0:
+                text = f"[{self._dropped} characters of output dropped]\n" + text
+            self._buffer.clear()
+            self._buffered = 0
+            self._dropped = 0
+            self._flush_pending = False
+            self._flush_now_pending = False
+        text = self.uiformatted(text)
+        if len(text) > 0:
+            self.messageWritten.emit(text)
 
-    def islogmessage(self, message="") -> bool:
+    def uiformatted(self, message: str="") -> str:
         '''
-        Matches a log message specific to my personal formatting.
-        If you don't use my formatting, you're wrong.  :D
-
-        But in all seriousness, log messages were getting an extra newline appended in the UI, so
-        it became necessary to intercept and strip those newlines.  This is 
-        the resulting solution.
+        The widget adds a newline of its own after every message, so the one
+        that ends the batch is removed.  Carriage returns are dropped too.
         '''
-        if not hasattr(self, "logregex"):
-            self.logregex = re.compile(r"(\d{4}\-\d{2}\-\d{2} \d{2}:\d{2}:\d{2},\d{1,3} \[[A-Za-z0-9_\.]+\] \[[A-Za-z]+\] \->)")
-        return (self.logregex.match(message) is not None)
+        if "\r" in message:
+            message = message.replace("\r", "")
+        if message.endswith("\n"):
+            message = message[:-1]
+        return message
 
     @staticmethod
     def _setbackstdout(ob):
@@ -1,12 +1,17 @@
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton
-from PyQt5.QtWidgets import QFileDialog
-from PyQt5.QtCore import pyqtSlot, Qt, pyqtSignal
+from PyQt5.QtWidgets import QFileDialog, QTreeWidget, QTreeWidgetItem, QListWidget, QListWidgetItem
+from PyQt5.QtCore import pyqtSlot, Qt, pyqtSignal, QTimer
 
 import logging, os
 
+from UI.asyncbridge import AsyncRunner
 from UI.stdredirect import STDOutWidget
-from data import Configuration
+from data import Configuration, ProjectInformation
+from diagnostics import DiagnosticIndex, Severity
 from globaldata import CONFIG
+from outputpipe import StreamConsumer
+from registry import ProjectRegistry
+import quithread
 
 logger = logging.getLogger(__name__)
 
@@ -30,10 +35,24 @@ class HandyBaseWidget(QWidget):
         return l
 
 class ProjectSelectionMenu(HandyBaseWidget):
-    def __init__(self, parent):
+    '''
+    Lists the registered projects, most recently used first, filtered by what is
+    typed into the path box.  Results are loaded a page at a time as the list is
+    scrolled.
+    '''
+    projectOpened = pyqtSignal(object) #ProjectInformation
+
+    PAGE_SIZE: int = 50
+
+    def __init__(self, parent, registry: ProjectRegistry=None):
         super(ProjectSelectionMenu, self).__init__(parent)
+        self.registry = registry if registry is not None else ProjectRegistry(config=CONFIG)
+        self._query = ""
+        self._loaded = 0
+        self._exhausted = False
         self._layout()
         self._handlers()
+        self._search("")
     
     def _layout(self):
         mainlayout = QVBoxLayout()
@@ -41,14 +60,21 @@ class ProjectSelectionMenu(HandyBaseWidget):
         self.pathTextBox = QLineEdit()
         self.pathTextBox.setPlaceholderText("The Path to your Project")
         self.submitbutton = QPushButton("Select Folder")
+        self.importbutton = QPushButton("Import Projects")
+        self.projectList = QListWidget()
 
-        mainlayout.addLayout(self.hLayout([self.pathTextBox, self.submitbutton]))
+        mainlayout.addLayout(self.hLayout([self.pathTextBox, self.submitbutton, self.importbutton]))
+        mainlayout.addWidget(self.projectList)
         self.setLayout(mainlayout)
 
     def _handlers(self):
         self.pathTextBox.textEdited.connect(self._updateButtonText)
+        self.pathTextBox.textEdited.connect(self._search)
         self.submitbutton.clicked.connect(self._submitButtonClicked)
+        self.importbutton.clicked.connect(self._importButtonClicked)
         self.pathTextBox.returnPressed.connect(self._submitButtonClicked)
+        self.projectList.itemActivated.connect(self._projectActivated)
+        self.projectList.verticalScrollBar().valueChanged.connect(self._scrolled)
     
     @pyqtSlot(str)
     def _updateButtonText(self, nothing: any=None):
@@ -60,11 +86,50 @@ class ProjectSelectionMenu(HandyBaseWidget):
             self._openProject(self.pathTextBox.text())
         else:
             self._userSelectFolder()
+
+    @pyqtSlot(str)
+    def _search(self, text: str="") -> None:
+        '''
+        Replaces the list with the first page of projects matching text.
+        '''
+        self._query = text
+        self._loaded = 0
+        self._exhausted = False
+        self.projectList.clear()
+        self._loadMore()
+
+    def _loadMore(self) -> None:
+        if self._exhausted:
+            return
+        page = self.registry.search(self._query, limit=ProjectSelectionMenu.PAGE_SIZE, offset=self._loaded)
+        for path, name in page:
+            item = QListWidgetItem(f"{name}    ({path})")
+            item.setData(Qt.UserRole, path)
+            self.projectList.addItem(item)
+        self._loaded += len(page)
+        self._exhausted = len(page) < ProjectSelectionMenu.PAGE_SIZE
+
+    @pyqtSlot(int)
+    def _scrolled(self, value: int) -> None:
+        if value >= self.projectList.verticalScrollBar().maximum():
+            self._loadMore()
+
+    @pyqtSlot(QListWidgetItem)
+    def _projectActivated(self, item: QListWidgetItem) -> None:
+        path = item.data(Qt.UserRole)
+        if os.path.isdir(path):
+            self._openProject(path)
+        else:
+            logger.warning(f"\"{path}\" no longer exists; removing it from the project list.")
+            self.registry.remove(path)
+            self.projectList.takeItem(self.projectList.row(item))
     
     def _openProject(self, path: str="") -> None:
         if not os.path.isdir(path):
             raise Exception(f"{ProjectSelectionMenu._openProject.__qualname__}: path argument is not a folder!")
         logger.debug(f"{ProjectSelectionMenu._openProject.__qualname__}: Called")
+        project = self.registry.open(path)
+        self.projectOpened.emit(project)
     
     def _userSelectFolder(self) -> None:
         logger.debug(f"{ProjectSelectionMenu._userSelectFolder.__qualname__}: Called")
@@ -75,6 +140,23 @@ class ProjectSelectionMenu(HandyBaseWidget):
             self._updateButtonText()
             self._openProject(path=folder)
 
+    @pyqtSlot()
+    def _importButtonClicked(self) -> None:
+        folder = QFileDialog.getExistingDirectory(parent=self,
+            caption=r"Choose a folder to search for projects", directory=Configuration.home_directory)
+        if not os.path.isdir(folder):
+            return
+        self.importbutton.setEnabled(False)
+        self._importTask = quithread.FunctionTask(lambda token, report: self.registry.import_tree(folder))
+        self._importTask.signals.finished.connect(self._importFinished)
+        self._importTask.signals.failed.connect(self._importFinished)
+        quithread.start(self._importTask)
+
+    @pyqtSlot(object)
+    def _importFinished(self, result: any=None) -> None:
+        self.importbutton.setEnabled(True)
+        self._search(self._query)
+
 class BuildConfigurationMenu(HandyBaseWidget):
     def __init__(self, parent):
         super(BuildConfigurationMenu, self).__init__(parent)
@@ -136,9 +218,70 @@ class EditPathWidget(HandyBaseWidget):
         '''
         self.onEdited.emit(newpath)
 
+class DiagnosticsWidget(HandyBaseWidget):
+    '''
+    Shows the errors and warnings found in the build output, grouped by file.
+    Call refresh() (from the GUI thread) whenever the index may have changed; it
+    can be called while the build is still running.
+    '''
+    diagnosticActivated = pyqtSignal(str, int, int) #file, line, column
+
+    def __init__(self, parent, index: DiagnosticIndex=None):
+        super(DiagnosticsWidget, self).__init__(parent)
+        self.index = index if index is not None else DiagnosticIndex()
+        self._shown = -1
+        self._layout()
+        self._handlers()
+
+    def _layout(self) -> None:
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels(["Location", "Severity", "Message"])
+        self.setLayout(self.vLayout([self.tree]))
+
+    def _handlers(self) -> None:
+        self.tree.itemActivated.connect(self._onActivated)
+
+    def setIndex(self, index: DiagnosticIndex) -> None:
+        '''
+        Shows the diagnostics of index (a new build's) instead.
+        '''
+        self.index = index
+        self._shown = -1
+        self.tree.clear()
+
+    @pyqtSlot()
+    def refresh(self) -> None:
+        diagnostics = [d for d in self.index.diagnostics() if d.severity != Severity.NOTE]
+        if len(diagnostics) == self._shown:
+            return
+        self._shown = len(diagnostics)
+        self.tree.clear()
+        files = {}
+        for d in diagnostics:
+            if d.file not in files:
+                files[d.file] = QTreeWidgetItem(self.tree, [d.file, "", ""])
+            item = QTreeWidgetItem(files[d.file], [f"{d.line}:{d.column}", d.severity.name.lower(), d.message])
+            item.setData(0, Qt.UserRole, (d.file, d.line, d.column))
+        self.tree.expandAll()
+
+    @pyqtSlot(QTreeWidgetItem, int)
+    def _onActivated(self, item: QTreeWidgetItem, column: int) -> None:
+        location = item.data(0, Qt.UserRole)
+        if location is not None:
+            self.diagnosticActivated.emit(*location)
+
 class MainBuildMenu(QWidget):
-    def __init__(self, parent):
+    '''
+    Builds a project and shows the build output, with the errors and warnings
+    found in it below.  Builds run through ProjectInformation.execute_async on the
+    shared AsyncRunner loop, so the GUI thread never waits for one.
+    '''
+    refresh_interval = 500 #milliseconds between diagnostics updates while a build runs
+
+    def __init__(self, parent, project: ProjectInformation=None):
         super(MainBuildMenu, self).__init__(parent)
+        self.project = project
+        self._build = None #the future of the running build
 
         self._init_layout()
         self._connect_handlers()
@@ -149,11 +292,67 @@ class MainBuildMenu(QWidget):
     def _init_layout(self):
         mainlayout = QVBoxLayout()
 
-        mainlayout.addWidget(STDOutWidget(self))
+        self.buildbutton = QPushButton("Build")
+        self.cancelbutton = QPushButton("Cancel")
+        self.cancelbutton.setEnabled(False)
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.buildbutton)
+        buttons.addWidget(self.cancelbutton)
+        buttons.addStretch()
+        mainlayout.addLayout(buttons)
+        mainlayout.addWidget(STDOutWidget(self, maxlines=CONFIG.get("DEFAULT", "outputlines")))
+        self.diagnostics = DiagnosticsWidget(self)
+        mainlayout.addWidget(self.diagnostics)
         self.setLayout(mainlayout)
+        self._refreshTimer = QTimer(self)
+        self._refreshTimer.setInterval(MainBuildMenu.refresh_interval)
     
     def _connect_handlers(self):
-        pass
+        self.buildbutton.clicked.connect(self.build)
+        self.cancelbutton.clicked.connect(self.cancel)
+        self._refreshTimer.timeout.connect(self.diagnostics.refresh)
+        AsyncRunner.instance().finished.connect(self._buildFinished)
+        AsyncRunner.instance().failed.connect(self._buildFailed)
+
+    @pyqtSlot()
+    def build(self) -> None:
+        '''
+        Starts building the project, unless a build is already running.
+        '''
+        if self.project is None or self._build is not None:
+            return
+        self.buildbutton.setEnabled(False)
+        self.cancelbutton.setEnabled(True)
+        self.diagnostics.setIndex(DiagnosticIndex())
+        self._refreshTimer.start()
+        consumers = [StreamConsumer(), self.diagnostics.index]
+        self._build = AsyncRunner.instance().submit(self.project.execute_async(consumers=consumers), tag=self)
+
+    @pyqtSlot()
+    def cancel(self) -> None:
+        if self._build is not None:
+            self._build.cancel()
+
+    def _buildDone(self) -> None:
+        self._build = None
+        self.buildbutton.setEnabled(True)
+        self.cancelbutton.setEnabled(False)
+        self._refreshTimer.stop()
+        self.diagnostics.refresh()
+
+    @pyqtSlot(object, object)
+    def _buildFinished(self, tag: any, result: any) -> None:
+        if tag is not self:
+            return
+        self._buildDone()
+        logger.info(f"Build {'succeeded' if result.success else 'failed'} in {result.duration:.1f}s")
+
+    @pyqtSlot(object, str)
+    def _buildFailed(self, tag: any, error: str) -> None:
+        if tag is not self:
+            return
+        self._buildDone()
+        logger.info("Build stopped: " + error)
 
     @pyqtSlot()
     def printtest(self) -> None:
@@ -0,0 +1,352 @@
+'''
+A build agent, which builds projects for cppbuilder clients (distributed.py)
+on other machines or in other processes, and the protocol the two speak.
+
+Messages are json objects, each sent as a 4 byte big-endian length followed
+by that many bytes of utf-8.  A client connects to an agent's TCP port (or
+unix socket) and sends one of:
+
+    {"type": "status"}  ->  {"type": "status", "name", "capacity", "running", "load"}
+    {"type": "submit", "job", "project", "commands", "targets", "artifacts"}
+
+A submitted job is answered with {"type": "busy"} if the agent has no free
+slot, or else with {"type": "accepted"} followed, until the build finishes,
+by {"type": "output", "lines"} as the build prints and {"type": "heartbeat"}
+every heartbeat_interval seconds.  After a successful build, every file of
+the build directory matching one of the "artifacts" glob patterns comes back
+in {"type": "artifact", "path", "offset", "data" (base64), "mode", "last"}
+pieces.  The last message is {"type": "result", "success", "phases", "error"}.
+If the client goes away, the build is cancelled.
+
+The project's sources have to be at the same path on the agent (a shared or
+identical checkout).  Agents started with a workspace build every project in
+a directory of their own under it, rather than in the project's build
+directory.  There is no encryption; agents should only listen on trusted
+networks.  Whoever can connect to an agent can run commands as its user, so
+an agent requires a shared token unless it is explicitly started insecure.
+'''
+import base64, glob, hashlib, hmac, json, logging, os, socket, socketserver, struct, threading, typing
+
+from data import Configuration, ProjectCommands, ProjectInformation, available_cpus
+from execution import CommandResult
+from outputpipe import OutputConsumer
+
+logger = logging.getLogger(__name__)
+
+PROTOCOL_VERSION: int = 1
+MAX_MESSAGE: int = 64 * 2**20 #bytes
+ARTIFACT_CHUNK: int = 2**20 #bytes of file data per artifact message
+HEARTBEAT_INTERVAL: float = 2.0 #seconds
+DEFAULT_PORT: int = 7700
+
+_HEADER = struct.Struct(">I")
+
+class ProtocolError(Exception):
+    '''
+    The other side sent something that is not a valid message.
+    '''
+
+def parse_address(address: str) -> typing.Tuple[int, typing.Any]:
+    '''
+    Returns the socket family and address for "host:port", ":port", "port", or
+    the path of a unix socket ("unix:/path" or anything containing a slash).
+    '''
+    if address.startswith("unix:") or "/" in address or os.sep in address:
+        if not hasattr(socket, "AF_UNIX"):
+            raise ValueError(f"{parse_address.__qualname__}: unix sockets are not supported here")
+        return socket.AF_UNIX, address[len("unix:"):] if address.startswith("unix:") else address
+    host, _, port = address.rpartition(":")
+    try:
+        return socket.AF_INET, (host or "127.0.0.1", int(port))
+    except ValueError:
+        raise ValueError(f"{parse_address.__qualname__}: \"{address}\" is not host:port or a socket path")
+
+def connect(address: str, timeout: float=10.0) -> socket.socket:
+    family, target = parse_address(address)
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(target)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+def send_message(sock: socket.socket, message: dict) -> None:
+    data = json.dumps(message, separators=(",", ":")).encode("utf-8")
+    if len(data) > MAX_MESSAGE:
+        raise ProtocolError(f"{send_message.__qualname__}: message of {len(data)} bytes is too large")
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+def _receive_exactly(sock: socket.socket, count: int) -> bytes:
+    chunks = []
+    while count > 0:
+        chunk = sock.recv(min(count, 2**16))
+        if len(chunk) == 0:
+            raise ConnectionError("the connection was closed")
+        chunks.append(chunk)
+        count -= len(chunk)
+    return b"".join(chunks)
+
+def receive_message(sock: socket.socket) -> dict:
+    '''
+    Reads one message.  Raises ConnectionError if the connection closes, and
+    ProtocolError if what arrives is not a message.
+    '''
+    (length,) = _HEADER.unpack(_receive_exactly(sock, _HEADER.size))
+    if length > MAX_MESSAGE:
+        raise ProtocolError(f"{receive_message.__qualname__}: message of {length} bytes is too large")
+    try:
+        message = json.loads(_receive_exactly(sock, length).decode("utf-8"))
+    except ValueError as e:
+        raise ProtocolError(f"{receive_message.__qualname__}: {e}")
+    if not isinstance(message, dict) or "type" not in message:
+        raise ProtocolError(f"{receive_message.__qualname__}: not a message: {message!r}")
+    return message
+
+_RESULT_FIELDS = ["command", "returncode", "duration", "phase", "line_count", "skipped", "cancelled",
+    "cpu_time", "peak_rss", "part_of"]
+
+def result_todict(result: CommandResult) -> dict:
+    return {name: getattr(result, name) for name in _RESULT_FIELDS}
+
+def result_fromdict(data: dict) -> CommandResult:
+    return CommandResult(**{name: data[name] for name in _RESULT_FIELDS if name in data})
+
+def default_builder(project: ProjectInformation, commands: ProjectCommands, targets: typing.Optional[typing.List[str]],
+    consumers: typing.List[OutputConsumer], cancel: threading.Event) -> bool:
+    return project.execute(commands, consumers=consumers, cancel=cancel, targets=targets)
+
+class _Channel:
+    '''
+    One client connection.  Sends may come from several threads (output,
+    heartbeats); once one fails, the client is gone and cancel is set.
+    '''
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    def send(self, message: dict) -> bool:
+        if self.cancel.is_set():
+            return False
+        try:
+            with self._lock:
+                send_message(self.sock, message)
+            return True
+        except OSError:
+            self.cancel.set()
+            return False
+
+class _OutputSender(OutputConsumer):
+    def __init__(self, channel: _Channel, job: str):
+        self.channel = channel
+        self.job = job
+
+    def consume(self, lines: typing.List[str]) -> None:
+        self.channel.send({"type": "output", "job": self.job, "lines": lines})
+
+class BuildAgent:
+    '''
+    Serves build jobs, at most capacity (default: one per cpu) at a time, each
+    on its own thread.
+    '''
+    def __init__(self, address: str=f"127.0.0.1:{DEFAULT_PORT}", capacity: int=0, workspace: str="",
+        name: str="", token: str="", heartbeat_interval: float=HEARTBEAT_INTERVAL,
+        builder: typing.Callable[..., bool]=default_builder, insecure: bool=False):
+        '''
+        address: where to listen, as for parse_address.  Port 0 picks a free port.
+        token: the secret every client has to send.  Without one, insecure has to
+            be given: then anyone who can connect can build, and run commands.
+        workspace: if given, where projects are built; "" builds them in their own
+            build directories.
+        builder: builds one job; defaults to ProjectInformation.execute.
+        '''
+        if len(token) == 0 and not insecure:
+            raise ValueError(f"{BuildAgent.__qualname__}: an agent without a token lets anyone who can connect "
+                "run commands; give it a token, or start it insecure")
+        self.capacity = capacity if capacity > 0 else available_cpus()
+        self.workspace = workspace
+        self.token = token
+        self.heartbeat_interval = heartbeat_interval
+        self.builder = builder
+        self.running = 0
+        self._lock = threading.Lock()
+        self._channels: typing.Set[_Channel] = set()
+        self._directories: typing.Dict[str, threading.Lock] = {} #jobs in the same build directory take turns
+        self._thread: typing.Optional[threading.Thread] = None
+
+        agent = self
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self) -> None:
+                agent._serve(self.request)
+
+        family, target = parse_address(address)
+        if family == socket.AF_INET:
+            self._server = socketserver.ThreadingTCPServer(target, Handler, bind_and_activate=False)
+            self._server.allow_reuse_address = True
+        else:
+            if os.path.exists(target):
+                os.remove(target) #left behind by an agent that did not stop cleanly
+            self._server = socketserver.ThreadingUnixStreamServer(target, Handler, bind_and_activate=False)
+        self._server.daemon_threads = True
+        try:
+            self._server.server_bind()
+            self._server.server_activate()
+        except OSError:
+            self._server.server_close()
+            raise
+        self.name = name if len(name) > 0 else f"{socket.gethostname()}:{self.address}"
+
+    @property
+    def address(self) -> str:
+        '''
+        The address clients connect to.
+        '''
+        bound = self._server.server_address
+        if isinstance(bound, tuple):
+            return f"{bound[0]}:{bound[1]}"
+        return bound if isinstance(bound, str) else bound.decode()
+
+    def serve_forever(self) -> None:
+        logger.info(f"Build agent {self.name} listening on {self.address}, {self.capacity} job(s) at a time")
+        self._server.serve_forever(poll_interval=0.2)
+
+    def start(self) -> "BuildAgent":
+        '''
+        Serves on a background thread.
+        '''
+        self._thread = threading.Thread(target=self.serve_forever, name="cppbuilder-agent", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        '''
+        Stops listening, drops every connection and cancels the builds.
+        '''
+        self._server.shutdown()
+        self._server.server_close()
+        with self._lock:
+            channels = list(self._channels)
+        for channel in channels:
+            channel.cancel.set()
+            try:
+                channel.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._server.address_family != socket.AF_INET and os.path.exists(self.address):
+            os.remove(self.address)
+        if self._thread is not None:
+            self._thread.join()
+
+    def _load(self) -> float:
+        try:
+            return os.getloadavg()[0] / available_cpus()
+        except (OSError, AttributeError): #not available on windows
+            return 0.0
+
+    def _serve(self, sock: socket.socket) -> None:
+        channel = _Channel(sock)
+        with self._lock:
+            self._channels.add(channel)
+        try:
+            while not channel.cancel.is_set():
+                try:
+                    message = receive_message(sock)
+                except (OSError, ProtocolError):
+                    return
+                if len(self.token) > 0 and not hmac.compare_digest(str(message.get("token", "")), self.token):
+                    channel.send({"type": "error", "error": "not authorized"})
+                    return
+                if message["type"] == "status":
+                    with self._lock:
+                        running = self.running
+                    channel.send({"type": "status", "version": PROTOCOL_VERSION, "name": self.name,
+                        "capacity": self.capacity, "running": running, "load": self._load()})
+                elif message["type"] == "submit":
+                    self._job(channel, message)
+                    return
+                else:
+                    channel.send({"type": "error", "error": f"unknown message type \"{message['type']}\""})
+        finally:
+            with self._lock:
+                self._channels.discard(channel)
+
+    def _build_directory(self, project: ProjectInformation) -> str:
+        if len(self.workspace) == 0:
+            return project.build_directory
+        key = hashlib.sha1(f"{project.project_directory}|{project.source_directory}|{project.build_directory}|"
+            f"{project.generator_type.name}".encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.workspace, key)
+
+    def _job(self, channel: _Channel, message: dict) -> None:
+        job = str(message.get("job", ""))
+        with self._lock:
+            if self.running >= self.capacity:
+                channel.send({"type": "busy", "job": job})
+                return
+            self.running += 1
+        finished = threading.Event()
+        try:
+            project = ProjectInformation()
+            try:
+                project.fromjson(message["project"])
+                commands = ProjectCommands(int(message.get("commands", int(ProjectCommands.CMAKE | ProjectCommands.MAKE))))
+            except (KeyError, TypeError, ValueError) as e:
+                channel.send({"type": "result", "job": job, "success": False, "phases": [],
+                    "error": f"invalid job: {e!r}"})
+                return
+            project.build_directory = self._build_directory(project)
+            channel.send({"type": "accepted", "job": job, "agent": self.name, "build_directory": project.build_directory})
+            logger.info(f"Job {job}: building {project.project_directory} in {project.build_directory}")
+
+            def heartbeat() -> None:
+                while not finished.wait(self.heartbeat_interval):
+                    channel.send({"type": "heartbeat", "job": job})
+            threading.Thread(target=heartbeat, name="cppbuilder-agent-heartbeat", daemon=True).start()
+
+            with self._lock:
+                directory = self._directories.setdefault(os.path.abspath(project.build_directory), threading.Lock())
+            error = ""
+            with directory:
+                try:
+                    success = self.builder(project, commands, message.get("targets"), [_OutputSender(channel, job)],
+                        channel.cancel)
+                except Exception as e:
+                    logger.exception(f"Job {job} raised an exception")
+                    success, error = False, repr(e)
+                phases = [result_todict(c) for c in project.last_result.commands] if project.last_result is not None else []
+                if success:
+                    self._send_artifacts(channel, job, project.build_directory, message.get("artifacts") or [])
+            channel.send({"type": "result", "job": job, "success": success, "phases": phases, "error": error})
+            logger.info(f"Job {job}: {'succeeded' if success else 'failed'}")
+        finally:
+            finished.set()
+            with self._lock:
+                self.running -= 1
+
+    def _send_artifacts(self, channel: _Channel, job: str, build_directory: str, patterns: typing.List[str]) -> None:
+        root = os.path.realpath(build_directory)
+        sent = set()
+        for pattern in patterns:
+            for path in sorted(glob.glob(os.path.join(glob.escape(build_directory), pattern), recursive=True)):
+                real = os.path.realpath(path)
+                if not os.path.isfile(real) or not real.startswith(root + os.sep) or real in sent:
+                    continue
+                sent.add(real)
+                relative = os.path.relpath(real, root).replace(os.sep, "/")
+                mode = os.stat(real).st_mode & 0o777
+                with open(real, "rb") as f:
+                    offset = 0
+                    while True:
+                        data = f.read(ARTIFACT_CHUNK)
+                        last = len(data) < ARTIFACT_CHUNK
+                        if not channel.send({"type": "artifact", "job": job, "path": relative, "offset": offset,
+                            "mode": mode, "last": last, "data": base64.b64encode(data).decode("ascii")}):
+                            return
+                        offset += len(data)
+                        if last:
+                            break
+
+def default_workspace() -> str:
+    return os.path.join(Configuration.program_home, "agent")
@@ -0,0 +1,205 @@
+'''
+End-to-end build benchmarks on synthetic projects (see synthetic.py), run from
+the src directory:
+
+    python -m benchmarks.run [--targets N] [--sources M] [--depth D] [--repeat R]
+        [--real-toolchain] [--delay S] [--output results.json] [--compare baseline.json]
+
+Each repetition builds the project twice in fresh build directories: once by
+running the commands ProjectInformation.cmake() and make() return directly
+("raw"), and once through ProjectInformation.execute() ("cppbuilder").  Both
+are timed for the configure, the full build, a build with nothing to do, and
+a build after one source changed.  The difference is cppbuilder's overhead.
+
+The results are written as json, to keep them and compare them between
+versions; --compare reports the times that got slower than in an earlier
+results file.
+'''
+import argparse, json, logging, os, platform, shutil, subprocess, sys, tempfile, time, typing
+
+try:
+    import resource
+except ImportError: #windows
+    resource = None
+
+from data import ProjectCommands, ProjectInformation, available_cpus
+from benchmarks.synthetic import SyntheticSpec, generate
+
+logger = logging.getLogger(__name__)
+
+RESULTS_FORMAT = 1
+
+#measurements, in seconds, in the order they are reported
+METRICS: typing.List[str] = [
+    "raw.configure", "raw.build", "raw.noop", "raw.incremental",
+    "cppbuilder.configure", "cppbuilder.build", "cppbuilder.total", "cppbuilder.noop", "cppbuilder.incremental"]
+
+def _timed(command: typing.List[str], cwd: str) -> float:
+    start = time.perf_counter()
+    subprocess.run(command, cwd=cwd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+def _touch(project: ProjectInformation) -> None:
+    #the first translation unit of the first target: everything after it in the chain relinks
+    path = os.path.join(project.project_directory, project.source_directory, "lib0", "unit0.cpp")
+    if not os.path.isfile(path):
+        path = os.path.join(project.project_directory, project.source_directory, "app", "unit0.cpp")
+    future = time.time() + 2 #later than anything built so far, even with coarse file times
+    os.utime(path, (future, future))
+
+def _raw(project: ProjectInformation, samples: typing.Dict[str, typing.List[float]]) -> None:
+    os.makedirs(project.build_directory)
+    samples["raw.configure"].append(_timed(project.cmake(), project.build_directory))
+    samples["raw.build"].append(_timed(project.make(), project.build_directory))
+    samples["raw.noop"].append(_timed(project.make(), project.build_directory))
+    _touch(project)
+    samples["raw.incremental"].append(_timed(project.make(), project.build_directory))
+
+def _cppbuilder(project: ProjectInformation, samples: typing.Dict[str, typing.List[float]]) -> int:
+    '''
+    Returns the peak resident set size, in bytes, of the commands it ran.
+    '''
+    peak = 0
+    commands = ProjectCommands.CMAKE | ProjectCommands.MAKE
+    for name in ["total", "noop", "incremental"]:
+        if name == "incremental":
+            _touch(project)
+        start = time.perf_counter()
+        if not project.execute(commands, consumers=[]):
+            raise RuntimeError(f"{_cppbuilder.__qualname__}: the {name} build of {project.project_directory} failed")
+        samples["cppbuilder." + name].append(time.perf_counter() - start)
+        for c in project.last_result.commands:
+            if name == "total" and not c.skipped and "cppbuilder." + c.phase in samples:
+                samples["cppbuilder." + c.phase].append(c.duration)
+            peak = max(peak, c.peak_rss or 0)
+    return peak
+
+def _summary(values: typing.List[float]) -> dict:
+    import statistics
+    return {"median": statistics.median(values), "min": min(values), "max": max(values), "samples": values}
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+def _own_peak_rss() -> typing.Optional[int]:
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+def run_benchmark(spec: SyntheticSpec, repeat: int=3, jobs: int=0, directory: str="") -> dict:
+    '''
+    Generates a project of the given size in directory (default: a temporary
+    directory, removed afterwards), runs the benchmark repeat times and returns
+    the results.
+    '''
+    if repeat < 1:
+        raise ValueError(f"{run_benchmark.__qualname__}: repeat must be at least 1")
+    temporary = None
+    if len(directory) == 0:
+        temporary = tempfile.TemporaryDirectory(prefix="cppbuilder-benchmark-")
+        directory = temporary.name
+    try:
+        project = generate(directory, spec)
+        project.build_jobs = jobs
+        samples: typing.Dict[str, typing.List[float]] = {name: [] for name in METRICS}
+        build_peak = 0
+        for r in range(repeat):
+            project.build_directory = os.path.join(directory, "build-raw")
+            shutil.rmtree(project.build_directory, ignore_errors=True)
+            _raw(project, samples)
+            project.build_directory = os.path.join(directory, "build-cppbuilder")
+            shutil.rmtree(project.build_directory, ignore_errors=True)
+            build_peak = max(build_peak, _cppbuilder(project, samples))
+            logger.info(f"Repetition {r + 1}/{repeat}: raw build {samples['raw.build'][-1]:.3f}s, "
+                f"cppbuilder build {samples['cppbuilder.total'][-1]:.3f}s")
+    finally:
+        if temporary is not None:
+            temporary.cleanup()
+
+    metrics = {name: _summary(values) for name, values in samples.items() if len(values) > 0}
+    def median(name: str) -> float:
+        return metrics[name]["median"] if name in metrics else 0.0
+    raw_total = median("raw.configure") + median("raw.build")
+    derived = {
+        "throughput.raw": spec.translation_units / median("raw.build") if median("raw.build") > 0 else 0.0,
+        "throughput.cppbuilder": spec.translation_units / median("cppbuilder.build") if median("cppbuilder.build") > 0 else 0.0,
+        "overhead.total": median("cppbuilder.total") - raw_total,
+        "overhead.noop": median("cppbuilder.noop") - median("raw.noop"),
+        "overhead.incremental": median("cppbuilder.incremental") - median("raw.incremental"),
+        "overhead.percent": (median("cppbuilder.total") / raw_total - 1) * 100 if raw_total > 0 else 0.0}
+    return {
+        "format": RESULTS_FORMAT,
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": _commit(),
+        "host": {"platform": platform.platform(), "python": platform.python_version(), "cpus": available_cpus()},
+        "spec": spec.todict(),
+        "repeat": repeat,
+        "jobs": project.jobs(),
+        "metrics": metrics,
+        "derived": derived,
+        "memory": {"benchmark_peak_rss": _own_peak_rss(), "build_peak_rss": build_peak or None}}
+
+def compare(baseline: dict, results: dict, threshold: float=0.10) -> typing.List[str]:
+    '''
+    Returns a line for every metric whose median is more than threshold (a
+    fraction) slower in results than in baseline.
+    '''
+    slower = []
+    if baseline.get("spec") != results.get("spec"):
+        logger.warning("The baseline was measured on a project of a different size")
+    for name in METRICS:
+        before = baseline.get("metrics", {}).get(name)
+        after = results.get("metrics", {}).get(name)
+        if before is None or after is None or before["median"] <= 0:
+            continue
+        change = after["median"] / before["median"] - 1
+        if change > threshold:
+            slower.append(f"{name}: {before['median']:.3f}s -> {after['median']:.3f}s (+{change * 100:.0f}%)")
+    return slower
+
+def main(argv: typing.Optional[typing.List[str]]=None) -> int:
+    parser = argparse.ArgumentParser(prog="benchmarks.run", description="Benchmark building synthetic projects.")
+    parser.add_argument("--targets", type=int, default=SyntheticSpec.targets)
+    parser.add_argument("--sources", type=int, default=SyntheticSpec.sources, help="translation units per target")
+    parser.add_argument("--depth", type=int, default=SyntheticSpec.include_depth, help="include depth")
+    parser.add_argument("--real-toolchain", action="store_true", help="compile with the real compiler")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds each fake compile takes")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--jobs", "-j", type=int, default=0, help="parallel jobs (0: one per cpu)")
+    parser.add_argument("--directory", default="", help="where to generate the project (default: a temporary directory)")
+    parser.add_argument("--output", default="", help="write the results to this json file")
+    parser.add_argument("--compare", default="", help="an earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="slowdown reported by --compare (a fraction)")
+    arguments = parser.parse_args(argv)
+    logging.basicConfig(stream=sys.stderr, format="[%(name)s] [%(levelname)s] -> %(message)s", level=logging.INFO)
+
+    spec = SyntheticSpec(targets=arguments.targets, sources=arguments.sources, include_depth=arguments.depth,
+        fake_toolchain=not arguments.real_toolchain, compile_delay=arguments.delay)
+    results = run_benchmark(spec, repeat=arguments.repeat, jobs=arguments.jobs, directory=arguments.directory)
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if len(arguments.output) > 0:
+        with open(arguments.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    for name in METRICS:
+        if name in results["metrics"]:
+            print(f"{name:24} {results['metrics'][name]['median']:8.3f}s", file=sys.stderr)
+    for name, value in results["derived"].items():
+        print(f"{name:24} {value:8.3f}", file=sys.stderr)
+
+    if len(arguments.compare) > 0:
+        with open(arguments.compare, "r") as f:
+            slower = compare(json.load(f), results, arguments.threshold)
+        for line in slower:
+            print("SLOWER: " + line, file=sys.stderr)
+        return 1 if len(slower) > 0 else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
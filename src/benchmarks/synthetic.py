@@ -0,0 +1,135 @@
+'''
+Generates synthetic CMake projects of a given size, for benchmarks and for
+tests that need a project to build.
+
+A project has a chain of static libraries (each one links the one before it)
+and an executable linking the last, every target with the same number of
+translation units.  Every translation unit includes a chain of headers
+include_depth deep.
+
+With fake_toolchain, the targets are compiled and linked by a small shell
+script instead of the compiler: it only writes the files the compiler would
+have written, optionally after a fixed delay, so builds are fast and take the
+same time on every machine.  cmake still probes the installed compiler when
+it configures.
+'''
+import dataclasses, logging, os, stat, sys
+
+from data import ProjectInformation, SupportedCmakeGenerators
+
+logger = logging.getLogger(__name__)
+
+FAKE_LAUNCHER_NAME = "fake_toolchain.sh"
+
+#used as the compiler and the linker launcher: "fake_toolchain.sh <compiler> <arguments>"
+_FAKE_LAUNCHER = '''#!/bin/sh
+out=""; depfile=""; source=""; previous=""
+for argument in "$@"; do
+    case "$previous" in
+        -o) out="$argument" ;;
+        -MF) depfile="$argument" ;;
+        -c) source="$argument" ;;
+    esac
+    previous="$argument"
+done
+{delay}
+if [ -n "$out" ]; then
+    : > "$out"
+    [ -z "$source" ] && chmod +x "$out"
+fi
+if [ -n "$depfile" ]; then
+    printf '%s: %s\\n' "$out" "$source" > "$depfile"
+fi
+exit 0
+'''
+
+@dataclasses.dataclass
+class SyntheticSpec:
+    '''
+    The size of a synthetic project.
+    '''
+    targets: int = 4 #the last one is the executable
+    sources: int = 20 #translation units per target
+    include_depth: int = 3 #headers each translation unit includes, one including the next
+    fake_toolchain: bool = True
+    compile_delay: float = 0.0 #seconds each fake compile or link takes
+
+    @property
+    def translation_units(self) -> int:
+        return self.targets * self.sources
+
+    def todict(self) -> dict:
+        return dataclasses.asdict(self)
+
+def fake_toolchain_supported() -> bool:
+    return sys.platform != "win32"
+
+def _write(path: str, text: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+def write_fake_launcher(path: str, delay: float=0.0) -> str:
+    '''
+    Writes the fake compiler and linker launcher to path and returns path.
+    '''
+    _write(path, _FAKE_LAUNCHER.format(delay=(f"sleep {delay}" if delay > 0 else "")))
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return path
+
+def _target_name(index: int, spec: SyntheticSpec) -> str:
+    return "app" if index == spec.targets - 1 else f"lib{index}"
+
+def generate(directory: str, spec: SyntheticSpec) -> ProjectInformation:
+    '''
+    Writes a synthetic project into directory (its source in directory/src) and
+    returns the settings to build it in directory/build with make and the
+    default compilers.
+    '''
+    if spec.targets < 1 or spec.sources < 1 or spec.include_depth < 0:
+        raise ValueError(f"{generate.__qualname__}: invalid project size {spec!r}")
+    if spec.fake_toolchain and not fake_toolchain_supported():
+        raise ValueError(f"{generate.__qualname__}: the fake toolchain needs a posix shell")
+    source = os.path.join(directory, "src")
+
+    lines = ["cmake_minimum_required(VERSION 3.14)", "project(synthetic CXX)"]
+    if spec.fake_toolchain:
+        launcher = write_fake_launcher(os.path.join(directory, FAKE_LAUNCHER_NAME), spec.compile_delay)
+        lines += [f"set(CMAKE_CXX_COMPILER_LAUNCHER \"{launcher}\")",
+            f"set(CMAKE_CXX_LINKER_LAUNCHER \"{launcher}\")"]
+    lines += [f"add_subdirectory({_target_name(t, spec)})" for t in range(spec.targets)]
+    _write(os.path.join(source, "CMakeLists.txt"), "\n".join(lines) + "\n")
+
+    for t in range(spec.targets):
+        name = _target_name(t, spec)
+        folder = os.path.join(source, name)
+        for level in range(spec.include_depth):
+            include = f"#include \"{name}_{level + 1}.h\"\n" if level + 1 < spec.include_depth else ""
+            _write(os.path.join(folder, "include", f"{name}_{level}.h"),
+                f"#pragma once\n{include}inline int {name}_level{level}() {{ return {level}; }}\n")
+        files = []
+        for s in range(spec.sources):
+            include = f"#include \"{name}_0.h\"\n" if spec.include_depth > 0 else ""
+            body = f"{name}_level0()" if spec.include_depth > 0 else "0"
+            _write(os.path.join(folder, f"unit{s}.cpp"), f"{include}int {name}_unit{s}() {{ return {body} + {s}; }}\n")
+            files.append(f"unit{s}.cpp")
+        if name == "app":
+            _write(os.path.join(folder, "main.cpp"), "int main() { return 0; }\n")
+            target = f"add_executable(app main.cpp {' '.join(files)})"
+        else:
+            target = f"add_library({name} STATIC {' '.join(files)})"
+        text = f"{target}\ntarget_include_directories({name} PUBLIC include)\n"
+        if t > 0:
+            text += f"target_link_libraries({name} PUBLIC {_target_name(t - 1, spec)})\n"
+        _write(os.path.join(folder, "CMakeLists.txt"), text)
+
+    project = ProjectInformation()
+    project.project_directory = directory
+    project.source_directory = "src"
+    project.build_directory = os.path.join(directory, "build")
+    project.generator_type = SupportedCmakeGenerators.UNIX_MAKEFILE
+    project.cpp_compiler = "c++"
+    project.c_compiler = "cc"
+    project.compiler_launcher = "none"
+    logger.debug(f"Generated a project of {spec.translation_units} translation units in {directory}")
+    return project
@@ -0,0 +1,268 @@
+'''
+Measures how fast build output gets from UIStream into STDOutWidget, by
+replaying recorded build output under an offscreen Qt platform.  Run from the
+src directory:
+
+    python -m benchmarks.uireplay record OUTPUT [--settings FILE]
+    python -m benchmarks.uireplay replay RECORDING [--rate LINES_PER_S | --speed FACTOR]
+        [--output results.json] [--compare baseline.json]
+
+record builds a project (from a settings file, or a synthetic one) and writes
+every batch of output lines, with the time it arrived, to OUTPUT as json
+lines.  replay writes the batches to a UIStream from a separate thread, as
+the build threads do, at the recorded pace times --speed, at a fixed number
+of lines per second, or as fast as it can (the default), while the GUI thread
+shows them in an STDOutWidget.  It reports the lines per second shown, how
+late the event loop ran (a timer that should fire every few milliseconds),
+the number of signals sent and how much memory grew.
+'''
+import argparse, contextlib, json, logging, os, sys, threading, time, typing
+
+from outputpipe import OutputConsumer
+
+logger = logging.getLogger(__name__)
+
+RESULTS_FORMAT = 1
+PROBE_INTERVAL = 5 #milliseconds between event loop latency samples
+
+Recording = typing.List[typing.Tuple[float, typing.List[str]]] #(seconds since the start, lines)
+
+class RecordingConsumer(OutputConsumer):
+    '''
+    Writes each batch of output lines, and when it arrived, to a file.
+    '''
+    def __init__(self, filename: str):
+        self._file = open(filename, "w", encoding="utf-8")
+        self._start: typing.Optional[float] = None
+        self._lock = threading.Lock()
+
+    def consume(self, lines: typing.List[str]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if self._start is None:
+                self._start = now
+            self._file.write(json.dumps({"t": round(now - self._start, 6), "lines": lines}) + "\n")
+
+    def flush(self) -> None:
+        with self._lock:
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+def load_recording(filename: str) -> Recording:
+    recording = []
+    with open(filename, "r", encoding="utf-8") as f:
+        for line in f:
+            if len(line.strip()) > 0:
+                batch = json.loads(line)
+                recording.append((float(batch["t"]), list(batch["lines"])))
+    return recording
+
+def _rss() -> int:
+    '''
+    The current resident set size in bytes, or the peak one where the current
+    one is not available.
+    '''
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+def _percentiles(values: typing.List[float]) -> dict:
+    if len(values) == 0:
+        return {"p50": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(values)
+    def at(fraction: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 3)
+    return {"p50": at(0.50), "p90": at(0.90), "p99": at(0.99), "max": round(ordered[-1], 3)}
+
+def _produce(stream, recording: Recording, rate: float, speed: float, done: threading.Event) -> None:
+    start = time.monotonic()
+    written = 0
+    for offset, lines in recording:
+        if rate > 0:
+            due = written / rate
+        elif speed > 0:
+            due = offset / speed
+        else:
+            due = 0.0
+        wait = start + due - time.monotonic()
+        if wait > 0.001:
+            time.sleep(wait)
+        stream.write("\n".join(lines) + "\n")
+        written += len(lines)
+    done.set()
+
+def replay(recording: Recording, rate: float=0.0, speed: float=0.0, maxlines: int=0, timeout: float=300.0) -> dict:
+    '''
+    Replays recording through a UIStream into an STDOutWidget and returns the
+    measurements.  rate is in lines per second and speed multiplies the
+    recorded pace; with neither, the output is written as fast as possible.
+    A QApplication has to exist already.
+    '''
+    from PyQt5.QtCore import QEventLoop, Qt, QTimer
+    from UI.stdredirect import STDOutWidget, UIStream
+
+    widget = STDOutWidget(None, maxlines=maxlines)
+    sink = open(os.devnull, "w")
+    stream = UIStream(original_stream=sink)
+    signals = {"messageWritten": 0, "flushRequested": 0}
+    shown = {"lines": 0, "last": 0.0}
+    def count_message(message: str) -> None:
+        signals["messageWritten"] += 1
+        shown["lines"] += message.count("\n") + 1
+        shown["last"] = time.perf_counter()
+    def count_flush() -> None:
+        signals["flushRequested"] += 1
+    stream.messageWritten.connect(count_message)
+    stream.messageWritten.connect(widget.write_message)
+    stream._flushRequested.connect(count_flush)
+
+    total = sum(len(lines) for _, lines in recording)
+    latencies: typing.List[float] = []
+    loop = QEventLoop()
+    probe = QTimer()
+    probe.setTimerType(Qt.PreciseTimer)
+    probe.setInterval(PROBE_INTERVAL)
+    done = threading.Event()
+    state = {"last": 0.0, "idle": 0}
+    def tick() -> None:
+        now = time.perf_counter()
+        latencies.append(max(0.0, (now - state["last"]) * 1000 - PROBE_INTERVAL))
+        state["last"] = now
+        #finished once the producer is, nothing is left in the stream, and the
+        #messages already sent have had a turn of the event loop to arrive
+        if done.is_set() and not (stream._flush_pending or stream._flush_now_pending) and stream._buffered == 0:
+            state["idle"] += 1
+            if state["idle"] >= 2:
+                loop.quit()
+        if now - start > timeout:
+            logger.warning("The replay timed out")
+            loop.quit()
+    probe.timeout.connect(tick)
+
+    rss_before = _rss()
+    producer = threading.Thread(target=_produce, args=(stream, recording, rate, speed, done), daemon=True)
+    start = state["last"] = time.perf_counter()
+    probe.start()
+    producer.start()
+    loop.exec_()
+    elapsed = (shown["last"] if shown["lines"] > 0 else time.perf_counter()) - start
+    probe.stop()
+    producer.join(1.0)
+    rss_after = _rss()
+
+    stream.messageWritten.disconnect()
+    sink.close()
+    blocks = widget.output_box.blockCount()
+    widget.deleteLater()
+    return {
+        "lines": total,
+        "shown": shown["lines"],
+        "seconds": round(elapsed, 4),
+        "lines_per_second": round(shown["lines"] / elapsed, 1) if elapsed > 0 else 0.0,
+        "latency_ms": _percentiles(latencies),
+        "signals": signals,
+        "blocks": blocks,
+        "memory": {"rss_before": rss_before, "rss_after": rss_after, "growth": rss_after - rss_before}}
+
+def compare(baseline: dict, results: dict, threshold: float=0.10) -> typing.List[str]:
+    '''
+    Returns a line for every measurement that is more than threshold (a
+    fraction) worse in results than in baseline.
+    '''
+    worse = []
+    before, after = baseline.get("lines_per_second", 0.0), results.get("lines_per_second", 0.0)
+    if before > 0 and after < before * (1 - threshold):
+        worse.append(f"lines_per_second: {before:.0f} -> {after:.0f}")
+    for key in ["p99", "max"]:
+        before = baseline.get("latency_ms", {}).get(key, 0.0)
+        after = results.get("latency_ms", {}).get(key, 0.0)
+        if before > 0 and after > before * (1 + threshold):
+            worse.append(f"latency_ms.{key}: {before:.1f} -> {after:.1f}")
+    return worse
+
+def record(filename: str, settings: str="", targets: int=8, sources: int=50) -> bool:
+    '''
+    Builds a project from a settings file, or else a synthetic one, and records
+    its output into filename.
+    '''
+    from data import ProjectCommands, ProjectInformation
+    consumer = RecordingConsumer(filename)
+    try:
+        if len(settings) > 0:
+            project = ProjectInformation()
+            with open(settings, "r") as f:
+                project.fromjson(f.read())
+            return project.execute(ProjectCommands.CLEAN | ProjectCommands.CMAKE | ProjectCommands.MAKE,
+                consumers=[consumer])
+        import tempfile
+        from benchmarks.synthetic import SyntheticSpec, generate
+        with tempfile.TemporaryDirectory(prefix="cppbuilder-record-") as directory:
+            project = generate(directory, SyntheticSpec(targets=targets, sources=sources))
+            return project.execute(consumers=[consumer])
+    finally:
+        consumer.close()
+
+def main(argv: typing.Optional[typing.List[str]]=None) -> int:
+    parser = argparse.ArgumentParser(prog="benchmarks.uireplay", description="Benchmark the build output window.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    recorder = commands.add_parser("record", help="record the output of a build")
+    recorder.add_argument("output")
+    recorder.add_argument("--settings", default="", help="a project settings json file (default: a synthetic project)")
+    recorder.add_argument("--targets", type=int, default=8)
+    recorder.add_argument("--sources", type=int, default=50)
+    player = commands.add_parser("replay", help="replay a recording into the output window")
+    player.add_argument("recording")
+    pace = player.add_mutually_exclusive_group()
+    pace.add_argument("--rate", type=float, default=0.0, help="lines per second")
+    pace.add_argument("--speed", type=float, default=0.0, help="a multiple of the recorded pace")
+    player.add_argument("--repeat", type=int, default=1, help="replay the recording this many times in a row")
+    player.add_argument("--maxlines", type=int, default=0, help="lines the widget keeps (default: its own default)")
+    player.add_argument("--output", default="", help="write the results to this json file")
+    player.add_argument("--compare", default="", help="an earlier results file to compare against")
+    player.add_argument("--threshold", type=float, default=0.10, help="worsening reported by --compare (a fraction)")
+    arguments = parser.parse_args(argv)
+    logging.basicConfig(stream=sys.stderr, format="[%(name)s] [%(levelname)s] -> %(message)s", level=logging.WARNING)
+
+    if arguments.command == "record":
+        return 0 if record(arguments.output, arguments.settings, arguments.targets, arguments.sources) else 1
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication(sys.argv[:1]) # noqa: F841
+    recording = load_recording(arguments.recording)
+    if arguments.repeat > 1 and len(recording) > 0:
+        length = recording[-1][0]
+        recording = [(offset + r * length, lines) for r in range(arguments.repeat) for offset, lines in recording]
+    #the widget redirects stdout while it exists, and reports putting it back; keep stdout for the results
+    with contextlib.redirect_stdout(sys.stderr):
+        results = replay(recording, rate=arguments.rate, speed=arguments.speed, maxlines=arguments.maxlines)
+    results = dict(results, format=RESULTS_FORMAT, recording=os.path.basename(arguments.recording),
+        rate=arguments.rate, speed=arguments.speed)
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if len(arguments.output) > 0:
+        with open(arguments.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if len(arguments.compare) > 0:
+        with open(arguments.compare, "r") as f:
+            worse = compare(json.load(f), results, arguments.threshold)
+        for line in worse:
+            print("WORSE: " + line, file=sys.stderr)
+        return 1 if len(worse) > 0 else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
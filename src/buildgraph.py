@@ -0,0 +1,212 @@
+import concurrent.futures, dataclasses, enum, logging, os, time, typing
+
+from data import ProjectInformation, ProjectCommands
+
+logger = logging.getLogger(__name__)
+
+class BuildStatus(enum.Enum):
+    '''
+    The state of a single project within an orchestrated build.
+    '''
+    PENDING = "pending"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    SKIPPED = "skipped" #a dependency failed, so this project was never started
+
+@dataclasses.dataclass
+class BuildResult:
+    '''
+    The outcome of building one project in a BuildGraph.
+    '''
+    name: str
+    status: BuildStatus = BuildStatus.PENDING
+    duration: float = 0.0
+    reason: str = ""
+
+class BuildGraph:
+    '''
+    A set of named projects and the dependencies between them.  A dependency
+    means the depended-upon project must be built successfully before the
+    dependent project is started.
+    '''
+    def __init__(self):
+        self._projects: typing.Dict[str, ProjectInformation] = {}
+        self._dependencies: typing.Dict[str, typing.Set[str]] = {}
+
+    def add_project(self, name: str, project: ProjectInformation,
+        depends_on: typing.Iterable[str]=()) -> None:
+        if name in self._projects:
+            raise ValueError(f"{BuildGraph.add_project.__qualname__}: \"{name}\" was already added!")
+        self._projects[name] = project
+        self._dependencies[name] = set(depends_on)
+
+    def add_dependency(self, name: str, dependency: str) -> None:
+        '''
+        Declares that the project called name depends on the project called dependency.
+        '''
+        if name not in self._projects:
+            raise KeyError(name)
+        self._dependencies[name].add(dependency)
+
+    def project(self, name: str) -> ProjectInformation:
+        return self._projects[name]
+
+    def names(self) -> typing.List[str]:
+        return list(self._projects)
+
+    def dependencies(self, name: str) -> typing.Set[str]:
+        return set(self._dependencies[name])
+
+    def dependents(self) -> typing.Dict[str, typing.Set[str]]:
+        '''
+        Returns the reverse of the dependency mapping: for each project, the projects
+        that directly depend on it.
+        '''
+        reverse = {name: set() for name in self._projects}
+        for name, deps in self._dependencies.items():
+            for d in deps:
+                reverse[d].add(name)
+        return reverse
+
+    def validate(self) -> None:
+        '''
+        Raises a ValueError if a dependency refers to an unknown project or
+        if the graph contains a cycle.
+        '''
+        for name, deps in self._dependencies.items():
+            unknown = deps - set(self._projects)
+            if len(unknown) > 0:
+                raise ValueError(f"\"{name}\" depends on unknown project(s): {sorted(unknown)}")
+        self.topological_order()
+
+    def topological_order(self) -> typing.List[str]:
+        '''
+        Returns the project names ordered so that every project comes after
+        all of its dependencies.
+        '''
+        remaining = {name: len(deps) for name, deps in self._dependencies.items()}
+        reverse = self.dependents()
+        ready = [name for name, count in remaining.items() if count == 0]
+        order = []
+        while len(ready) > 0:
+            name = ready.pop(0)
+            order.append(name)
+            for d in sorted(reverse[name]):
+                remaining[d] -= 1
+                if remaining[d] == 0:
+                    ready.append(d)
+        if len(order) != len(self._projects):
+            cyclic = sorted(set(self._projects) - set(order))
+            raise ValueError(f"Dependency cycle between projects: {cyclic}")
+        return order
+
+    def critical_path_lengths(self) -> typing.Dict[str, int]:
+        '''
+        For each project, the number of projects on the longest chain of
+        dependents that waits on it (including itself).  Starting projects
+        with long chains first keeps the rest of the graph from stalling.
+        '''
+        reverse = self.dependents()
+        lengths: typing.Dict[str, int] = {}
+        for name in reversed(self.topological_order()):
+            lengths[name] = 1 + max((lengths[d] for d in reverse[name]), default=0)
+        return lengths
+
+def default_runner(project: ProjectInformation, commands: ProjectCommands) -> bool:
+    return project.execute(commands=commands)
+
+class BuildOrchestrator:
+    '''
+    Builds every project in a BuildGraph in dependency order, running projects
+    that do not depend on each other concurrently.
+
+    When a project fails, every project that (transitively) depends on it is
+    skipped.  Projects that are unrelated to the failure keep building.
+    '''
+    def __init__(self, graph: BuildGraph, max_concurrency: int=0,
+        commands: ProjectCommands=(ProjectCommands.CMAKE | ProjectCommands.MAKE),
+        runner: typing.Callable[[ProjectInformation, ProjectCommands], bool]=default_runner):
+        '''
+        max_concurrency: the maximum number of projects to build at once.  0 means
+            one project per cpu.
+        runner: the function used to build a single project.  Defaults to
+            ProjectInformation.execute.
+        '''
+        self.graph = graph
+        self.max_concurrency = max_concurrency if max_concurrency > 0 else (os.cpu_count() or 1)
+        self.commands = commands
+        self.runner = runner
+
+    def run(self) -> typing.Dict[str, BuildResult]:
+        '''
+        Builds the graph and returns a result for every project, keyed by name.
+        '''
+        self.graph.validate()
+        results = {name: BuildResult(name=name) for name in self.graph.names()}
+        reverse = self.graph.dependents()
+        priority = self.graph.critical_path_lengths()
+        waiting = {name: len(self.graph.dependencies(name)) for name in results}
+        ready = [name for name, count in waiting.items() if count == 0]
+        running: typing.Dict[concurrent.futures.Future, str] = {}
+
+        logger.info(f"Building {len(results)} project(s), at most {self.max_concurrency} at a time.")
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_concurrency,
+            thread_name_prefix="cppbuilder-build") as pool:
+            while len(ready) > 0 or len(running) > 0:
+                ready.sort(key=lambda n: (-priority[n], n))
+                while len(ready) > 0 and len(running) < self.max_concurrency:
+                    name = ready.pop(0)
+                    logger.info(f"Starting build of \"{name}\"")
+                    running[pool.submit(self._build, name)] = name
+
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    results[name] = future.result()
+                    if results[name].status == BuildStatus.SUCCEEDED:
+                        for d in reverse[name]:
+                            waiting[d] -= 1
+                            if waiting[d] == 0 and results[d].status == BuildStatus.PENDING:
+                                ready.append(d)
+                    else:
+                        logger.error(f"Build of \"{name}\" failed; skipping its dependents.")
+                        self._skip_dependents(name, reverse, results)
+        return results
+
+    def _build(self, name: str) -> BuildResult:
+        start = time.monotonic()
+        try:
+            success = self.runner(self.graph.project(name), self.commands)
+            reason = "" if success else "build failed"
+        except Exception as e:
+            logger.exception(f"Build of \"{name}\" raised an exception")
+            success = False
+            reason = repr(e)
+        return BuildResult(name=name,
+            status=(BuildStatus.SUCCEEDED if success else BuildStatus.FAILED),
+            duration=(time.monotonic() - start),
+            reason=reason)
+
+    def _skip_dependents(self, failed: str, reverse: typing.Dict[str, typing.Set[str]],
+        results: typing.Dict[str, BuildResult]) -> None:
+        pending = list(reverse[failed])
+        while len(pending) > 0:
+            name = pending.pop()
+            if results[name].status != BuildStatus.PENDING:
+                continue
+            results[name] = BuildResult(name=name, status=BuildStatus.SKIPPED,
+                reason=f"dependency \"{failed}\" did not build")
+            pending += list(reverse[name])
+
+def report(results: typing.Dict[str, BuildResult]) -> str:
+    '''
+    Returns a human-readable, one-line-per-project summary of a BuildOrchestrator run.
+    '''
+    width = max((len(name) for name in results), default=0)
+    lines = []
+    for r in results.values():
+        line = f"{r.name.ljust(width)}  {r.status.value:<9}  {r.duration:8.2f}s"
+        if len(r.reason) > 0:
+            line += "  " + r.reason
+        lines.append(line)
+    return os.linesep.join(lines)
@@ -0,0 +1,265 @@
+'''
+A persistent record of how long every build phase took, so that changes to
+the toolchain, flags or project can be compared against earlier runs.
+
+Run this file directly for a report:
+    python buildhistory.py [--project DIR] [--limit N] [--threshold 0.1]
+'''
+import argparse, dataclasses, logging, os, sqlite3, threading, time, typing
+
+from data import Configuration, ProjectInformation
+from execution import ExecutionResult
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    project TEXT NOT NULL,
+    generator TEXT NOT NULL,
+    configuration TEXT NOT NULL,
+    started REAL NOT NULL,
+    success INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_by_key ON runs (project, generator, configuration, started);
+CREATE TABLE IF NOT EXISTS phases (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    phase TEXT NOT NULL,
+    wall REAL NOT NULL,
+    cpu REAL,
+    peak_rss INTEGER,
+    returncode INTEGER NOT NULL,
+    skipped INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS phases_by_run ON phases (run_id);
+'''
+
+@dataclasses.dataclass
+class PhaseRecord:
+    phase: str
+    wall: float
+    cpu: typing.Optional[float] = None
+    peak_rss: typing.Optional[int] = None
+    returncode: int = 0
+    skipped: bool = False
+
+@dataclasses.dataclass
+class RunRecord:
+    id: int
+    project: str
+    generator: str
+    configuration: str
+    started: float
+    success: bool
+    phases: typing.List[PhaseRecord] = dataclasses.field(default_factory=list)
+
+    def phase(self, name: str) -> typing.Optional[PhaseRecord]:
+        for p in self.phases:
+            if p.phase == name:
+                return p
+        return None
+
+@dataclasses.dataclass
+class Regression:
+    '''
+    A phase of the latest run that took noticeably longer than it usually does.
+    '''
+    project: str
+    generator: str
+    configuration: str
+    phase: str
+    wall: float
+    baseline: float #median of the earlier runs
+
+    @property
+    def change(self) -> float:
+        return (self.wall - self.baseline) / self.baseline if self.baseline > 0 else 0.0
+
+def configuration_name(project: ProjectInformation) -> str:
+    '''
+    The build configuration part of a history key: the build type ("default" if
+    none is set), then the c++ compiler and any extra cmake definitions, so that
+    the cells of a build matrix are kept apart.  A project with neither a build
+    type nor definitions is "default", the key of every run recorded before
+    configurations were told apart.
+    '''
+    if len(project.build_type) == 0 and len(project.cmake_definitions) == 0:
+        return "default"
+    parts = [project.build_type if len(project.build_type) > 0 else "default"]
+    if len(project.cpp_compiler) > 0:
+        parts.append(os.path.basename(project.cpp_compiler))
+    parts += [f"{name}={project.cmake_definitions[name]}" for name in sorted(project.cmake_definitions)]
+    return " ".join(parts)
+
+class BuildHistory:
+    '''
+    Build phase measurements, stored in an sqlite database under
+    Configuration.program_home.  Runs are keyed by project directory, generator
+    and build configuration.
+    '''
+    default_filename: str = os.path.join(Configuration.program_home, "history.db")
+
+    def __init__(self, filename: str=""):
+        self.filename = filename if len(filename) > 0 else BuildHistory.default_filename
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.filename, timeout=30)
+        connection.execute("PRAGMA foreign_keys = ON")
+        with self._lock:
+            if not self._initialized:
+                connection.executescript(_SCHEMA)
+                self._initialized = True
+        return connection
+
+    def record(self, project: ProjectInformation, result: ExecutionResult,
+        started: typing.Optional[float]=None) -> int:
+        '''
+        Stores the phases of result.  Returns the id of the new run.
+        '''
+        if len(result.commands) == 0:
+            return -1
+        if started is None:
+            started = time.time() - result.duration
+        directory = os.path.dirname(self.filename)
+        if len(directory) > 0:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connect()
+        try:
+            with connection:
+                cursor = connection.execute(
+                    "INSERT INTO runs (project, generator, configuration, started, success) VALUES (?, ?, ?, ?, ?)",
+                    (os.path.abspath(project.project_directory), project.generator_type.generator_name,
+                        configuration_name(project), started, int(result.success)))
+                run_id = cursor.lastrowid
+                connection.executemany(
+                    "INSERT INTO phases (run_id, phase, wall, cpu, peak_rss, returncode, skipped) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(run_id, c.phase, c.duration, c.cpu_time, c.peak_rss, c.returncode, int(c.skipped))
+                        for c in result.commands])
+        finally:
+            connection.close()
+        logger.debug(f"Recorded build run {run_id} in {self.filename}")
+        return run_id
+
+    def runs(self, project: typing.Optional[str]=None, generator: typing.Optional[str]=None,
+        configuration: typing.Optional[str]=None, limit: int=20, successful_only: bool=False) -> typing.List[RunRecord]:
+        '''
+        Returns recorded runs, newest first, optionally restricted to one project,
+        generator and/or configuration.
+        '''
+        if not os.path.isfile(self.filename):
+            return []
+        conditions, arguments = [], []
+        for column, value in (("project", project), ("generator", generator), ("configuration", configuration)):
+            if value is not None:
+                conditions.append(column + " = ?")
+                arguments.append(os.path.abspath(value) if column == "project" else value)
+        if successful_only:
+            conditions.append("success = 1")
+        where = (" WHERE " + " AND ".join(conditions)) if len(conditions) > 0 else ""
+        connection = self._connect()
+        try:
+            rows = connection.execute("SELECT id, project, generator, configuration, started, success FROM runs"
+                + where + " ORDER BY started DESC LIMIT ?", arguments + [limit]).fetchall()
+            runs = [RunRecord(id=r[0], project=r[1], generator=r[2], configuration=r[3], started=r[4],
+                success=bool(r[5])) for r in rows]
+            byid = {r.id: r for r in runs}
+            if len(byid) > 0:
+                marks = ",".join("?" * len(byid))
+                for p in connection.execute("SELECT run_id, phase, wall, cpu, peak_rss, returncode, skipped FROM phases "
+                    f"WHERE run_id IN ({marks}) ORDER BY rowid", list(byid)):
+                    byid[p[0]].phases.append(PhaseRecord(phase=p[1], wall=p[2], cpu=p[3], peak_rss=p[4],
+                        returncode=p[5], skipped=bool(p[6])))
+        finally:
+            connection.close()
+        return runs
+
+    def keys(self) -> typing.List[typing.Tuple[str, str, str]]:
+        '''
+        Returns every (project, generator, configuration) that has recorded runs.
+        '''
+        if not os.path.isfile(self.filename):
+            return []
+        connection = self._connect()
+        try:
+            return [tuple(r) for r in connection.execute(
+                "SELECT DISTINCT project, generator, configuration FROM runs ORDER BY project, generator, configuration")]
+        finally:
+            connection.close()
+
+    def trend(self, project: str, phase: str, generator: typing.Optional[str]=None,
+        configuration: typing.Optional[str]=None, limit: int=20) -> typing.List[typing.Tuple[float, float]]:
+        '''
+        Returns (started, wall seconds) for phase over the most recent successful runs,
+        oldest first.  Runs where the phase was skipped are left out.
+        '''
+        points = []
+        for run in self.runs(project, generator, configuration, limit=limit, successful_only=True):
+            p = run.phase(phase)
+            if p is not None and not p.skipped:
+                points.append((run.started, p.wall))
+        return list(reversed(points))
+
+    def regressions(self, threshold: float=0.10, window: int=5,
+        project: typing.Optional[str]=None) -> typing.List[Regression]:
+        '''
+        Compares each phase of the latest successful run of every key with the median
+        of up to window successful runs before it, and returns the phases that got
+        slower by more than threshold (0.10 = 10%).
+        '''
+        import statistics
+        found = []
+        for key in self.keys():
+            if project is not None and key[0] != os.path.abspath(project):
+                continue
+            runs = self.runs(*key, limit=window + 1, successful_only=True)
+            if len(runs) < 2:
+                continue
+            latest, earlier = runs[0], runs[1:]
+            for p in latest.phases:
+                if p.skipped:
+                    continue
+                previous = [e.phase(p.phase) for e in earlier]
+                previous = [e.wall for e in previous if e is not None and not e.skipped]
+                if len(previous) == 0:
+                    continue
+                baseline = statistics.median(previous)
+                if baseline > 0 and (p.wall - baseline) / baseline > threshold:
+                    found.append(Regression(*key, phase=p.phase, wall=p.wall, baseline=baseline))
+        return found
+
+def report(history: BuildHistory, project: typing.Optional[str]=None, limit: int=10,
+    threshold: float=0.10) -> str:
+    '''
+    Returns a text report of recent phase timings for every key, and any regressions.
+    '''
+    lines = []
+    for key in history.keys():
+        if project is not None and key[0] != os.path.abspath(project):
+            continue
+        lines.append(f"{key[0]}  [{key[1]}, {key[2]}]")
+        for run in history.runs(*key, limit=limit):
+            when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(run.started))
+            phases = ", ".join(f"{p.phase} " + ("skipped" if p.skipped else f"{p.wall:.2f}s") for p in run.phases)
+            lines.append(f"    {when}  {'ok  ' if run.success else 'FAIL'}  {phases}")
+    regressions = history.regressions(threshold=threshold, project=project)
+    if len(regressions) > 0:
+        lines.append("")
+        lines.append("Regressions:")
+        for r in regressions:
+            lines.append(f"    {r.project} [{r.generator}, {r.configuration}] {r.phase}: "
+                f"{r.wall:.2f}s vs {r.baseline:.2f}s median (+{r.change * 100:.0f}%)")
+    if len(lines) == 0:
+        return "No builds recorded."
+    return os.linesep.join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build timing history report")
+    parser.add_argument("--project", default=None, help="only report on this project directory")
+    parser.add_argument("--limit", type=int, default=10, help="runs to show per project")
+    parser.add_argument("--threshold", type=float, default=0.10, help="slowdown that counts as a regression")
+    parser.add_argument("--database", default="", help="history database (default: ~/.cppbuilder/history.db)")
+    arguments = parser.parse_args()
+    print(report(BuildHistory(arguments.database), project=arguments.project, limit=arguments.limit,
+        threshold=arguments.threshold))
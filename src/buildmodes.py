@@ -0,0 +1,207 @@
+'''
+Unity builds and precompiled headers, and an A/B comparison of a project's
+build with and without them.
+
+Unity builds are cmake's own (ProjectInformation.unity_build sets
+CMAKE_UNITY_BUILD).  CMake has no setting that precompiles headers in every
+target, so for ProjectInformation.precompiled_headers a small script (the
+project include), written into the build directory and run through
+CMAKE_PROJECT_INCLUDE, adds them to every target once the top level
+CMakeLists.txt has been read.  That needs CMake 3.19 or newer; older versions
+build without them, with a warning.  The same script applies the linker
+setting for cmake versions that can not do that themselves (see linker.py).
+
+Whether either pays off depends on the project, so compare_modes builds it
+both ways, from clean, and reports the difference:
+
+    comparison = compare_modes(project, variant, repeat=3)
+    print(comparison.summary())
+'''
+import dataclasses, logging, os, statistics, typing
+
+from cleaner import CleanMode
+from data import ProjectCommands, ProjectInformation
+from outputpipe import OutputConsumer, TailConsumer
+
+logger = logging.getLogger(__name__)
+
+HEADERS_VARIABLE = "CPPBUILDER_PRECOMPILE_HEADERS"
+PROJECT_INCLUDE_FILENAME = ".cppbuilder_project.cmake"
+#the cache entries the build modes set, which are taken out again once they are turned off
+CACHE_ENTRIES = ["CMAKE_UNITY_BUILD", "CMAKE_UNITY_BUILD_BATCH_SIZE", "CMAKE_PROJECT_INCLUDE", HEADERS_VARIABLE]
+
+_PROJECT_INCLUDE = '''\
+# Written by cppbuilder: links every target with the linker in CPPBUILDER_LINKER, and adds
+# the headers in CPPBUILDER_PRECOMPILE_HEADERS to the precompiled headers of every target.
+# Included after every project() call.
+include_guard(GLOBAL)
+if(CPPBUILDER_LINKER)
+    add_link_options("-fuse-ld=${CPPBUILDER_LINKER}")
+endif()
+
+if(NOT CPPBUILDER_PRECOMPILE_HEADERS)
+    return()
+elseif(CMAKE_VERSION VERSION_LESS 3.19)
+    message(WARNING "cppbuilder: precompiled headers need CMake 3.19 or newer; building without them.")
+    return()
+endif()
+
+function(_cppbuilder_targets directory out)
+    get_property(targets DIRECTORY "${directory}" PROPERTY BUILDSYSTEM_TARGETS)
+    get_property(subdirectories DIRECTORY "${directory}" PROPERTY SUBDIRECTORIES)
+    foreach(subdirectory IN LISTS subdirectories)
+        _cppbuilder_targets("${subdirectory}" more)
+        list(APPEND targets ${more})
+    endforeach()
+    set(${out} ${targets} PARENT_SCOPE)
+endfunction()
+
+function(_cppbuilder_precompile_headers)
+    set(headers "")
+    foreach(header IN LISTS CPPBUILDER_PRECOMPILE_HEADERS)
+        if(NOT header MATCHES "^<" AND NOT IS_ABSOLUTE "${header}")
+            set(header "${CMAKE_SOURCE_DIR}/${header}")
+        endif()
+        list(APPEND headers "$<$<COMPILE_LANGUAGE:CXX>:${header}>")
+    endforeach()
+    _cppbuilder_targets("${CMAKE_SOURCE_DIR}" targets)
+    foreach(target IN LISTS targets)
+        get_target_property(type ${target} TYPE)
+        get_target_property(reused ${target} PRECOMPILE_HEADERS_REUSE_FROM)
+        if(type MATCHES "^(STATIC_LIBRARY|SHARED_LIBRARY|MODULE_LIBRARY|OBJECT_LIBRARY|EXECUTABLE)$" AND NOT reused)
+            set_property(TARGET ${target} APPEND PROPERTY PRECOMPILE_HEADERS ${headers})
+        endif()
+    endforeach()
+endfunction()
+
+cmake_language(DEFER DIRECTORY "${CMAKE_SOURCE_DIR}" CALL _cppbuilder_precompile_headers)
+'''
+
+def project_include_path(build_directory: str) -> str:
+    #absolute: cmake would look for a relative one from the build directory, not from here
+    return os.path.join(os.path.abspath(build_directory), PROJECT_INCLUDE_FILENAME)
+
+def write_project_include(build_directory: str) -> str:
+    '''
+    Writes the project include into build_directory, unless it is there
+    already, and returns its path.
+    '''
+    path = project_include_path(build_directory)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            if f.read() == _PROJECT_INCLUDE:
+                return path
+    except OSError:
+        pass
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(_PROJECT_INCLUDE)
+    return path
+
+def describe(project: ProjectInformation) -> str:
+    '''
+    Returns a short description of the build modes of project, like
+    "unity (batch 16) + pch <vector>".
+    '''
+    parts = []
+    if project.unity_build:
+        parts.append("unity" + (f" (batch {project.unity_batch_size})" if project.unity_batch_size > 0 else ""))
+    if len(project.precompiled_headers) > 0:
+        parts.append("pch " + ", ".join(project.precompiled_headers))
+    return " + ".join(parts) or "plain"
+
+@dataclasses.dataclass
+class ModeComparison:
+    '''
+    The timings of the baseline and variant builds of compare_modes: one
+    {phase: seconds} per build.
+    '''
+    baseline: str
+    variant: str
+    baseline_runs: typing.List[typing.Dict[str, float]] = dataclasses.field(default_factory=list)
+    variant_runs: typing.List[typing.Dict[str, float]] = dataclasses.field(default_factory=list)
+    error: str = ""
+
+    @staticmethod
+    def _median(runs: typing.List[typing.Dict[str, float]], phase: str) -> float:
+        values = [sum(r.values()) if phase == "total" else r.get(phase, 0.0) for r in runs]
+        return statistics.median(values) if len(values) > 0 else 0.0
+
+    def median(self, variant: bool, phase: str="total") -> float:
+        '''
+        The median seconds of phase ("total" for all of them) over the variant's
+        or the baseline's builds.
+        '''
+        return self._median(self.variant_runs if variant else self.baseline_runs, phase)
+
+    def difference(self, phase: str="total") -> float:
+        '''
+        The seconds the variant saves over the baseline (negative if it is slower).
+        '''
+        return self.median(False, phase) - self.median(True, phase)
+
+    def speedup(self, phase: str="total") -> float:
+        variant = self.median(True, phase)
+        return self.median(False, phase) / variant if variant > 0 else 0.0
+
+    def todict(self) -> dict:
+        phases = ["configure", "build", "total"]
+        return {"baseline": self.baseline, "variant": self.variant, "error": self.error,
+            "runs": len(self.variant_runs),
+            "median": {p: {"baseline": round(self.median(False, p), 4), "variant": round(self.median(True, p), 4)}
+                for p in phases},
+            "difference": {p: round(self.difference(p), 4) for p in phases},
+            "speedup": round(self.speedup(), 3)}
+
+    def summary(self) -> str:
+        if len(self.error) > 0:
+            return f"Comparison of {self.baseline} and {self.variant} failed: {self.error}"
+        lines = [f"baseline: {self.baseline}", f"variant:  {self.variant}",
+            f"{'':10}{'baseline':>12}{'variant':>12}{'saved':>12}"]
+        for phase in ["configure", "build", "total"]:
+            lines.append(f"{phase:10}{self.median(False, phase):11.2f}s{self.median(True, phase):11.2f}s"
+                f"{self.difference(phase):11.2f}s")
+        lines.append(f"{self.variant} is {self.speedup():.2f}x as fast as {self.baseline} "
+            f"(median of {len(self.variant_runs)} clean build(s))")
+        return os.linesep.join(lines)
+
+def compare_modes(project: ProjectInformation, variant: typing.Optional[ProjectInformation]=None,
+    repeat: int=1, consumers: typing.Optional[typing.Callable[[str], typing.List[OutputConsumer]]]=None
+    ) -> ModeComparison:
+    '''
+    Builds project from clean without unity builds or precompiled headers (the
+    baseline) and variant (default: project, as it is set up), each repeat
+    times, taking turns so that both see the same machine.  The two build in
+    <build directory>/ab-baseline and <build directory>/ab-variant, so neither
+    disturbs the project's own build.
+
+    consumers: returns the output consumers of "baseline" or "variant" builds
+    (default: the output is dropped).
+    '''
+    baseline = project.copy()
+    baseline.unity_build, baseline.unity_batch_size, baseline.precompiled_headers = False, 0, []
+    variant = (variant if variant is not None else project).copy()
+    if describe(variant) == describe(baseline):
+        raise ValueError(f"{compare_modes.__qualname__}: the variant has neither a unity build nor precompiled headers")
+    build = project.build_directory
+    if not os.path.isabs(build):
+        build = os.path.join(project.project_directory, build)
+    comparison = ModeComparison(baseline=describe(baseline), variant=describe(variant))
+    builds = [("baseline", baseline, comparison.baseline_runs), ("variant", variant, comparison.variant_runs)]
+    for name, built, _ in builds:
+        built.build_directory = os.path.join(build, "ab-" + name)
+        built.clean_mode = CleanMode.FULL
+    for run in range(max(1, repeat)):
+        for name, built, runs in builds:
+            tail = TailConsumer(maxlines=1)
+            outputs = list(consumers(name)) if consumers is not None else []
+            logger.info(f"A/B build {run + 1} of {max(1, repeat)}: {name} ({describe(built)})")
+            if not built.execute(ProjectCommands.CLEAN | ProjectCommands.CMAKE | ProjectCommands.MAKE,
+                consumers=outputs + [tail]):
+                comparison.error = f"the {name} build failed" + (f": {tail.lines[-1]}" if len(tail.lines) > 0 else "")
+                return comparison
+            timings: typing.Dict[str, float] = {}
+            for c in built.last_result.commands:
+                if c.phase != "clean" and len(c.part_of) == 0:
+                    timings[c.phase] = timings.get(c.phase, 0.0) + c.duration
+            runs.append(timings)
+    return comparison
@@ -0,0 +1,154 @@
+import enum, logging, os, threading, typing
+
+if typing.TYPE_CHECKING:
+    import concurrent.futures
+
+logger = logging.getLogger(__name__)
+
+class CleanMode(enum.Enum):
+    '''
+    The ways ProjectCommands.CLEAN can clean a build directory.
+    '''
+    FULL = "full"       #throw away the entire build directory
+    TARGET = "target"   #run the generator's own "clean" target, keeping the cmake cache
+    ORPHANS = "orphans" #remove object files whose source files no longer exist
+
+TRASH_MARKER: str = ".trash-"
+OBJECT_EXTENSIONS: typing.Tuple[str, ...] = (".o", ".obj")
+
+_pool: typing.Optional["concurrent.futures.ThreadPoolExecutor"] = None
+_pool_lock = threading.Lock()
+_pending: typing.List["concurrent.futures.Future"] = []
+
+def _deletion_pool() -> "concurrent.futures.ThreadPoolExecutor":
+    import concurrent.futures
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="cppbuilder-clean")
+        return _pool
+
+def _delete_tree(path: str) -> None:
+    import shutil
+    shutil.rmtree(path, ignore_errors=True)
+    if os.path.exists(path):
+        logger.warning(f"Unable to completely delete \"{path}\"")
+    else:
+        logger.debug(f"Deleted \"{path}\"")
+
+def discard_directory(directory: str) -> bool:
+    '''
+    Moves directory out of the way with a single rename and deletes it on a
+    background thread, so a new directory can be created at the same path
+    immediately.  Leftovers from earlier discards that never finished (the
+    program exited, for instance) are deleted as well.
+
+    A directory that can not be moved (a mount point, for instance) is emptied in
+    place instead.  Returns False if that failed too.
+    '''
+    directory = os.path.abspath(directory)
+    if not os.path.exists(directory):
+        return True
+    trash = directory + TRASH_MARKER + os.urandom(16).hex()
+    try:
+        os.rename(directory, trash)
+    except OSError as e:
+        logger.info(f"Unable to move \"{directory}\" aside for deletion ({e!r}); deleting its contents in place.")
+        return _empty_directory(directory)
+    logger.info(f"Cleaned \"{directory}\"; deleting the old contents in the background.")
+
+    parent, name = os.path.split(directory)
+    leftovers = [os.path.join(parent, n) for n in os.listdir(parent) if n.startswith(name + TRASH_MARKER)]
+    pool = _deletion_pool()
+    with _pool_lock:
+        _pending[:] = [f for f in _pending if not f.done()]
+        _pending.extend(pool.submit(_delete_tree, path) for path in leftovers)
+    return True
+
+def _empty_directory(directory: str) -> bool:
+    import shutil
+    try:
+        entries = list(os.scandir(directory))
+    except OSError as e:
+        logger.error(f"Unable to clean \"{directory}\": " + repr(e))
+        return False
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
+            else:
+                os.remove(entry.path)
+        except OSError as e:
+            logger.error(f"Unable to clean \"{directory}\": " + repr(e))
+            return False
+    logger.info(f"Cleaned \"{directory}\"")
+    return True
+
+def wait_for_discards(timeout: typing.Optional[float]=None) -> bool:
+    '''
+    Blocks until every background deletion started by discard_directory has
+    finished.  Returns False if the timeout expired first.
+    '''
+    with _pool_lock:
+        pending = list(_pending)
+    import concurrent.futures
+    _, not_done = concurrent.futures.wait(pending, timeout=timeout)
+    return len(not_done) == 0
+
+def _source_for_object(relative_object: str) -> typing.Optional[str]:
+    '''
+    Maps an object file path (relative to the build directory) back to the
+    source file it was compiled from, relative to the source tree or, for
+    sources generated into the build tree (moc, autogen, configure_file), to
+    the build tree.  That is the layout cmake generates:
+        <subdir>/CMakeFiles/<target>.dir/<source path relative to subdir>.o
+
+    Returns None if the object is not in that layout or the source lives outside
+    both trees (cmake encodes those with "__"), since we can not tell whether
+    those are orphaned.
+    '''
+    parts = relative_object.split(os.sep)
+    if "CMakeFiles" not in parts:
+        return None
+    index = parts.index("CMakeFiles")
+    if index + 2 >= len(parts) or not parts[index + 1].endswith(".dir"):
+        return None
+    source_parts = parts[:index] + parts[index + 2:]
+    if "__" in source_parts:
+        return None
+    return os.path.splitext(os.path.join(*source_parts))[0] #strip the object extension, leaving "file.cpp"
+
+def prune_orphans(build_directory: str, source_directory: str) -> int:
+    '''
+    Removes object files (and their dependency files) from build_directory whose
+    source files no longer exist, neither under source_directory nor, as
+    generated sources, under build_directory.  Returns the number of object
+    files removed.
+
+    Binary directories with no matching source directory (FetchContent's
+    _deps/*-build, add_subdirectory with an explicit binary directory) are left
+    alone, since their objects can not be mapped back to sources.
+    '''
+    removed = 0
+    for root, directories, files in os.walk(build_directory):
+        relative = os.path.relpath(root, build_directory)
+        if "CMakeFiles" not in relative.split(os.sep):
+            directories[:] = [d for d in directories
+                if d == "CMakeFiles" or os.path.isdir(os.path.join(source_directory, relative, d))]
+        for name in files:
+            if not name.endswith(OBJECT_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            source = _source_for_object(os.path.relpath(path, build_directory))
+            if source is None or os.path.exists(os.path.join(source_directory, source)) \
+                or os.path.exists(os.path.join(build_directory, source)):
+                continue
+            for stale in (path, path + ".d", os.path.splitext(path)[0] + ".d"):
+                try:
+                    os.remove(stale)
+                except FileNotFoundError:
+                    pass
+            logger.debug(f"Removed orphaned object file \"{path}\"")
+            removed += 1
+    logger.info(f"Removed {removed} orphaned object file(s) from \"{build_directory}\"")
+    return removed
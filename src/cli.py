@@ -0,0 +1,282 @@
+'''
+The command line interface, for scripts and CI:
+
+    python cli.py [--project DIR] [--json] build [--target T ...] [--jobs N] [--clean] [--linker L] [--time-links]
+    python cli.py [--project DIR] [--json] configure
+    python cli.py [--project DIR] [--json] clean [--mode full|target|orphans]
+    python cli.py [--project DIR] [--json] status
+    python cli.py [--project DIR] watch [--queue]
+    python cli.py [--project DIR] [--json] build --agent HOST:PORT [--agent ...] [--artifact PATTERN ...]
+    python cli.py agent [--listen HOST:PORT] [--capacity N] [--workspace DIR] [--token TOKEN | --insecure]
+    python cli.py [--project DIR] [--json] compare [--unity] [--unity-batch N] [--pch HEADER ...] [--repeat N]
+
+Project settings come from --settings (a file written by
+ProjectInformation.tojson), or else from the project registry, or else from
+the program configuration.  With --json, exactly one json object is printed
+to stdout and the build output goes to stderr.
+
+This never imports PyQt5 or globaldata, and imports the rest only when a
+command needs it, so that it starts quickly.
+'''
+import argparse, json, logging, os, sys, typing
+
+from data import Configuration, ProjectCommands, ProjectInformation, SupportedCmakeGenerators, current_os, toolchains
+from cleaner import CleanMode
+
+logger = logging.getLogger(__name__)
+
+EXIT_SUCCESS = 0
+EXIT_FAILURE = 1
+EXIT_INTERRUPTED = 130
+
+_GENERATORS = {
+    "ninja": SupportedCmakeGenerators.NINJA,
+    "ninja-multi": SupportedCmakeGenerators.NINJA_MULTI_CONFIG,
+    "make": SupportedCmakeGenerators.UNIX_MAKEFILE,
+    "nmake": SupportedCmakeGenerators.NMAKE_MAKEFILE}
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cppbuilder", description="Configure and build CMake projects.")
+    parser.add_argument("--project", default=os.getcwd(), help="the project directory (default: the current one)")
+    parser.add_argument("--settings", default="", help="a project settings json file")
+    parser.add_argument("--build-dir", default="", help="the build directory")
+    parser.add_argument("--generator", choices=sorted(_GENERATORS), default=None)
+    parser.add_argument("--json", action="store_true", help="print the result as json")
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="log more (repeat for debug)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="configure if needed, then build")
+    build.add_argument("--target", action="append", default=None, help="a target to build (repeatable)")
+    build.add_argument("--jobs", "-j", type=int, default=None, help="parallel jobs (0: one per cpu)")
+    build.add_argument("--clean", action="store_true", help="clean first")
+    build.add_argument("--no-configure", action="store_true", help="do not run the configure step")
+    build.add_argument("--no-history", action="store_true", help="do not record the timings")
+    build.add_argument("--linker", default=None, help="default, auto (the fastest available), mold, lld, gold or bfd")
+    build.add_argument("--time-links", action="store_true", help="report the time spent linking as a phase")
+    build.add_argument("--agent", action="append", default=None, help="build on this build agent (repeatable)")
+    build.add_argument("--artifact", action="append", default=[],
+        help="with --agent: a glob, relative to the build directory, of files to copy back (repeatable)")
+
+    configure = commands.add_parser("configure", help="run the configure step if anything it depends on changed")
+    configure.add_argument("--force", action="store_true", help="configure even if it is up to date")
+
+    clean = commands.add_parser("clean", help="clean the build directory")
+    clean.add_argument("--mode", choices=[m.value for m in CleanMode], default=None)
+
+    commands.add_parser("status", help="show the project settings and the state of its build")
+
+    watch = commands.add_parser("watch", help="rebuild whenever the sources change, until interrupted")
+    watch.add_argument("--queue", action="store_true", help="let a running build finish instead of cancelling it")
+
+    compare = commands.add_parser("compare",
+        help="time clean builds with and without unity builds and precompiled headers")
+    compare.add_argument("--unity", action="store_true", help="the variant is a unity build")
+    compare.add_argument("--unity-batch", type=int, default=0, help="sources per unity file (0: cmake's default)")
+    compare.add_argument("--pch", action="append", default=[],
+        help="a header the variant precompiles in every target (repeatable; \"<vector>\" for system headers)")
+    compare.add_argument("--repeat", type=int, default=1, help="builds of each kind; the medians are compared")
+
+    agent = commands.add_parser("agent", help="serve builds for other machines, until interrupted")
+    agent.add_argument("--listen", default="127.0.0.1:7700", help="host:port or a unix socket path")
+    agent.add_argument("--capacity", type=int, default=0, help="builds at a time (0: one per cpu)")
+    agent.add_argument("--workspace", default="", help="where to build (default: in the projects' build directories)")
+    agent.add_argument("--token", default=os.environ.get("CPPBUILDER_AGENT_TOKEN", ""),
+        help="a secret clients must send (default: $CPPBUILDER_AGENT_TOKEN)")
+    agent.add_argument("--insecure", action="store_true",
+        help="serve without a token: anyone who can connect can run commands")
+    return parser
+
+def _default_generator() -> SupportedCmakeGenerators:
+    import shutil
+    if shutil.which("ninja") is not None:
+        return SupportedCmakeGenerators.NINJA
+    for g in SupportedCmakeGenerators:
+        if (g.support & current_os()) == current_os():
+            return g
+    return SupportedCmakeGenerators.NINJA
+
+def load_project(arguments: argparse.Namespace) -> ProjectInformation:
+    '''
+    Returns the settings of the project the arguments name.
+    '''
+    directory = os.path.abspath(arguments.project)
+    project = None
+    if len(arguments.settings) > 0:
+        project = ProjectInformation()
+        with open(arguments.settings, "r") as f:
+            project.fromjson(f.read())
+    else:
+        from registry import ProjectRegistry
+        if os.path.isfile(ProjectRegistry.default_filename):
+            project = ProjectRegistry().get(directory)
+        if project is None:
+            project = ProjectRegistry(config=Configuration()).new_project(directory)
+            if (project.generator_type.support & current_os()) != current_os():
+                project.generator_type = _default_generator()
+    if len(arguments.build_dir) > 0:
+        project.build_directory = os.path.abspath(arguments.build_dir)
+    if arguments.generator is not None:
+        project.generator_type = _GENERATORS[arguments.generator]
+    return project
+
+def _phase(c) -> dict:
+    return {"phase": c.phase, "command": c.command, "returncode": c.returncode, "duration": round(c.duration, 4),
+        "cpu_time": c.cpu_time, "peak_rss": c.peak_rss, "skipped": c.skipped, "cancelled": c.cancelled,
+        "lines": c.line_count, "part_of": c.part_of}
+
+def _execute(project: ProjectInformation, arguments: argparse.Namespace, commands: ProjectCommands,
+    targets: typing.Optional[typing.List[str]]=None, history: bool=False) -> typing.Tuple[int, dict]:
+    from outputpipe import StreamConsumer
+    from diagnostics import DiagnosticIndex
+    index = DiagnosticIndex()
+    consumers = [StreamConsumer(sys.stderr if arguments.json else None), index]
+    recorder = None
+    if history:
+        from buildhistory import BuildHistory
+        recorder = BuildHistory()
+    if getattr(arguments, "agent", None):
+        from distributed import RemoteExecutor, Scheduler
+        scheduler = Scheduler(arguments.agent, token=os.environ.get("CPPBUILDER_AGENT_TOKEN", ""))
+        remote = RemoteExecutor(scheduler, artifacts=arguments.artifact)
+        success = remote.execute(project, commands, consumers=consumers, history=recorder, targets=targets)
+    else:
+        success = project.execute(commands, consumers=consumers, history=recorder, targets=targets)
+    result = project.last_result
+    report = {"success": success, "duration": round(result.duration, 4) if result is not None else 0.0,
+        "phases": [_phase(c) for c in result.commands] if result is not None else [],
+        "diagnostics": index.counts()}
+    if result is not None and result.compiler_cache is not None:
+        cache = result.compiler_cache
+        report["compiler_cache"] = {"launcher": cache.launcher, "hits": cache.hits, "misses": cache.misses}
+    if not arguments.json:
+        print(index.summary())
+    if not success and not project.isvalid():
+        report["error"] = "the project settings are not valid"
+    return (EXIT_SUCCESS if success else EXIT_FAILURE), report
+
+def command_build(project: ProjectInformation, arguments: argparse.Namespace) -> typing.Tuple[int, dict]:
+    if arguments.jobs is not None:
+        project.build_jobs = arguments.jobs
+    if arguments.linker is not None:
+        project.linker = arguments.linker
+    if arguments.time_links:
+        project.time_links = True
+    commands = ProjectCommands.MAKE
+    if not arguments.no_configure:
+        commands |= ProjectCommands.CMAKE
+    if arguments.clean:
+        commands |= ProjectCommands.CLEAN
+    return _execute(project, arguments, commands, targets=arguments.target, history=not arguments.no_history)
+
+def command_configure(project: ProjectInformation, arguments: argparse.Namespace) -> typing.Tuple[int, dict]:
+    if arguments.force:
+        project.invalidate_configure_cache()
+    return _execute(project, arguments, ProjectCommands.CMAKE)
+
+def command_clean(project: ProjectInformation, arguments: argparse.Namespace) -> typing.Tuple[int, dict]:
+    if arguments.mode is not None:
+        project.clean_mode = CleanMode(arguments.mode)
+    return _execute(project, arguments, ProjectCommands.CLEAN)
+
+def command_status(project: ProjectInformation, arguments: argparse.Namespace) -> typing.Tuple[int, dict]:
+    report = {"settings": json.loads(project.tojson()), "valid": project.isvalid(),
+        "configured": os.path.isfile(os.path.join(project.build_directory, "CMakeCache.txt"))}
+    if report["configured"]:
+        cache = project.configure_cache()
+        reason = cache.reason(cache.state(project.configure_command()))
+        report["configure_reason"] = reason
+        model = project.codemodel()
+        if model is not None:
+            report["targets"] = sorted(t.name for t in model.targets.values())
+    import linker
+    compiler = toolchains().resolve(project.cpp_compiler)
+    report["linkers"] = linker.available(compiler) if compiler is not None else []
+    from buildhistory import BuildHistory
+    history = BuildHistory()
+    if os.path.isfile(history.filename):
+        runs = history.runs(project=project.project_directory, limit=1)
+        if len(runs) > 0:
+            report["last_build"] = {"started": runs[0].started, "success": runs[0].success,
+                "phases": {p.phase: p.wall for p in runs[0].phases}}
+    if not arguments.json:
+        print(f"Project:    {project.project_directory}")
+        print(f"Build:      {project.build_directory} ({project.generator_type.generator_name})")
+        print(f"Valid:      {'yes' if report['valid'] else 'no'}")
+        if report["configured"]:
+            reason = report["configure_reason"]
+            print("Configured: " + ("up to date" if len(reason) == 0 else "out of date, " + reason))
+        else:
+            print("Configured: no")
+        if "targets" in report:
+            print("Targets:    " + ", ".join(report["targets"]))
+        print("Linkers:    " + (", ".join(report["linkers"]) or "the compiler's own only"))
+        if "last_build" in report:
+            last = report["last_build"]
+            phases = ", ".join(f"{name} {wall:.2f}s" for name, wall in last["phases"].items())
+            print(f"Last build: {'succeeded' if last['success'] else 'FAILED'} ({phases})")
+    return EXIT_SUCCESS, report
+
+def command_watch(project: ProjectInformation, arguments: argparse.Namespace) -> typing.Tuple[int, dict]:
+    from watcher import MidBuildPolicy, WatchBuilder
+    builder = WatchBuilder(project, policy=(MidBuildPolicy.QUEUE if arguments.queue else MidBuildPolicy.CANCEL))
+    try:
+        builder.run()
+    except KeyboardInterrupt:
+        builder.stop()
+    return EXIT_SUCCESS, {"builds": builder.builds}
+
+def command_compare(project: ProjectInformation, arguments: argparse.Namespace) -> typing.Tuple[int, dict]:
+    from buildmodes import compare_modes
+    variant = None #without options, the project's own settings are the variant
+    if arguments.unity or len(arguments.pch) > 0:
+        variant = project.copy()
+        variant.unity_build = arguments.unity
+        variant.unity_batch_size = arguments.unity_batch
+        variant.precompiled_headers = arguments.pch
+    comparison = compare_modes(project, variant, repeat=arguments.repeat)
+    if not arguments.json:
+        print(comparison.summary())
+    return (EXIT_SUCCESS if len(comparison.error) == 0 else EXIT_FAILURE), comparison.todict()
+
+def command_agent(arguments: argparse.Namespace) -> typing.Tuple[int, dict]:
+    from agent import BuildAgent
+    agent = BuildAgent(arguments.listen, capacity=arguments.capacity, workspace=arguments.workspace,
+        token=arguments.token, insecure=arguments.insecure)
+    try:
+        agent.serve_forever()
+    except KeyboardInterrupt:
+        agent.stop()
+    return EXIT_SUCCESS, {"address": agent.address}
+
+_COMMANDS = {
+    "build": command_build,
+    "configure": command_configure,
+    "clean": command_clean,
+    "status": command_status,
+    "watch": command_watch,
+    "compare": command_compare}
+
+def main(argv: typing.Optional[typing.List[str]]=None) -> int:
+    arguments = _parser().parse_args(argv)
+    logging.basicConfig(stream=sys.stderr, format="[%(name)s] [%(levelname)s] -> %(message)s",
+        level=[logging.WARNING, logging.INFO, logging.DEBUG][min(arguments.verbose, 2)])
+    try:
+        if arguments.command == "agent": #serves other projects, not one of its own
+            code, report = command_agent(arguments)
+        else:
+            project = load_project(arguments)
+            code, report = _COMMANDS[arguments.command](project, arguments)
+    except KeyboardInterrupt:
+        code, report = EXIT_INTERRUPTED, {"error": "interrupted"}
+    except (OSError, ValueError) as e:
+        logger.error(repr(e))
+        code, report = EXIT_FAILURE, {"error": str(e)}
+    if arguments.json:
+        report = dict(report, command=arguments.command, project=os.path.abspath(arguments.project),
+            exit_code=code)
+        json.dump(report, sys.stdout, sort_keys=True)
+        sys.stdout.write("\n")
+    return code
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+import dataclasses, json, logging, os, shutil, subprocess, typing
+
+logger = logging.getLogger(__name__)
+
+# searched in this order when the launcher setting is "auto"
+KNOWN_LAUNCHERS: typing.List[str] = ["ccache", "sccache"]
+
+@dataclasses.dataclass
+class CacheStats:
+    '''
+    Compiler cache hit and miss counters.
+    '''
+    launcher: str
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+    def __sub__(self, other: "CacheStats") -> "CacheStats":
+        return CacheStats(launcher=self.launcher, hits=(self.hits - other.hits), misses=(self.misses - other.misses))
+
+    def __str__(self) -> str:
+        return (f"{os.path.basename(self.launcher)}: {self.hits} hit(s), {self.misses} miss(es) "
+            f"({self.hit_rate * 100:.0f}% hit rate)")
+
+def find_launcher(setting: str) -> typing.Optional[str]:
+    '''
+    Resolves a compiler launcher setting to the path of an executable, or None:
+        "" / "none" / "off": no launcher.
+        "auto": the first of KNOWN_LAUNCHERS found on PATH.
+        anything else: that program, by name (searched on PATH) or by path.
+    '''
+    setting = setting.strip()
+    if setting.lower() in ("", "none", "off"):
+        return None
+    if setting.lower() == "auto":
+        for name in KNOWN_LAUNCHERS:
+            path = shutil.which(name)
+            if path is not None:
+                return path
+        return None
+    path = shutil.which(setting)
+    if path is None:
+        logger.warning(f"Compiler launcher \"{setting}\" was not found; building without it.")
+    return path
+
+def _kind(launcher: str) -> str:
+    name = os.path.basename(launcher).lower()
+    return "sccache" if name.startswith("sccache") else "ccache"
+
+def read_stats(launcher: str) -> typing.Optional[CacheStats]:
+    '''
+    Returns the launcher's current counters, or None if they can not be read.
+
+    The counters belong to the cache, not to a build, so builds running at the
+    same time share them.
+    '''
+    kind = _kind(launcher)
+    command = [launcher, "--show-stats", "--stats-format", "json"] if kind == "sccache" else [launcher, "--print-stats"]
+    try:
+        output = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            stdin=subprocess.DEVNULL, timeout=30).stdout.decode("utf-8", errors="replace")
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.debug(f"Could not read compiler cache statistics: {e!r}")
+        return None
+    try:
+        return _parse_sccache(launcher, output) if kind == "sccache" else _parse_ccache(launcher, output)
+    except (ValueError, KeyError, TypeError, AttributeError):
+        logger.debug("Unrecognised compiler cache statistics: " + output[:200])
+        return None
+
+def _parse_ccache(launcher: str, output: str) -> CacheStats:
+    '''
+    ccache --print-stats prints one "name<tab>value" pair per line.
+    '''
+    values = {}
+    for line in output.splitlines():
+        fields = line.split("\t")
+        if len(fields) == 2 and fields[1].strip().isdigit():
+            values[fields[0].strip()] = int(fields[1])
+    if "cache_miss" not in values:
+        raise ValueError("no cache_miss counter")
+    return CacheStats(launcher=launcher,
+        hits=(values.get("direct_cache_hit", 0) + values.get("preprocessed_cache_hit", 0)),
+        misses=values["cache_miss"])
+
+def _parse_sccache(launcher: str, output: str) -> CacheStats:
+    stats = json.loads(output)["stats"]
+    return CacheStats(launcher=launcher,
+        hits=sum(stats["cache_hits"]["counts"].values()),
+        misses=sum(stats["cache_misses"]["counts"].values()))
@@ -0,0 +1,166 @@
+import hashlib, json, logging, os, shutil, typing
+
+logger = logging.getLogger(__name__)
+
+# environment variables that change the result of a cmake configure step.
+_ENVIRONMENT_KEYS = ["PATH", "CC", "CXX", "CFLAGS", "CXXFLAGS", "CPPFLAGS", "LDFLAGS",
+    "CMAKE_PREFIX_PATH", "CMAKE_GENERATOR", "CMAKE_TOOLCHAIN_FILE", "PKG_CONFIG_PATH",
+    "INCLUDE", "LIB", "LIBPATH"]
+
+def _fingerprint(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _stat_identity(path: str) -> typing.List:
+    try:
+        st = os.stat(path)
+        return [path, st.st_mtime_ns, st.st_size]
+    except OSError:
+        return [path, None, None]
+
+class ConfigureState:
+    '''
+    Everything that decides whether a configure step has to be rerun: the
+    cmake command line, the environment and toolchain it runs with, and the
+    modification state of every CMake input file.
+    '''
+    def __init__(self, command: typing.List[str], inputs: typing.Dict[str, typing.List[int]]):
+        #removing cache entries (-U) follows what earlier configures set, not the settings
+        self.command = _fingerprint([arg for arg in command if not arg.startswith("-U")])
+        self.environment = _fingerprint(ConfigureState._environment_identity(command))
+        self.inputs = inputs
+
+    @staticmethod
+    def _environment_identity(command: typing.List[str]) -> typing.List:
+        identity = [[key, os.environ.get(key)] for key in _ENVIRONMENT_KEYS]
+
+        #a rebuilt or upgraded cmake/compiler keeps its path but not its mtime
+        tools = command[:1] + [arg.split("=", 1)[1] for arg in command
+            if arg.startswith("-DCMAKE_C_COMPILER=") or arg.startswith("-DCMAKE_CXX_COMPILER=")]
+        for tool in tools:
+            resolved = tool if os.path.isabs(tool) else shutil.which(tool)
+            identity.append(_stat_identity(resolved) if resolved else [tool, None, None])
+        return identity
+
+    def todict(self) -> dict:
+        return {"command": self.command, "environment": self.environment, "inputs": self.inputs}
+
+class ConfigureCache:
+    '''
+    A persistent record of the last successful configure step, stored in the
+    build directory.  If nothing that affects the configure has changed since
+    then, the configure step can be skipped.
+    '''
+    filename: str = ".cppbuilder_configure.json"
+    entries_filename: str = ".cppbuilder_cache_entries.json"
+
+    def __init__(self, build_directory: str, source_directory: str):
+        self.build_directory = build_directory
+        self.source_directory = source_directory
+        self.path = os.path.join(build_directory, ConfigureCache.filename)
+
+    def state(self, command: typing.List[str]) -> ConfigureState:
+        '''
+        Returns the current configure state for the given cmake command.
+        '''
+        return ConfigureState(command, self._scan_inputs())
+
+    def reason(self, state: ConfigureState) -> str:
+        '''
+        Returns why the configure step needs to run for the given state, or an
+        empty string if the cached configure is still up to date.
+        '''
+        if not os.path.isfile(os.path.join(self.build_directory, "CMakeCache.txt")):
+            return "the build directory has no CMakeCache.txt"
+        stored = self._load()
+        if stored is None:
+            return "there is no record of a previous configure"
+        if stored.get("command") != state.command:
+            return "the cmake command line changed"
+        if stored.get("environment") != state.environment:
+            return "the environment or toolchain changed"
+        old_inputs = stored.get("inputs", {})
+        if old_inputs != state.inputs:
+            changed = sorted(set(old_inputs) ^ set(state.inputs))
+            changed += sorted(p for p in state.inputs if p in old_inputs and old_inputs[p] != state.inputs[p])
+            more = f" (and {len(changed) - 3} more)" if len(changed) > 3 else ""
+            return "CMake input files changed: " + ", ".join(changed[:3]) + more
+        return ""
+
+    def store(self, state: ConfigureState) -> None:
+        '''
+        Records state as the result of a successful configure step.
+        '''
+        temporary = self.path + ".tmp"
+        try:
+            with open(temporary, "w") as f:
+                json.dump(state.todict(), f)
+            os.replace(temporary, self.path)
+        except OSError as e:
+            logger.warning("Unable to write the configure cache: " + repr(e))
+
+    def invalidate(self) -> None:
+        '''
+        Forgets the last configure, so that the next one is never skipped.
+        '''
+        try:
+            os.remove(self.path)
+            logger.debug("Configure cache invalidated: " + self.path)
+        except FileNotFoundError:
+            pass
+
+    def owned_entries(self) -> typing.Set[str]:
+        '''
+        Returns the names of the cache entries cppbuilder set in earlier configures
+        (see record_entries), which are its to remove again.
+        '''
+        try:
+            with open(os.path.join(self.build_directory, ConfigureCache.entries_filename), "r") as f:
+                return set(json.load(f))
+        except (OSError, ValueError, TypeError):
+            return set()
+
+    def record_entries(self, names: typing.Iterable[str]) -> None:
+        '''
+        Records the names of the cache entries cppbuilder has set.
+        '''
+        path = os.path.join(self.build_directory, ConfigureCache.entries_filename)
+        try:
+            with open(path + ".tmp", "w") as f:
+                json.dump(sorted(names), f)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            logger.warning("Unable to record the cache entries set: " + repr(e))
+
+    def _load(self) -> typing.Optional[dict]:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _scan_inputs(self) -> typing.Dict[str, typing.List[int]]:
+        '''
+        Returns {path relative to the source directory: [mtime_ns, size]} for every
+        CMakeLists.txt and *.cmake file in the source tree.  Hidden directories and
+        the build directory are not searched.
+        '''
+        inputs = {}
+        skip = os.path.abspath(self.build_directory)
+        pending = [self.source_directory]
+        while len(pending) > 0:
+            directory = pending.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if not entry.name.startswith(".") and os.path.abspath(entry.path) != skip:
+                        pending.append(entry.path)
+                elif entry.name == "CMakeLists.txt" or entry.name.endswith(".cmake"):
+                    try:
+                        st = entry.stat()
+                    except OSError: #a dangling symlink is not an input
+                        continue
+                    inputs[os.path.relpath(entry.path, self.source_directory)] = [st.st_mtime_ns, st.st_size]
+        return inputs
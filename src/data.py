@@ -1,7 +1,14 @@
-import configparser, dataclasses, logging, os, typing, subprocess, shutil, enum, sys
+import configparser, dataclasses, logging, os, typing, enum, sys, threading, time
 import re, json
 
-from pathlib import Path
+from cleaner import CleanMode
+from outputpipe import OutputConsumer
+
+if typing.TYPE_CHECKING:
+    from configcache import ConfigureCache, ConfigureState
+    from execution import CommandResult, ExecutionResult
+    from toolchain import ToolchainCache
+    import buildhistory, compilercache, fileapi
 
 logger = logging.getLogger(__name__)
 
@@ -47,7 +54,8 @@ CMAKE_GENERATOR_TYPES: list = ["Visual Studio 16 2019",
     "Eclipse CDT4 - NMake Makefiles",
     "Eclipse CDT4 - MinGW Makefiles",#40
     "Eclipse CDT4 - Ninja",
-    "Eclipse CDT4 - Unix Makefiles"]
+    "Eclipse CDT4 - Unix Makefiles",
+    "Ninja Multi-Config"]
 
 class OsType(enum.IntFlag):
     '''
@@ -93,68 +101,292 @@ class SupportedCmakeGenerators(enum.Enum):
     supported by the value in question.  For instance, nmake is not
     supported on linux, and make is not supported on windows.
     '''
-    NMAKE_MAKEFILE = (CMAKE_GENERATOR_TYPES[14], "nmake", OsType.WINDOWS) #not supported on linux
-    UNIX_MAKEFILE = (CMAKE_GENERATOR_TYPES[18], "make", OsType.LINUX)   #not supported on windows
+    NMAKE_MAKEFILE = (CMAKE_GENERATOR_TYPES[14], "nmake", OsType.WINDOWS, "") #not supported on linux
+    UNIX_MAKEFILE = (CMAKE_GENERATOR_TYPES[18], "make", OsType.LINUX, "-j")   #not supported on windows
+    NINJA = (CMAKE_GENERATOR_TYPES[20], "ninja", (OsType.WINDOWS | OsType.LINUX | OsType.OSX), "-j")
+    NINJA_MULTI_CONFIG = (CMAKE_GENERATOR_TYPES[43], "ninja", (OsType.WINDOWS | OsType.LINUX | OsType.OSX), "-j")
 
-    def __init__(self, generatorname: str="", makecommand: str="", operating_system: OsType=OsType.NO_SUPPORT):
+    def __init__(self, generatorname: str="", makecommand: str="", operating_system: OsType=OsType.NO_SUPPORT,
+        jobsflag: str=""):
         self.generator_name = generatorname
         self.make_command = makecommand
         self.support = operating_system
+        self.jobs_flag = jobsflag #empty if the make program can not build in parallel (nmake)
+
+def _cgroup_cpu_limit() -> typing.Optional[int]:
+    '''
+    Returns the number of cpus a cgroup cpu quota allows this process to use, or None
+    if there is no quota.  Both cgroup v2 (cpu.max) and v1 (cpu.cfs_quota_us) are checked.
+    '''
+    quota_files = [("/sys/fs/cgroup/cpu.max", None),
+        ("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", "/sys/fs/cgroup/cpu/cpu.cfs_period_us"),
+        ("/sys/fs/cgroup/cpu,cpuacct/cpu.cfs_quota_us", "/sys/fs/cgroup/cpu,cpuacct/cpu.cfs_period_us")]
+    for quota_file, period_file in quota_files:
+        try:
+            with open(quota_file, "r") as f:
+                fields = f.read().split()
+            if period_file is not None:
+                with open(period_file, "r") as f:
+                    fields.append(f.read().strip())
+            if len(fields) < 2 or fields[0] == "max":
+                return None
+            quota, period = int(fields[0]), int(fields[1])
+        except (OSError, ValueError):
+            continue
+        if quota <= 0 or period <= 0:
+            return None
+        return max(1, -(-quota // period)) #ceiling division
+    return None
+
+def available_cpus() -> int:
+    '''
+    Returns the number of cpus this process may actually use, taking cpu affinity
+    and cgroup quotas (containers, CI runners) into account.
+    '''
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    limit = _cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, limit)
+    return max(1, cpus)
+
+# the type and default value of every setting.  Lists are stored as json arrays.
+CONFIG_SCHEMA: typing.Dict[str, typing.Dict[str, typing.Tuple[type, typing.Any]]] = {
+    "DEFAULT": {
+        "loglevel": (str, "info"),
+        "loglevels": (list, []), #per subsystem: "logger=level", e.g. "execution=warning"
+        "logfile": (bool, True),
+        "outputlines": (int, 10000)}, #lines of build output kept by the UI
+    "SYSTEMCONFIG": {
+        "cppcompiler": (str, "g++"),
+        "ccompiler": (str, "gcc"),
+        "makecmd": (str, "make"),
+        "cmakecmd": (str, "cmake"),
+        "generator": (str, CMAKE_GENERATOR_TYPES[18]),
+        "jobs": (int, 0), #0 = one job per available cpu
+        "compilerlauncher": (str, "auto"), #ccache/sccache: auto, none, or a program name or path
+        "linker": (str, ""), #"" for the compiler's own, auto, mold, lld, gold or bfd
+        "libfolders": (list, []),
+        "includefolders": (list, [])}}
+
+def _format_setting(kind: type, value: typing.Any) -> str:
+    if kind is list:
+        return json.dumps(list(value))
+    if kind is bool:
+        return "on" if value else "off"
+    return str(value)
+
+def _parse_list(text: str) -> list:
+    '''
+    Reads a list setting: a json array, or, as older versions wrote them, a
+    python list literal.
+    '''
+    try:
+        value = json.loads(text)
+    except ValueError:
+        import ast
+        try:
+            value = ast.literal_eval(text)
+        except (ValueError, SyntaxError):
+            raise ValueError(f"not a list: {text}")
+    if not isinstance(value, list):
+        raise ValueError(f"not a list: {text}")
+    return [str(v) for v in value]
 
 class Configuration:
     '''
     This helps to centralize all code relating to saving, storing, getting, and 
     initializing global program configuration.
+
+    Nothing is read until a setting is first used, and save() only writes when
+    something was changed.  Several processes may share the configuration file:
+    saving takes a lock, merges this process's changes into what is on disk, and
+    replaces the file in one rename, so readers never see half of it.
     '''
-    home_directory: str = str(Path.home())
+    home_directory: str = os.path.expanduser("~")
     program_home: str = (home_directory + os.sep + ".cppbuilder")
     filename: str = (program_home + os.sep + "cppbuilder.conf")
 
-    def __init__(self):
+    def __init__(self, filename: str=""):
         logger.debug("Configuration instantiated.")
+        self.filename = filename if len(filename) > 0 else Configuration.filename
+        self._config: typing.Optional[configparser.ConfigParser] = None
+        self._saved: typing.Dict[typing.Tuple[str, str], str] = {} #what the file held when last read or written
+        self._unwritten = False #there is no configuration file yet
+        self._lock = threading.RLock()
+        self._timer: typing.Optional[threading.Timer] = None
+        self._exit_save = False
 
-        # set up the configuration, initializing it with some sane defaults
-        self.config = self._default_config()
-
-        # here we make sure that we search for a config file, and
-        # if none is loaded we write it.
-        if len(self.config.read([Configuration.filename])) == 0:
-            logger.warning("Configuration file not found, saving to " +
-                           (os.path.abspath(".") + os.path.sep + Configuration.filename))
-            self.save()
+    @property
+    def config(self) -> configparser.ConfigParser:
+        with self._lock:
+            if self._config is None:
+                self._config = self._default_config()
+                self._saved = self._read(self._config)
+                self._unwritten = (len(self._saved) == 0)
+                if self._unwritten:
+                    logger.info("Configuration file not found; the defaults will be saved to " + self.filename)
+                    self._saved = Configuration._values(self._config)
+            return self._config
 
     # This function returns a default configuration.
-    def _default_config(self):
+    def _default_config(self) -> configparser.ConfigParser:
         '''
         Returns the a default configuration for the entire program.
         '''
         c = configparser.ConfigParser()
+        for section, settings in CONFIG_SCHEMA.items():
+            c[section] = {key: _format_setting(kind, default) for key, (kind, default) in settings.items()}
+        return c
 
-        #set default key-value pairs here
-        c['DEFAULT'] = {
-            'loglevel': 'debug',
-            'logfile': 'on'
-        }
+    def _read(self, parser: configparser.ConfigParser) -> typing.Dict[typing.Tuple[str, str], str]:
+        '''
+        Reads the configuration file into parser, replacing settings that do not
+        fit the schema with their defaults.  Returns the values that were read.
+        '''
+        try:
+            with open(self.filename, "r") as f:
+                parser.read_file(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, configparser.Error) as e:
+            logger.error(f"Unable to read {self.filename}, using the default configuration: {e!r}")
+            return {}
+        values = Configuration._values(parser)
+        for section, settings in CONFIG_SCHEMA.items():
+            for key, (kind, default) in settings.items():
+                text = parser[section].get(key)
+                try:
+                    typed = self._convert(kind, text)
+                except ValueError:
+                    logger.warning(f"Setting {section}.{key} = \"{text}\" is not a valid {kind.__name__}; "
+                        "using the default.")
+                    typed = default
+                parser[section][key] = _format_setting(kind, typed) #older list formats become json
+        return values
 
-        c['SYSTEMCONFIG'] = {
-            "cppcompiler": "g++",
-            "ccompiler": "gcc",
-            "makecmd": "make",
-            "cmakecmd": "cmake",
-            "generator": CMAKE_GENERATOR_TYPES[18],
-            "libfolders": [],
-            "includefolders": []
-        }
+    @staticmethod
+    def _convert(kind: type, text: str) -> typing.Any:
+        if kind is list:
+            return _parse_list(text)
+        if kind is bool:
+            if text.lower() not in configparser.ConfigParser.BOOLEAN_STATES:
+                raise ValueError(text)
+            return configparser.ConfigParser.BOOLEAN_STATES[text.lower()]
+        return kind(text)
 
-        return c
+    @staticmethod
+    def _values(parser: configparser.ConfigParser) -> typing.Dict[typing.Tuple[str, str], str]:
+        '''
+        Every setting in parser, keyed by (section, key).  Settings a section only
+        inherits from DEFAULT are left out.
+        '''
+        defaults = parser.defaults()
+        values = {("DEFAULT", key): value for key, value in defaults.items()}
+        for section in parser.sections():
+            for key in parser.options(section):
+                value = parser.get(section, key, raw=True)
+                if key not in defaults or defaults[key] != value:
+                    values[(section, key)] = value
+        return values
+
+    def get(self, section: str, key: str) -> typing.Any:
+        '''
+        Returns a setting as the type CONFIG_SCHEMA gives it (a string for settings
+        not in the schema).
+        '''
+        text = self.config[section][key]
+        kind, default = CONFIG_SCHEMA.get(section, {}).get(key, CONFIG_SCHEMA["DEFAULT"].get(key, (str, "")))
+        try:
+            return self._convert(kind, text)
+        except ValueError:
+            return default
+
+    def set(self, section: str, key: str, value: typing.Any) -> None:
+        '''
+        Changes a setting.  Raises ValueError if value does not fit CONFIG_SCHEMA.
+        '''
+        kind = CONFIG_SCHEMA.get(section, {}).get(key, (str, ""))[0]
+        if kind is list:
+            if isinstance(value, str): #a list written out, as get() would read it
+                value = _parse_list(value)
+        elif not isinstance(value, kind):
+            value = self._convert(kind, str(value))
+        with self._lock:
+            if section != "DEFAULT" and not self.config.has_section(section):
+                self.config.add_section(section)
+            self.config[section][key] = _format_setting(kind, value)
+
+    @property
+    def dirty(self) -> bool:
+        '''
+        True if there are settings that have not been saved.
+        '''
+        with self._lock:
+            return self._config is not None and (self._unwritten or Configuration._values(self._config) != self._saved)
+
+    def save(self) -> bool:
+        '''
+        Writes the settings changed in this process to the configuration file,
+        keeping changes other processes saved in the meantime, and picks those up.
+        Does nothing if nothing changed.  Returns True if the file was written.
+        '''
+        from filelock import FileLock
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self.dirty:
+                return False
+            logger.info("Saving configuration")
+            directory = os.path.dirname(self.filename)
+            if len(directory) > 0:
+                os.makedirs(directory, exist_ok=True)
+                if not os.path.isdir(directory):
+                    raise NotADirectoryError(f"\"{directory}\" does not exist!")
+            with FileLock(self.filename + ".lock"):
+                mine = Configuration._values(self._config)
+                changed = {k: v for k, v in mine.items() if self._saved.get(k) != v}
+                removed = [k for k in self._saved if k not in mine]
+                merged = self._default_config()
+                self._read(merged)
+                for (section, key), value in changed.items():
+                    if section != "DEFAULT" and not merged.has_section(section):
+                        merged.add_section(section)
+                    merged[section][key] = value
+                for section, key in removed:
+                    merged.remove_option(section, key)
+                temporary = self.filename + f".{os.getpid()}.tmp"
+                with open(temporary, "w") as config_file:
+                    merged.write(config_file)
+                os.replace(temporary, self.filename)
+            #take on what the other processes saved, in place so existing section proxies stay valid
+            for (section, key), value in Configuration._values(merged).items():
+                if (section, key) not in mine or mine[(section, key)] != value:
+                    if section != "DEFAULT" and not self._config.has_section(section):
+                        self._config.add_section(section)
+                    self._config[section][key] = value
+            self._saved = Configuration._values(self._config)
+            self._unwritten = False
+            return True
 
-    def save(self) -> None:
-        logger.info("Saving configuration")
-        Path(Configuration.program_home).mkdir(parents=True, exist_ok=True)
-        if not os.path.isdir(Configuration.program_home):
-            raise NotADirectoryError(f"\"{Configuration.program_home}\" does not exist!")
-        with open(Configuration.filename, 'w') as config_file:
-            self.config.write(config_file)
+    def save_later(self, delay: float=1.0) -> None:
+        '''
+        Saves after delay seconds, so that a burst of changes is written once.  A
+        save that is still pending when the program exits happens then.
+        '''
+        with self._lock:
+            if self._timer is not None:
+                return
+            if not self._exit_save:
+                import atexit
+                atexit.register(self.save)
+                self._exit_save = True
+            self._timer = threading.Timer(delay, self.save)
+            self._timer.daemon = True
+            self._timer.start()
 
     def __repr__(self):
         some_stuff = []
@@ -169,6 +401,24 @@ class Configuration:
     def __setitem__(self, key, value):
         self.config[key] = value
 
+_toolchains: typing.Optional["ToolchainCache"] = None
+
+def toolchains() -> "ToolchainCache":
+    '''
+    Returns the toolchain cache shared by every project, stored under Configuration.program_home.
+    '''
+    global _toolchains
+    if _toolchains is None:
+        from toolchain import ToolchainCache
+        _toolchains = ToolchainCache(os.path.join(Configuration.program_home, "toolchains.json"))
+    return _toolchains
+
+def _defined_entries(command: typing.List[str]) -> typing.Set[str]:
+    '''
+    Returns the names of the cache entries a cmake command sets with -D.
+    '''
+    return {arg[2:].split("=", 1)[0].split(":", 1)[0] for arg in command if arg.startswith("-D")}
+
 @dataclasses.dataclass
 class ProjectInformation:
     '''
@@ -213,6 +463,42 @@ class ProjectInformation:
     build_targets: typing.List[str] = dataclasses.field(default_factory=list)
     make_arguments: typing.List[str] = dataclasses.field(default_factory=list)
 
+    # number of parallel jobs passed to make/ninja.  0 means one per available cpu.
+    build_jobs: int = 0
+
+    # how ProjectCommands.CLEAN cleans the build directory.
+    clean_mode: CleanMode = CleanMode.FULL
+
+    # compiler cache (ccache, sccache) passed to cmake as the compiler launcher.
+    # "" or "none" for no launcher, "auto" to use whichever is installed, or a program name/path.
+    compiler_launcher: str = ""
+
+    # CMAKE_BUILD_TYPE (Debug, Release, RelWithDebInfo, MinSizeRel), or "" to leave it to the project.
+    # Multi-config generators build it by default instead.
+    build_type: str = ""
+
+    # extra cache entries passed to cmake as -D<name>=<value>.
+    cmake_definitions: typing.Dict[str, str] = dataclasses.field(default_factory=dict)
+
+    # build every target as a unity build (CMAKE_UNITY_BUILD), unity_batch_size sources per
+    # unity file.  A batch size of 0 leaves it to cmake (8).
+    unity_build: bool = False
+    unity_batch_size: int = 0
+
+    # headers precompiled in every target (see buildmodes.py): "<vector>" for a system
+    # header, or a path relative to the source directory.
+    precompiled_headers: typing.List[str] = dataclasses.field(default_factory=list)
+
+    # the linker (see linker.py): "" for the compiler's own, "auto" for the fastest one
+    # available, or "mold", "lld", "gold", "bfd".
+    linker: str = ""
+
+    # time every link and report the total as a "link" phase of the build.
+    time_links: bool = False
+
+    # the phases and timings of the most recent execute()/execute_async().  Not persisted.
+    last_result: typing.Optional["ExecutionResult"] = dataclasses.field(default=None, init=False, repr=False, compare=False)
+
     def tojson(self) -> str:
         '''
         Returns this object as a json string.
@@ -229,7 +515,17 @@ class ProjectInformation:
             "cmakelibpaths": self.cmake_library_path,
             "cmakeincludepaths": self.cmake_include_path,
             "buildtargets": self.build_targets,
-            "makeargs": self.make_arguments
+            "makeargs": self.make_arguments,
+            "buildjobs": self.build_jobs,
+            "cleanmode": self.clean_mode.value,
+            "compilerlauncher": self.compiler_launcher,
+            "buildtype": self.build_type,
+            "cmakedefinitions": self.cmake_definitions,
+            "unitybuild": self.unity_build,
+            "unitybatchsize": self.unity_batch_size,
+            "precompiledheaders": self.precompiled_headers,
+            "linker": self.linker,
+            "timelinks": self.time_links
         }
         return json.dumps(thisobject, sort_keys=True, indent=4)
 
@@ -254,20 +550,41 @@ class ProjectInformation:
         self.cmake_include_path = loadeddata["cmakeincludepaths"]
         self.build_targets = loadeddata["buildtargets"]
         self.make_arguments = loadeddata["makeargs"]
+        self.build_jobs = loadeddata.get("buildjobs", 0)
+        self.clean_mode = CleanMode(loadeddata.get("cleanmode", CleanMode.FULL.value))
+        self.compiler_launcher = loadeddata.get("compilerlauncher", "")
+        self.build_type = loadeddata.get("buildtype", "")
+        self.cmake_definitions = dict(loadeddata.get("cmakedefinitions", {}))
+        self.unity_build = loadeddata.get("unitybuild", False)
+        self.unity_batch_size = loadeddata.get("unitybatchsize", 0)
+        self.precompiled_headers = list(loadeddata.get("precompiledheaders", []))
+        self.linker = loadeddata.get("linker", "")
+        self.time_links = loadeddata.get("timelinks", False)
+
+    def copy(self) -> "ProjectInformation":
+        '''
+        Returns a copy of the persisted settings of this object, to change
+        without touching it.
+        '''
+        copy = ProjectInformation()
+        copy.fromjson(self.tojson())
+        return copy
 
     def isvalid(self) -> bool:
         '''
         Returns true if the data is valid to be passed to cmake.  This means that the 
-        compilers should represent the absolute path to their respective compilers, the
-        project directory should exist, and the generator type must be one of the types offered
-        by cmake.
+        compilers should be paths to their respective compilers or names of compilers on
+        the PATH, the project directory should exist, and the generator type must be one
+        of the types offered by cmake.
 
         This may return true even with invalid nmake aruments.  There are too many arguments that
         can be passed to make, and through make to the compiler -- and every combination thereof -- to
         support validation of so early in development.
         '''
-        return (os.path.isfile(self.cpp_compiler) and os.path.isfile(self.c_compiler) and
-            os.path.isdir(self.project_directory) and os.path.isdir(self.source_directory) and 
+        return (toolchains().resolve(self.cpp_compiler) is not None and
+            toolchains().resolve(self.c_compiler) is not None and
+            os.path.isdir(self.project_directory) and
+            os.path.isdir(os.path.join(self.project_directory, self.source_directory)) and
             ((self.generator_type.support & current_os()) == current_os()))
     
     def applyconfig(self, config: Configuration=None) -> None:
@@ -276,17 +593,31 @@ class ProjectInformation:
         that are system-wide in configuration instead of as a project-depenedent file and
         then apply them as 'defaults'.
         '''
-        sconfig = config.config["SYSTEMCONFIG"]
-        self.cpp_compiler = sconfig["cppcompiler"]
-        self.c_compiler = sconfig["ccompiler"]
-        self.make_cmd = sconfig["makecmd"]
-        self.cmake_cmd = sconfig["cmakecmd"]
-        self.cmake_library_path = sconfig["libfolders"]
-        self.cmake_include_path = sconfig["includefolders"]
+        self.cpp_compiler = config.get("SYSTEMCONFIG", "cppcompiler")
+        self.c_compiler = config.get("SYSTEMCONFIG", "ccompiler")
+        self.make_cmd = config.get("SYSTEMCONFIG", "makecmd")
+        self.cmake_cmd = config.get("SYSTEMCONFIG", "cmakecmd")
+        self.cmake_library_path = config.get("SYSTEMCONFIG", "libfolders")
+        self.cmake_include_path = config.get("SYSTEMCONFIG", "includefolders")
+        self.build_jobs = config.get("SYSTEMCONFIG", "jobs")
+        self.compiler_launcher = config.get("SYSTEMCONFIG", "compilerlauncher")
+        self.linker = config.get("SYSTEMCONFIG", "linker")
+        for g in SupportedCmakeGenerators:
+            if g.generator_name == config.get("SYSTEMCONFIG", "generator") and (g.support & current_os()) == current_os():
+                self.generator_type = g
+                break
 
-    def cmake(self) -> list:
+    def cmake(self, linker_definitions: typing.Optional[typing.Dict[str, str]]=None,
+        owned: typing.Collection[str]=()) -> list:
         '''
-        Returns the cmake command for this configuration.
+        Returns the cmake command for this configuration.  linker_definitions are
+        those the linker and time_links settings resolve to (see
+        configure_command); without them the build links as the compiler does.
+
+        Build mode and linker settings stay in the cmake cache once set, so those
+        named in owned (set by an earlier configure, see
+        ConfigureCache.owned_entries) are removed again if they are no longer set.
+        Entries cppbuilder never set are left to the user and the project.
         '''
         command = [self.cmake_cmd]
 
@@ -294,48 +625,262 @@ class ProjectInformation:
         command.append(self._sanitize_argument(self.generator_type.generator_name))
         
         if(len(self.c_compiler) > 0):
-            command.append("-DCMAKE_C_COMPILER=" + self._sanitize_argument(os.path.abspath(self.c_compiler)))
+            command.append("-DCMAKE_C_COMPILER=" + self._sanitize_argument(self._tool_path(self.c_compiler)))
 
         if(len(self.cpp_compiler) > 0):
-            command.append("-DCMAKE_CXX_COMPILER=" + self._sanitize_argument(os.path.abspath(self.cpp_compiler)))
+            command.append("-DCMAKE_CXX_COMPILER=" + self._sanitize_argument(self._tool_path(self.cpp_compiler)))
         
+        import compilercache
+        launcher = compilercache.find_launcher(self.compiler_launcher)
+        if launcher is not None:
+            command.append("-DCMAKE_C_COMPILER_LAUNCHER=" + self._sanitize_argument(launcher))
+            command.append("-DCMAKE_CXX_COMPILER_LAUNCHER=" + self._sanitize_argument(launcher))
+
         if(len(self.cmake_include_path) > 0):
             command.append("-DCMAKE_INCLUDE_PATH=" + self._sanitize_argument(';'.join(self.cmake_include_path)))
         
         if(len(self.cmake_library_path) > 0):
             command.append("-DCMAKE_LIBRARY_PATH=" + self._sanitize_argument(';'.join(self.cmake_library_path)))
 
+        if len(self.build_type) > 0:
+            variable = "CMAKE_DEFAULT_BUILD_TYPE" if self.generator_type == SupportedCmakeGenerators.NINJA_MULTI_CONFIG else "CMAKE_BUILD_TYPE"
+            command.append(f"-D{variable}=" + self._sanitize_argument(self.build_type))
+
+        if self.unity_build:
+            command.append("-DCMAKE_UNITY_BUILD=ON")
+            if self.unity_batch_size > 0:
+                command.append(f"-DCMAKE_UNITY_BUILD_BATCH_SIZE={self.unity_batch_size}")
+
+        import buildmodes, linker
+        linker_definitions = linker_definitions or {}
+        definitions = dict(self.cmake_definitions, **linker_definitions)
+        if self._needs_project_include(linker_definitions):
+            command.append("-DCMAKE_PROJECT_INCLUDE=" +
+                self._sanitize_argument(buildmodes.project_include_path(self.build_directory)))
+        if len(self.precompiled_headers) > 0:
+            command.append(f"-D{buildmodes.HEADERS_VARIABLE}=" + self._sanitize_argument(';'.join(self.precompiled_headers)))
+        for name in sorted(definitions):
+            command.append(f"-D{name}=" + self._sanitize_argument(str(definitions[name])))
+        defined = _defined_entries(command)
+        for name in buildmodes.CACHE_ENTRIES + linker.CACHE_ENTRIES:
+            if name in owned and name not in defined:
+                command.append(f"-U{name}")
+
         if(len(self.source_directory) > 0):
             command.append(self._sanitize_argument(os.path.join(self.project_directory, self.source_directory)))
         
         return command
     
-    def make(self) -> list:
+    def configure_command(self) -> list:
+        '''
+        Returns the command the configure step runs: cmake(), with the linker
+        settings resolved.  That may run the compiler, once, to see which linkers
+        it can use.
+        '''
+        return self.cmake(self._linker_definitions(), self.configure_cache().owned_entries())
+
+    def _owned_entries(self, command: list) -> typing.Set[str]:
+        '''
+        Returns the cache entries command sets that cppbuilder looks after.
+        '''
+        import buildmodes, linker
+        return _defined_entries(command) & set(buildmodes.CACHE_ENTRIES + linker.CACHE_ENTRIES)
+
+    def _needs_project_include(self, linker_definitions: typing.Dict[str, str]) -> bool:
+        import linker
+        return len(self.precompiled_headers) > 0 or linker.LINKER_VARIABLE in linker_definitions
+
+    def _linker_definitions(self) -> typing.Dict[str, str]:
+        '''
+        Returns the cmake definitions for the linker setting and for timing links.
+        '''
+        if len(self.linker.strip()) == 0 and not self.time_links:
+            return {}
+        import linker
+        cmake = toolchains().probe(self.cmake_cmd)
+        version = cmake.version if cmake is not None else ""
+        compiler = toolchains().resolve(self.cpp_compiler) or ""
+        definitions = linker.cmake_definitions(linker.find_linker(self.linker, compiler, toolchains()), compiler, version)
+        if self.time_links:
+            if not linker.timing_supported(version, self.generator_type.generator_name):
+                logger.warning(f"Timing links needs cmake 3.21 or newer and a make or ninja generator; "
+                    f"not timing them with cmake {version or '(unknown version)'} and {self.generator_type.generator_name}.")
+            else:
+                launcher = ";".join(linker.timing_launcher(self.build_directory))
+                for name in linker.LAUNCHER_VARIABLES:
+                    if name not in self.cmake_definitions: #the project's own launcher wins
+                        definitions[name] = launcher
+        return definitions
+
+    def _tool_path(self, tool: str) -> str:
+        '''
+        Returns the absolute path of a tool given by path or by name on the PATH.
+        '''
+        path = toolchains().resolve(tool)
+        return path if path is not None else os.path.abspath(tool)
+
+    def make(self, targets: typing.Optional[typing.List[str]]=None) -> list:
         '''
-        Returns the make command for this configuration.
+        Returns the make command for this configuration.  targets, if given, are
+        built instead of build_targets.
         '''
         command = [self.generator_type.make_command]
 
+        jobs = self.jobs()
+        if jobs > 0:
+            command.append(self.generator_type.jobs_flag + str(jobs))
+
         if len(self.make_arguments) > 0:
             for arg in self.make_arguments:
                 command.append(self._sanitize_argument(arg))
         
-        if len(self.build_targets) > 0:
-            command += [self._sanitize_argument(target) for target in self.build_targets]
+        targets = targets if targets is not None else self.build_targets
+        if len(targets) > 0:
+            command += [self._sanitize_argument(target) for target in targets]
         
         return command
 
+    def jobs(self) -> int:
+        '''
+        Returns the number of parallel jobs make() will ask for, or 0 if no
+        job count should be passed (the generator can not build in parallel, or
+        the user already passed one in make_arguments).
+        '''
+        if len(self.generator_type.jobs_flag) == 0:
+            return 0
+        if any(arg.startswith("-j") or arg.startswith("--jobs") for arg in self.make_arguments):
+            return 0
+        return self.build_jobs if self.build_jobs > 0 else available_cpus()
+
     def execute(self, 
-        commands: ProjectCommands=(ProjectCommands.CMAKE | ProjectCommands.MAKE)) -> bool:
+        commands: ProjectCommands=(ProjectCommands.CMAKE | ProjectCommands.MAKE),
+        consumers: typing.Optional[typing.List[OutputConsumer]]=None,
+        history: typing.Optional["buildhistory.BuildHistory"]=None,
+        cancel: typing.Optional[threading.Event]=None,
+        targets: typing.Optional[typing.List[str]]=None) -> bool:
         '''
-        Executes the build process on this project.  If cleanbuild is True,
-        then the build directory will be deleted and recreated.
+        Executes the build process on this project.  The requested commands run in
+        the order clean, cmake, make, and each one only runs if the ones before it
+        succeeded.  How the build directory is cleaned is decided by clean_mode.
+
+        If consumers is None, the output of the commands goes straight to this process's
+        stdout.  Otherwise it is streamed, line by line as it arrives, to each consumer.
+
+        Setting cancel (from another thread) stops the running command and skips
+        the rest; last_result.cancelled tells a cancelled build from a failed one.
+        targets, if given, are built instead of build_targets (see affected_targets).
+
+        Every phase is timed; the measurements are kept in last_result and, if a
+        BuildHistory is given, recorded in it.
         '''
+        from execution import ExecutionResult
+        result = ExecutionResult()
+        self.last_result = result
         if not self.isvalid():
             logger.warning("Attempted to execute invald project.  " + repr(self))
             return False
-        
-        #make the build directory if it does not yet exist.
+
+        #a full clean replaces the build directory, so it has to happen before we make sure it exists.
+        success = True
+        doclean = ((commands & ProjectCommands.CLEAN) == ProjectCommands.CLEAN)
+        if doclean and (self.clean_mode == CleanMode.FULL):
+            success = self._timed_step(result, "clean", self.clean)
+
+        if not self._make_build_directory():
+            return False
+
+        if success and doclean and (self.clean_mode != CleanMode.FULL):
+            command = self._clean_command()
+            if command is None:
+                success = self._timed_step(result, "clean", self.clean)
+            else:
+                success = self._run_step(result, command, consumers, "clean", cancel)
+        if success and ((commands & ProjectCommands.CMAKE) == ProjectCommands.CMAKE):
+            success = self._configure(result, consumers=consumers, cancel=cancel)
+        if success and ((commands & ProjectCommands.MAKE) == ProjectCommands.MAKE):
+            import compilercache, linker
+            launcher = compilercache.find_launcher(self.compiler_launcher)
+            before = compilercache.read_stats(launcher) if launcher is not None else None
+            if self.time_links:
+                linker.take_link_times(self.build_directory) #left over from a build we did not finish
+            success = self._run_step(result, self.make(targets), consumers, "build", cancel)
+            if before is not None:
+                self._record_cache_stats(result, before, compilercache.read_stats(launcher))
+            if self.time_links:
+                self._record_link_times(result)
+        result.success = success
+        self._log_timings(result)
+        if history is not None:
+            history.record(self, result)
+        return success
+
+    async def execute_async(self,
+        commands: ProjectCommands=(ProjectCommands.CMAKE | ProjectCommands.MAKE),
+        consumers: typing.Optional[typing.List[OutputConsumer]]=None,
+        env: typing.Optional[typing.Dict[str, str]]=None,
+        history: typing.Optional["buildhistory.BuildHistory"]=None,
+        targets: typing.Optional[typing.List[str]]=None) -> "ExecutionResult":
+        '''
+        The asyncio version of execute.  Processes get their working directory and
+        environment (ours, with env applied on top) individually, so any number of
+        projects can be built concurrently from one event loop.
+
+        Returns an ExecutionResult holding the exit code, duration and output
+        consumers of every command that was run.
+        '''
+        from execution import ExecutionResult
+        result = ExecutionResult()
+        self.last_result = result
+        if not self.isvalid():
+            logger.warning("Attempted to execute invald project.  " + repr(self))
+            return result
+        import asyncio #not imported at the top: it is slow to import, and most callers never need it
+        loop = asyncio.get_running_loop()
+
+        success = True
+        doclean = ((commands & ProjectCommands.CLEAN) == ProjectCommands.CLEAN)
+        if doclean and (self.clean_mode == CleanMode.FULL):
+            success = self._timed_step(result, "clean", self.clean)
+        if not self._make_build_directory():
+            return result
+
+        if success and doclean and (self.clean_mode != CleanMode.FULL):
+            command = self._clean_command()
+            if command is None:
+                success = await loop.run_in_executor(None, self._timed_step, result, "clean", self.clean)
+            else:
+                success = await self._run_step_async(result, command, consumers, env, "clean")
+        if success and ((commands & ProjectCommands.CMAKE) == ProjectCommands.CMAKE):
+            #hashing the configure inputs reads files; keep it off the event loop
+            plan = await loop.run_in_executor(None, self._plan_configure, result)
+            if plan is not None:
+                command, cache, state = plan
+                success = await self._run_step_async(result, command, consumers, env, "configure")
+                self._finish_configure(cache, state, command, success)
+        if success and ((commands & ProjectCommands.MAKE) == ProjectCommands.MAKE):
+            import compilercache, linker
+            launcher = compilercache.find_launcher(self.compiler_launcher)
+            before = None
+            if launcher is not None:
+                before = await loop.run_in_executor(None, compilercache.read_stats, launcher)
+            if self.time_links:
+                linker.take_link_times(self.build_directory)
+            success = await self._run_step_async(result, self.make(targets), consumers, env, "build")
+            if before is not None:
+                after = await loop.run_in_executor(None, compilercache.read_stats, launcher)
+                self._record_cache_stats(result, before, after)
+            if self.time_links:
+                self._record_link_times(result)
+        result.success = success
+        self._log_timings(result)
+        if history is not None:
+            await loop.run_in_executor(None, history.record, self, result)
+        return result
+
+    def _make_build_directory(self) -> bool:
+        '''
+        Makes the build directory if it does not yet exist.
+        '''
         if not os.path.isdir(self.build_directory):
             try:
                 os.makedirs(self.build_directory)
@@ -344,58 +889,258 @@ class ProjectInformation:
             if not os.path.isdir(self.build_directory):
                 logger.error("Could not create the build directory!!")
                 return False
+        return True
 
-        #I will make no attempt to explain this.
-        #It was non-trivial to write.  Have fun reading.
-        success = False
-        doclean = ((commands & ProjectCommands.CLEAN) == ProjectCommands.CLEAN)
-        docmake = ((commands & ProjectCommands.CMAKE) == ProjectCommands.CMAKE)
-        if doclean:
-            success = True # TODO: implement
-        if docmake and (success == doclean):
-            success = self._run_command(self.cmake(), new_cwd=self.build_directory)
-        if((commands & ProjectCommands.MAKE) == ProjectCommands.MAKE) and (success == docmake):
-            success = self._run_command(self.make(), new_cwd=self.build_directory)
-        return success
+    def _clean_command(self) -> typing.Optional[list]:
+        '''
+        Returns the command that cleans the build directory, for the clean modes
+        that are done by the generator rather than by us.
+        '''
+        if self.clean_mode != CleanMode.TARGET:
+            return None
+        if not os.path.isfile(os.path.join(self.build_directory, "CMakeCache.txt")):
+            return []
+        return [self.generator_type.make_command, "clean"]
+
+    def clean(self, consumers: typing.Optional[typing.List[OutputConsumer]]=None) -> bool:
+        '''
+        Cleans the build directory according to clean_mode:
+            FULL: the build directory is moved aside and deleted in the background,
+                so that the next configure can start right away.
+            TARGET: the generator's "clean" target is built, which removes build
+                outputs but keeps the cmake cache.
+            ORPHANS: object files whose sources were deleted are removed.
+        '''
+        import cleaner
+        if self.clean_mode == CleanMode.FULL:
+            return cleaner.discard_directory(self.build_directory)
+        if not os.path.isfile(os.path.join(self.build_directory, "CMakeCache.txt")):
+            logger.info("Nothing to clean, the project has not been configured.")
+            return True
+        if self.clean_mode == CleanMode.TARGET:
+            return self._run_command(self._clean_command(), new_cwd=self.build_directory, consumers=consumers)
+        cleaner.prune_orphans(self.build_directory, os.path.join(self.project_directory, self.source_directory))
+        return True
     
-    def _run_command(self, command: list=[], new_cwd: str="") -> bool:
+    def configure_cache(self) -> "ConfigureCache":
+        '''
+        Returns the cache that records the last successful configure step of this project.
+        '''
+        from configcache import ConfigureCache
+        return ConfigureCache(self.build_directory, os.path.join(self.project_directory, self.source_directory))
+
+    def invalidate_configure_cache(self) -> None:
+        '''
+        Forces the next execute() with ProjectCommands.CMAKE to rerun the configure step.
+        '''
+        self.configure_cache().invalidate()
+
+    def _configure_reason(self, cache: "ConfigureCache", state: "ConfigureState", project_include: bool=False) -> str:
+        '''
+        Returns why the configure step has to run, or "" if it can be skipped.
+        Every configure also answers our CMake File API query, and finds the
+        project include if the command names it.
+        '''
+        import fileapi
+        fileapi.write_query(self.build_directory)
+        if project_include:
+            import buildmodes
+            buildmodes.write_project_include(self.build_directory)
+        reason = cache.reason(state)
+        if len(reason) == 0 and fileapi.reply_index(self.build_directory) is None:
+            reason = "there is no CMake File API reply"
+        return reason
+
+    def codemodel(self) -> typing.Optional["fileapi.CodeModel"]:
+        '''
+        Returns the targets of the last configure, or None if it is not known.
+        '''
+        import fileapi
+        return fileapi.load(self.build_directory)
+
+    def affected_targets(self, changed: typing.Iterable[str]) -> typing.Optional[typing.List[str]]:
+        '''
+        Returns the fewest targets that have to be built after the changed files
+        changed, or None if that is not known and everything should be built.
+        build_targets, if set, are always built, so they are not narrowed down.
+        '''
+        if len(self.build_targets) > 0:
+            return None
+        model = self.codemodel()
+        return model.affected(changed) if model is not None else None
+
+    def _configure(self, result: "ExecutionResult",
+        consumers: typing.Optional[typing.List[OutputConsumer]]=None,
+        cancel: typing.Optional[threading.Event]=None) -> bool:
+        '''
+        Runs the cmake configure step, unless nothing that affects it has changed
+        since the last successful configure.
+        '''
+        plan = self._plan_configure(result)
+        if plan is None:
+            return True
+        command, cache, state = plan
+        success = self._run_step(result, command, consumers, "configure", cancel)
+        self._finish_configure(cache, state, command, success)
+        return success
+
+    def _plan_configure(self, result: "ExecutionResult") -> typing.Optional[typing.Tuple[list, "ConfigureCache", "ConfigureState"]]:
+        '''
+        Decides whether the configure step has to run.  If it is up to date, records
+        it in result as skipped and returns None; otherwise returns the command to
+        run and what _finish_configure needs afterwards.
+        '''
+        from execution import CommandResult
+        linking = self._linker_definitions()
+        cache = self.configure_cache()
+        owned = cache.owned_entries()
+        command = self.cmake(linking, owned)
+        start = time.monotonic()
+        state = cache.state(command)
+        reason = self._configure_reason(cache, state, self._needs_project_include(linking))
+        if len(reason) == 0:
+            logger.info("Configure step is up to date, skipping cmake.")
+            result.commands.append(CommandResult(command=command, returncode=0, cwd=self.build_directory,
+                duration=(time.monotonic() - start), phase="configure", skipped=True))
+            return None
+        logger.info("Reconfiguring because " + reason + ".")
+        setting = self._owned_entries(command)
+        if not setting <= owned: #before cmake runs: a configure that fails may have set them already
+            cache.record_entries(owned | setting)
+        return command, cache, state
+
+    def _finish_configure(self, cache: "ConfigureCache", state: "ConfigureState", command: list, success: bool) -> None:
+        if success:
+            cache.store(state)
+            cache.record_entries(self._owned_entries(command))
+        else:
+            cache.invalidate()
+
+    def _run_command(self, command: list=[], new_cwd: str="",
+        consumers: typing.Optional[typing.List[OutputConsumer]]=None) -> bool:
+        return self._run(command, new_cwd=new_cwd, consumers=consumers).success
+
+    def _run(self, command: list=[], new_cwd: str="",
+        consumers: typing.Optional[typing.List[OutputConsumer]]=None, phase: str="",
+        cancel: typing.Optional[threading.Event]=None) -> "CommandResult":
+        import execution
+        from execution import CommandResult
         if len(command) == 0:
-            return True #the command is to do nothing, right?  We are successful!
-        currentdir = os.getcwd()
-        if len(new_cwd) > 0:
-            if os.path.isdir(new_cwd):
-                os.chdir(new_cwd)
-                logger.debug("Changing into directory: \"" + new_cwd + "\"")
-            else:
-                logger.error(ProjectInformation._run_command.__qualname__ + 
-                    ": new_cwd specified but the directory does not exist!")
-                raise NotADirectoryError(ProjectInformation._run_command.__qualname__ + 
-                    ": new_cwd specified but the directory does not exist!")
+            #the command is to do nothing, right?  We are successful!
+            return CommandResult(command=[], returncode=0, phase=phase)
+        cwd = self._command_cwd(new_cwd)
 
-        success = False
         try:
-            result = subprocess.run(command)
-            success = (result.returncode == 0)
-            if not success:
-                logger.error("process failed: " + repr(result))
+            # the working directory is given to the child rather than changing
+            # our own, so that several projects can be built at the same time.
+            result = execution.run_command(command, cwd=cwd, consumers=consumers, phase=phase, cancel=cancel)
         except FileNotFoundError as e: #on windows, command not found
-            logger.error(repr(e) + os.linesep + "Command: " + ' '.join(command))
-            if ((current_os() & OsType.WINDOWS) == OsType.WINDOWS):
-                #if windows, usually you need to run the stoopehd vcvars cmd thing, and launch the build proc
-                #off of that.  if linux, then a hole in space and time is probably distracting you from this...
-                logger.info(os.linesep + os.linesep + "You likely need to run vcvars64 or vcvars32 to set the environment " + 
-                    "variables that this process must inherit for the appropriate commands to be " + 
-                    "successfully called." + os.linesep)
-        except subprocess.CalledProcessError as e: #execution return value != 0
-            logger.error("Command: " + str(e.cmd) + "\n" + 
-                "OUTPUT: " + str(e.output) + "\n" + 
-                "RETURN CODE: " + str(e.returncode))
-        
-        if os.getcwd() != currentdir:
-            logger.debug("changing back into directory: \"" + currentdir + "\"")
-            os.chdir(currentdir)
+            self._command_not_found(command, e)
+            return CommandResult(command=command, cwd=cwd, phase=phase)
+        if result.cancelled:
+            logger.info("process cancelled: " + ' '.join(command))
+        elif not result.success:
+            logger.error("process failed: " + repr(result))
+        return result
+
+    def _run_step(self, result: "ExecutionResult", command: list,
+        consumers: typing.Optional[typing.List[OutputConsumer]], phase: str,
+        cancel: typing.Optional[threading.Event]=None) -> bool:
+        '''
+        Runs one step of execute in the build directory, recording its result.
+        Returns True if it succeeded.
+        '''
+        step = self._run(command, new_cwd=self.build_directory, consumers=consumers, phase=phase, cancel=cancel)
+        if len(command) > 0:
+            result.commands.append(step)
+        return step.success
+
+    def _timed_step(self, result: "ExecutionResult", phase: str, function: typing.Callable[[], bool]) -> bool:
+        '''
+        Records a step that is done by us rather than by a child process.
+        '''
+        from execution import CommandResult
+        start = time.monotonic()
+        success = function()
+        result.commands.append(CommandResult(command=[], returncode=(0 if success else 1),
+            duration=(time.monotonic() - start), cwd=self.build_directory, phase=phase))
         return success
 
+    def _record_cache_stats(self, result: "ExecutionResult", before: "compilercache.CacheStats",
+        after: typing.Optional["compilercache.CacheStats"]) -> None:
+        if after is None:
+            return
+        result.compiler_cache = after - before
+        logger.info("Compiler cache for this build: " + str(result.compiler_cache))
+
+    def _record_link_times(self, result: "ExecutionResult") -> None:
+        '''
+        Adds the links the build step ran, as a "link" phase inside it.
+        '''
+        import linker
+        from execution import CommandResult
+        links = linker.take_link_times(self.build_directory)
+        if len(links) == 0:
+            return
+        total = sum(seconds for _, seconds in links)
+        result.commands.append(CommandResult(command=[], returncode=0, duration=total, cwd=self.build_directory,
+            phase="link", part_of="build"))
+        output, seconds = max(links, key=lambda link: link[1])
+        logger.info(f"{len(links)} link(s) took {total:.2f}s; the slowest, {os.path.basename(output) or '?'}, "
+            f"{seconds:.2f}s.")
+
+    def _log_timings(self, result: "ExecutionResult") -> None:
+        for c in result.commands:
+            details = "skipped, up to date" if c.skipped else f"exit code {c.returncode}"
+            if len(c.part_of) > 0:
+                details = f"part of {c.part_of}"
+            if c.cpu_time is not None:
+                details += f", cpu {c.cpu_time:.2f}s"
+            if c.peak_rss is not None:
+                details += f", peak rss {c.peak_rss / 2**20:.1f} MiB"
+            logger.info(f"{c.phase}: {c.duration:.2f}s ({details})")
+
+    async def _run_step_async(self, result: "ExecutionResult", command: list,
+        consumers: typing.Optional[typing.List[OutputConsumer]], env: typing.Optional[typing.Dict[str, str]],
+        phase: str) -> bool:
+        '''
+        Runs one step of execute_async in the build directory, recording its
+        result.  Returns True if it succeeded.
+        '''
+        if len(command) == 0:
+            return True
+        import execution
+        try:
+            step = await execution.run_command_async(command, cwd=self._command_cwd(self.build_directory),
+                env=env, consumers=consumers, phase=phase)
+        except FileNotFoundError as e:
+            self._command_not_found(command, e)
+            step = execution.CommandResult(command=command, cwd=self.build_directory, phase=phase)
+        if not step.success:
+            logger.error("process failed: " + repr(step))
+        result.commands.append(step)
+        return step.success
+
+    def _command_cwd(self, new_cwd: str="") -> typing.Optional[str]:
+        if len(new_cwd) == 0:
+            return None
+        if not os.path.isdir(new_cwd):
+            logger.error(ProjectInformation._run_command.__qualname__ + 
+                ": new_cwd specified but the directory does not exist!")
+            raise NotADirectoryError(ProjectInformation._run_command.__qualname__ + 
+                ": new_cwd specified but the directory does not exist!")
+        logger.debug("Running in directory: \"" + new_cwd + "\"")
+        return new_cwd
+
+    def _command_not_found(self, command: list, e: Exception) -> None:
+        logger.error(repr(e) + os.linesep + "Command: " + ' '.join(command))
+        if ((current_os() & OsType.WINDOWS) == OsType.WINDOWS):
+            #if windows, usually you need to run the stoopehd vcvars cmd thing, and launch the build proc
+            #off of that.  if linux, then a hole in space and time is probably distracting you from this...
+            logger.info(os.linesep + os.linesep + "You likely need to run vcvars64 or vcvars32 to set the environment " + 
+                "variables that this process must inherit for the appropriate commands to be " + 
+                "successfully called." + os.linesep)
+
     def _sanitize_argument(self, argument) -> str:
         '''
         Replaces invalid characters with their escaped equivilants.
@@ -0,0 +1,219 @@
+import dataclasses, enum, json, logging, os, re, threading, typing
+
+from outputpipe import OutputConsumer
+
+logger = logging.getLogger(__name__)
+
+class Severity(enum.IntEnum):
+    '''
+    Diagnostic severities, most severe first.
+    '''
+    ERROR = 0
+    WARNING = 1
+    NOTE = 2
+
+_SEVERITIES = {
+    "fatal error": Severity.ERROR,
+    "error": Severity.ERROR,
+    "warning": Severity.WARNING,
+    "note": Severity.NOTE,
+    "remark": Severity.NOTE}
+
+@dataclasses.dataclass
+class Diagnostic:
+    '''
+    One compiler, linker or cmake message that refers to a problem.
+    '''
+    file: str
+    line: int
+    column: int
+    severity: Severity
+    message: str
+    code: str = "" #MSVC error codes (C2065, LNK2019, ...)
+    target: str = ""
+    tool: str = "" #"gcc" (also clang), "msvc" or "cmake"
+    output_line: int = 0 #which line of the build output it was found on, starting at 1
+
+    def todict(self) -> dict:
+        d = dataclasses.asdict(self)
+        d["severity"] = self.severity.name.lower()
+        return d
+
+# GCC and Clang: file:line[:column]: severity: message
+_GCC = re.compile(r"^(?P<file>(?:[A-Za-z]:)?[^:\n]+):(?P<line>\d+):(?:(?P<column>\d+):)?\s*"
+    r"(?P<severity>fatal error|error|warning|note|remark):\s*(?P<message>.*)$")
+# MSVC: file(line[,column]): severity CODE: message, and tool messages such as "LINK : fatal error LNK1181: ..."
+_MSVC = re.compile(r"^\s*(?P<file>[^(\n]+?)(?:\((?P<line>\d+)(?:,(?P<column>\d+))?\))?\s*:\s*"
+    r"(?P<severity>fatal error|error|warning|note)\s+(?P<code>[A-Z]+\d+)\s*:\s*(?P<message>.*)$")
+# driver and linker messages without a location: "collect2: error: ld returned 1 exit status"
+_TOOL = re.compile(r"^(?P<file>[\w.+-]+): (?P<severity>fatal error|error|warning): (?P<message>.*)$")
+# CMake: the message follows on indented lines
+_CMAKE = re.compile(r"^CMake (?P<severity>Error|Warning)(?: \(dev\))?(?: at (?P<file>.+?):(?P<line>\d+) \(\w+\))?:\s*(?P<message>.*)$")
+# make: "[ 42%] Building CXX object dir/CMakeFiles/target.dir/file.cpp.o", ninja: "[12/200] Building ..."
+_BUILDING = re.compile(r"^\[[^\]]+\] Building \w+ object (?P<object>.*?CMakeFiles/(?P<target>[^/]+)\.dir/(?P<source>.+)\.\w+)$")
+
+_CMAKE_MESSAGE_LINES = 20 #the most lines of an indented cmake message that are kept
+
+class DiagnosticIndex(OutputConsumer):
+    '''
+    Parses build output as it streams past and keeps an index of the diagnostics
+    in it by file, severity and target.  It can be queried (from any thread)
+    while the build is still running.
+
+    Only diagnostics are stored, never the output itself.  Lines that can not be
+    diagnostics are rejected with a few substring checks before any regex runs.
+    '''
+    def __init__(self, max_diagnostics: int=100000):
+        self.max_diagnostics = max_diagnostics
+        self.dropped = 0 #diagnostics not stored because max_diagnostics was reached
+        self.lines_seen = 0
+        self._diagnostics: typing.List[Diagnostic] = []
+        self._by_file: typing.Dict[str, typing.List[int]] = {}
+        self._by_severity: typing.Dict[Severity, typing.List[int]] = {s: [] for s in Severity}
+        self._by_target: typing.Dict[str, typing.List[int]] = {}
+        self._source_targets: typing.Dict[str, str] = {} #source path as cmake names it -> target
+        self._last_target = ""
+        self._cmake: typing.Optional[Diagnostic] = None #a cmake message whose text is still being read
+        self._cmake_lines = 0
+        self._lock = threading.Lock()
+
+    def consume(self, lines: typing.List[str]) -> None:
+        with self._lock:
+            for line in lines:
+                self.lines_seen += 1
+                if self._cmake is not None and self._continue_cmake(line):
+                    continue
+                if "rror" in line or "arning" in line or "note" in line or "remark" in line:
+                    self._parse_diagnostic(line)
+                elif line.startswith("[") and "Building" in line:
+                    self._parse_building(line)
+
+    def _continue_cmake(self, line: str) -> bool:
+        '''
+        Adds line to the cmake message being read if it is part of it.  The message
+        is made of indented lines, possibly separated by blank ones, and ends at the
+        first line that is not indented.
+        '''
+        if len(line.strip()) == 0:
+            return True
+        if not line.startswith(" "):
+            self._cmake = None
+            return False
+        if self._cmake_lines < _CMAKE_MESSAGE_LINES:
+            d = self._cmake
+            d.message = (d.message + " " + line.strip()) if len(d.message) > 0 else line.strip()
+            self._cmake_lines += 1
+        return True
+
+    def _parse_building(self, line: str) -> None:
+        m = _BUILDING.match(line)
+        if m is None:
+            return
+        self._last_target = m.group("target")
+        self._source_targets[m.group("source")] = self._last_target
+
+    def _parse_diagnostic(self, line: str) -> None:
+        if line.startswith("CMake "):
+            m = _CMAKE.match(line)
+            if m is not None:
+                d = Diagnostic(file=(m.group("file") or ""), line=int(m.group("line") or 0), column=0,
+                    severity=(Severity.ERROR if m.group("severity") == "Error" else Severity.WARNING),
+                    message=m.group("message"), tool="cmake", output_line=self.lines_seen)
+                self._add(d)
+                self._cmake = d
+                self._cmake_lines = 0
+            return
+        tool = "gcc"
+        m = _GCC.match(line)
+        if m is None:
+            tool = "msvc"
+            m = _MSVC.match(line)
+        if m is None:
+            tool = "gcc"
+            m = _TOOL.match(line)
+        if m is None:
+            return
+        groups = m.groupdict()
+        file = groups["file"].strip()
+        self._add(Diagnostic(file=file, line=int(groups.get("line") or 0), column=int(groups.get("column") or 0),
+            severity=_SEVERITIES[groups["severity"]], message=groups["message"].strip(),
+            code=(groups.get("code") or ""), target=self._target_for(file), tool=tool,
+            output_line=self.lines_seen))
+
+    def _target_for(self, file: str) -> str:
+        '''
+        Finds the target that compiles file, by matching the end of its path against
+        the sources seen in "Building ... object" lines.  Files that are not compiled
+        directly (headers) are attributed to the most recently started target.
+        '''
+        parts = file.replace("\\", "/").split("/")
+        for i in range(len(parts) - 1, -1, -1):
+            target = self._source_targets.get("/".join(parts[i:]))
+            if target is not None:
+                return target
+        return self._last_target
+
+    def _add(self, d: Diagnostic) -> None:
+        if len(self._diagnostics) >= self.max_diagnostics:
+            self.dropped += 1
+            return
+        index = len(self._diagnostics)
+        self._diagnostics.append(d)
+        self._by_file.setdefault(d.file, []).append(index)
+        self._by_severity[d.severity].append(index)
+        if len(d.target) > 0:
+            self._by_target.setdefault(d.target, []).append(index)
+
+    def diagnostics(self, file: typing.Optional[str]=None, severity: typing.Optional[Severity]=None,
+        target: typing.Optional[str]=None) -> typing.List[Diagnostic]:
+        '''
+        Returns the diagnostics matching every given filter, in output order.
+        '''
+        with self._lock:
+            selections = []
+            if file is not None:
+                selections.append(self._by_file.get(file, []))
+            if severity is not None:
+                selections.append(self._by_severity[severity])
+            if target is not None:
+                selections.append(self._by_target.get(target, []))
+            if len(selections) == 0:
+                return list(self._diagnostics)
+            selections.sort(key=len)
+            indices = set(selections[0]).intersection(*selections[1:])
+            return [self._diagnostics[i] for i in sorted(indices)]
+
+    def first(self, severity: Severity=Severity.ERROR) -> typing.Optional[Diagnostic]:
+        with self._lock:
+            indices = self._by_severity[severity]
+            return self._diagnostics[indices[0]] if len(indices) > 0 else None
+
+    def files(self) -> typing.List[str]:
+        with self._lock:
+            return sorted(self._by_file)
+
+    def targets(self) -> typing.List[str]:
+        with self._lock:
+            return sorted(self._by_target)
+
+    def counts(self) -> typing.Dict[str, int]:
+        with self._lock:
+            return {s.name.lower(): len(self._by_severity[s]) for s in Severity}
+
+    def todict(self) -> dict:
+        with self._lock:
+            return {"lines": self.lines_seen,
+                "dropped": self.dropped,
+                "counts": {s.name.lower(): len(self._by_severity[s]) for s in Severity},
+                "diagnostics": [d.todict() for d in self._diagnostics]}
+
+    def tojson(self) -> str:
+        return json.dumps(self.todict(), sort_keys=True, indent=4)
+
+    def summary(self) -> str:
+        counts = self.counts()
+        text = f"{counts['error']} error(s), {counts['warning']} warning(s)"
+        first = self.first()
+        if first is not None:
+            text += os.linesep + f"First error: {first.file}:{first.line}: {first.message}"
+        return text
@@ -0,0 +1,318 @@
+'''
+Builds projects, or independent targets of one project, on build agents
+(see agent.py for the agents and the protocol).
+
+    scheduler = Scheduler(["buildhost1:7700", "buildhost2:7700"])
+    remote = RemoteExecutor(scheduler, artifacts=["app/app"])
+    remote.execute(project)                         #like project.execute()
+    BuildOrchestrator(graph, runner=remote.runner)  #a whole BuildGraph on the agents
+
+The scheduler places each job on the agent with the most free slots, by the
+capacity and running jobs the agents report and the jobs placed on them since.
+A job whose agent stops answering (no message for heartbeat_timeout seconds,
+or a dropped connection) is submitted again to another agent.
+'''
+import base64, dataclasses, logging, os, select, sys, threading, time, typing, uuid
+
+from agent import HEARTBEAT_INTERVAL, ProtocolError, connect, receive_message, result_fromdict, send_message
+from data import ProjectCommands, ProjectInformation
+from execution import CommandResult, ExecutionResult
+from outputpipe import OutputConsumer, StreamConsumer
+
+if typing.TYPE_CHECKING:
+    import buildhistory
+
+logger = logging.getLogger(__name__)
+
+@dataclasses.dataclass
+class AgentState:
+    '''
+    What a client knows about one agent.
+    '''
+    address: str
+    name: str = ""
+    alive: bool = False
+    capacity: int = 0
+    others: int = 0 #jobs running for other clients, when last asked
+    load: float = 0.0 #load average per cpu, when last asked
+    assigned: int = 0 #jobs placed there by this client that have not finished
+    failures: int = 0
+    error: str = "" #why the agent refused to answer ("not authorized"), when last asked
+
+    @property
+    def free(self) -> int:
+        return self.capacity - self.others - self.assigned
+
+class NoAgentError(Exception):
+    '''
+    No agent could take a job.
+    '''
+
+class _AgentBusy(Exception):
+    pass
+
+class Scheduler:
+    '''
+    Places jobs on agents.  acquire() and release() may be called from any thread.
+    '''
+    poll_interval: float = 2.0 #seconds between asking busy agents again
+
+    def __init__(self, addresses: typing.Iterable[str], token: str="", timeout: float=5.0):
+        self.token = token
+        self.timeout = timeout
+        self.agents = [AgentState(address=a) for a in addresses]
+        self._condition = threading.Condition()
+
+    def _query(self, agent: AgentState) -> typing.Optional[dict]:
+        '''
+        Returns the agent's status or error reply, or None if it did not answer.
+        '''
+        try:
+            with connect(agent.address, self.timeout) as sock:
+                send_message(sock, {"type": "status", "token": self.token})
+                reply = receive_message(sock)
+            if reply["type"] == "error":
+                logger.warning(f"Agent {agent.address} refused to answer: {reply.get('error', '')}")
+            return reply if reply["type"] in ("status", "error") else None
+        except (OSError, ProtocolError) as e:
+            logger.debug(f"Agent {agent.address} did not answer: {e!r}")
+            return None
+
+    def refresh(self) -> None:
+        '''
+        Asks every agent for its capacity and load.
+        '''
+        import concurrent.futures
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(self.agents))) as pool:
+            replies = list(pool.map(self._query, self.agents))
+        with self._condition:
+            for agent, reply in zip(self.agents, replies):
+                agent.alive = reply is not None and reply["type"] == "status"
+                agent.error = str(reply.get("error", "")) if reply is not None and reply["type"] == "error" else ""
+                if agent.alive:
+                    agent.name = reply.get("name", agent.address)
+                    agent.capacity = int(reply.get("capacity", 1))
+                    agent.others = max(0, int(reply.get("running", 0)) - agent.assigned)
+                    agent.load = float(reply.get("load", 0.0))
+            self._condition.notify_all()
+        alive = [a.address for a in self.agents if a.alive]
+        logger.debug(f"{len(alive)} of {len(self.agents)} agent(s) answered: {alive}")
+
+    def acquire(self, exclude: typing.Collection[str]=(), timeout: typing.Optional[float]=None) -> AgentState:
+        '''
+        Returns the agent to run a job on, waiting (up to timeout seconds, default:
+        for ever) for a free slot.  Agents whose address is in exclude are not
+        used.  Raises NoAgentError if no agent is left to try.
+        '''
+        deadline = None if timeout is None else time.monotonic() + timeout
+        refreshed = False
+        with self._condition:
+            while True:
+                candidates = [a for a in self.agents if a.alive and a.address not in exclude]
+                if len(candidates) == 0 and not refreshed:
+                    self._condition.release()
+                    try:
+                        self.refresh()
+                    finally:
+                        self._condition.acquire()
+                    refreshed = True
+                    continue
+                if len(candidates) == 0:
+                    refusals = "".join(f"; {a.address}: {a.error}" for a in self.agents if len(a.error) > 0)
+                    raise NoAgentError(f"{Scheduler.acquire.__qualname__}: no build agent is available{refusals}")
+                free = [a for a in candidates if a.free > 0]
+                if len(free) > 0:
+                    best = max(free, key=lambda a: (a.free, -a.load, -a.failures))
+                    best.assigned += 1
+                    return best
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise NoAgentError(f"{Scheduler.acquire.__qualname__}: every build agent is busy")
+                if not self._condition.wait(min(remaining, self.poll_interval) if remaining is not None else self.poll_interval):
+                    #nothing was released here; other clients' jobs may have finished
+                    self._condition.release()
+                    try:
+                        self.refresh()
+                    finally:
+                        self._condition.acquire()
+
+    def release(self, agent: AgentState, failed: bool=False, busy: bool=False) -> None:
+        '''
+        Gives back the slot acquire() took.  failed: the agent was lost, so it is
+        not used again until the next refresh.  busy: the agent was full, with
+        jobs acquire() did not know about.
+        '''
+        with self._condition:
+            agent.assigned = max(0, agent.assigned - 1)
+            if failed:
+                agent.alive = False
+                agent.failures += 1
+            elif busy:
+                agent.others = max(agent.others, agent.capacity - agent.assigned)
+            self._condition.notify_all()
+
+#starts the line between the output of an attempt on a lost agent and that of the next attempt
+RESTART_MARKER = "cppbuilder: build restarted:"
+
+class AgentLost(Exception):
+    '''
+    The agent running a job stopped answering.
+    '''
+
+class RemoteExecutor:
+    '''
+    Runs builds on the agents of a Scheduler, with the same arguments and
+    results as ProjectInformation.execute.
+    '''
+    def __init__(self, scheduler: Scheduler, retries: int=2, artifacts: typing.Iterable[str]=(),
+        heartbeat_timeout: float=3 * HEARTBEAT_INTERVAL):
+        '''
+        retries: how many more agents to try after the one running a job is lost.
+        artifacts: glob patterns, relative to the build directory, of the files to
+            copy back into the local build directory after a successful build.
+        '''
+        self.scheduler = scheduler
+        self.retries = retries
+        self.artifacts = list(artifacts)
+        self.heartbeat_timeout = heartbeat_timeout
+
+    def execute(self, project: ProjectInformation,
+        commands: ProjectCommands=(ProjectCommands.CMAKE | ProjectCommands.MAKE),
+        consumers: typing.Optional[typing.List[OutputConsumer]]=None,
+        history: typing.Optional["buildhistory.BuildHistory"]=None,
+        cancel: typing.Optional[threading.Event]=None,
+        targets: typing.Optional[typing.List[str]]=None) -> bool:
+        '''
+        Builds project on an agent.  The output is streamed to consumers (default:
+        stdout) as the agent sends it, and the timings end up in
+        project.last_result, as with ProjectInformation.execute.  If the agent is
+        lost and the build starts over on another one, a RESTART_MARKER line
+        separates the output of the two.
+        '''
+        if consumers is None:
+            consumers = [StreamConsumer()]
+        result = ExecutionResult()
+        project.last_result = result
+        tried: typing.Set[str] = set()
+        job = uuid.uuid4().hex
+        attempts = 0
+        lost: typing.Optional[AgentState] = None
+        while attempts <= self.retries:
+            try:
+                agent = self.scheduler.acquire(exclude=tried)
+            except NoAgentError as e:
+                logger.error(f"{e}")
+                break
+            tried.add(agent.address)
+            if lost is not None:
+                restart = [f"{RESTART_MARKER} build agent {lost.name or lost.address} was lost; building again on "
+                    f"{agent.name or agent.address}"]
+                for c in consumers:
+                    c.consume(restart)
+                lost = None
+            try:
+                success, phases = self._submit(agent, job, project, commands, targets, consumers, cancel)
+            except _AgentBusy:
+                self.scheduler.release(agent, busy=True)
+                tried.discard(agent.address)
+                continue
+            except (OSError, ProtocolError, AgentLost) as e:
+                if cancel is not None and cancel.is_set():
+                    self.scheduler.release(agent)
+                    logger.info("Remote build cancelled")
+                    result.commands = [CommandResult(command=[], phase="build", cancelled=True)]
+                    break
+                self.scheduler.release(agent, failed=True)
+                attempts += 1
+                lost = agent
+                logger.warning(f"Lost build agent {agent.name or agent.address} ({e!r})"
+                    + ("; trying another." if attempts <= self.retries else "."))
+                continue
+            self.scheduler.release(agent)
+            result.commands = phases
+            result.success = success
+            break
+        for c in consumers:
+            c.flush()
+        if history is not None:
+            history.record(project, result)
+        return result.success
+
+    def runner(self, project: ProjectInformation, commands: ProjectCommands) -> bool:
+        '''
+        A BuildOrchestrator runner that builds on the agents.
+        '''
+        return self.execute(project, commands)
+
+    def execute_targets(self, project: ProjectInformation, targets: typing.List[str],
+        commands: ProjectCommands=(ProjectCommands.CMAKE | ProjectCommands.MAKE),
+        consumers: typing.Optional[typing.List[OutputConsumer]]=None) -> typing.Dict[str, bool]:
+        '''
+        Builds each of targets as a job of its own, all at once, so independent
+        targets are spread over the agents.  Returns whether each target built.
+        '''
+        import concurrent.futures
+        def build(target: str) -> bool:
+            return self.execute(project.copy(), commands, consumers=consumers, targets=[target])
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(targets)),
+            thread_name_prefix="cppbuilder-remote") as pool:
+            return dict(zip(targets, pool.map(build, targets)))
+
+    def _submit(self, agent: AgentState, job: str, project: ProjectInformation, commands: ProjectCommands,
+        targets: typing.Optional[typing.List[str]], consumers: typing.List[OutputConsumer],
+        cancel: typing.Optional[threading.Event]) -> typing.Tuple[bool, list]:
+        sock = connect(agent.address, self.scheduler.timeout)
+        files: typing.Dict[str, typing.BinaryIO] = {}
+        try:
+            sock.settimeout(self.heartbeat_timeout)
+            send_message(sock, {"type": "submit", "token": self.scheduler.token, "job": job,
+                "project": project.tojson(), "commands": int(commands), "targets": targets,
+                "artifacts": self.artifacts})
+            heard = time.monotonic()
+            while True:
+                if cancel is not None and cancel.is_set():
+                    raise AgentLost("the build was cancelled") #closing the connection cancels it on the agent
+                ready, _, _ = select.select([sock], [], [], 0.25)
+                if len(ready) == 0:
+                    if time.monotonic() - heard > self.heartbeat_timeout:
+                        raise AgentLost(f"no word for {self.heartbeat_timeout:.1f}s")
+                    continue
+                message = receive_message(sock)
+                heard = time.monotonic()
+                kind = message["type"]
+                if kind == "busy":
+                    raise _AgentBusy()
+                elif kind == "accepted":
+                    logger.info(f"Building {project.project_directory} on {message.get('agent', agent.address)}")
+                elif kind == "output":
+                    for c in consumers:
+                        c.consume(message["lines"])
+                elif kind == "artifact":
+                    self._artifact(project, message, files)
+                elif kind == "result":
+                    if len(message.get("error", "")) > 0:
+                        logger.error(f"Build on {agent.name or agent.address} failed: {message['error']}")
+                    return bool(message["success"]), [result_fromdict(p) for p in message.get("phases", [])]
+                elif kind == "error":
+                    raise ProtocolError(message.get("error", "the agent refused the job"))
+        finally:
+            for f in files.values():
+                f.close()
+            sock.close()
+
+    def _artifact(self, project: ProjectInformation, message: dict, files: typing.Dict[str, typing.BinaryIO]) -> None:
+        relative = os.path.normpath(message["path"])
+        if os.path.isabs(relative) or relative.split(os.sep)[0] == "..":
+            raise ProtocolError(f"artifact path \"{message['path']}\" is outside the build directory")
+        path = os.path.join(project.build_directory, relative)
+        if relative not in files:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            files[relative] = open(path, "wb")
+        f = files[relative]
+        f.seek(int(message.get("offset", 0)))
+        f.write(base64.b64decode(message["data"]))
+        if message.get("last", True):
+            f.close()
+            del files[relative]
+            if sys.platform != "win32":
+                os.chmod(path, int(message.get("mode", 0o644)) & 0o777)
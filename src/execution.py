@@ -0,0 +1,206 @@
+import dataclasses, logging, os, signal, subprocess, sys, threading, time, typing
+
+from outputpipe import OutputConsumer, OutputPipe, CHUNK_SIZE
+from compilercache import CacheStats
+import outputpipe
+
+logger = logging.getLogger(__name__)
+
+@dataclasses.dataclass
+class CommandResult:
+    '''
+    The outcome of running one command.
+    '''
+    command: typing.List[str]
+    returncode: int = -1
+    duration: float = 0.0 #wall clock seconds
+    cwd: typing.Optional[str] = None
+    phase: str = ""
+    line_count: int = 0 #lines of output, if it was streamed
+    skipped: bool = False #the step was found to be up to date and nothing was run
+    cancelled: bool = False #the command was stopped before it finished
+    cpu_time: typing.Optional[float] = None #user + system seconds of the whole process tree
+    peak_rss: typing.Optional[int] = None #bytes; the largest resident set of any process in the tree
+    part_of: str = "" #the phase this one ran inside of, whose duration already includes it
+    consumers: typing.List[OutputConsumer] = dataclasses.field(default_factory=list)
+
+    @property
+    def success(self) -> bool:
+        return self.returncode == 0
+
+@dataclasses.dataclass
+class ExecutionResult:
+    '''
+    The outcome of ProjectInformation.execute or execute_async: whether every
+    requested step succeeded, and the result and timing of each step.
+    '''
+    success: bool = False
+    commands: typing.List[CommandResult] = dataclasses.field(default_factory=list)
+    compiler_cache: typing.Optional[CacheStats] = None #hits and misses during the build step
+
+    @property
+    def duration(self) -> float:
+        return sum(c.duration for c in self.commands if len(c.part_of) == 0)
+
+    @property
+    def cancelled(self) -> bool:
+        return any(c.cancelled for c in self.commands)
+
+def child_environment(env: typing.Optional[typing.Dict[str, str]]) -> typing.Optional[typing.Dict[str, str]]:
+    '''
+    Returns the environment for a child process: ours, with env applied on top.
+    '''
+    if env is None or len(env) == 0:
+        return None
+    merged = dict(os.environ)
+    merged.update(env)
+    return merged
+
+def _exit_code(status: int) -> int:
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+def _maxrss_bytes(maxrss: int) -> int:
+    return maxrss if sys.platform == "darwin" else maxrss * 1024 #linux reports kilobytes
+
+def _wait(process: subprocess.Popen, result: "CommandResult") -> None:
+    '''
+    Waits for process, recording its exit code and, where the platform can tell us
+    (wait4), the cpu time and peak memory of it and every descendant it waited for.
+    '''
+    if not hasattr(os, "wait4"):
+        result.returncode = process.wait()
+        return
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = result.returncode = _exit_code(status)
+    result.cpu_time = usage.ru_utime + usage.ru_stime
+    result.peak_rss = _maxrss_bytes(usage.ru_maxrss)
+
+_KILL_GRACE = 5.0 #seconds a cancelled command gets to exit before it is killed
+
+def _terminate(process: subprocess.Popen, done: threading.Event) -> None:
+    '''
+    Stops process and everything it started: politely, and then, if it is still
+    running after _KILL_GRACE seconds, not.
+    '''
+    for sig in ((signal.SIGTERM, signal.SIGKILL) if os.name == "posix" else (None, None)):
+        if done.is_set():
+            return
+        try:
+            if sig is None:
+                process.terminate()
+            else:
+                os.killpg(process.pid, sig) #the command leads its own process group
+        except OSError:
+            return
+        if done.wait(_KILL_GRACE):
+            return
+    process.kill()
+
+def _watch_for_cancel(process: subprocess.Popen, cancel: threading.Event, done: threading.Event,
+    result: CommandResult) -> None:
+    while not done.is_set():
+        if cancel.wait(0.1):
+            if not done.is_set():
+                result.cancelled = True
+                logger.info("Cancelling " + " ".join(result.command))
+                _terminate(process, done)
+            return
+
+def run_command(command: typing.List[str], cwd: typing.Optional[str]=None,
+    env: typing.Optional[typing.Dict[str, str]]=None,
+    consumers: typing.Optional[typing.List[OutputConsumer]]=None, phase: str="",
+    cancel: typing.Optional[threading.Event]=None) -> CommandResult:
+    '''
+    Runs command and waits for it.  The working directory and environment are
+    given to the child only; this process's are never changed.
+
+    If consumers is None, the output goes straight to this process's stdout.
+    Otherwise it is streamed to the consumers as it is produced, with stderr merged
+    into stdout by the child so the two keep their relative order.
+
+    Setting cancel while the command runs stops it, and every process it started,
+    and marks the result cancelled.  A command that can be cancelled runs in a
+    process group (session) of its own.
+    '''
+    result = CommandResult(command=list(command), cwd=cwd, phase=phase, consumers=list(consumers or []))
+    if cancel is not None and cancel.is_set():
+        result.cancelled = True
+        return result
+    options = {"cwd": cwd, "env": child_environment(env)}
+    if cancel is not None and os.name == "posix":
+        options["start_new_session"] = True
+    if consumers is not None:
+        options.update(stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    start = time.monotonic()
+    pipe = OutputPipe(consumers) if consumers is not None else None
+    done = threading.Event()
+    with subprocess.Popen(command, **options) as process:
+        if cancel is not None:
+            threading.Thread(target=_watch_for_cancel, args=(process, cancel, done, result),
+                name="cancel-watch", daemon=True).start()
+        try:
+            if pipe is not None:
+                outputpipe.pump(process.stdout.fileno(), pipe)
+            _wait(process, result)
+        finally:
+            done.set()
+    if pipe is not None:
+        result.line_count = pipe.line_count
+    result.duration = time.monotonic() - start
+    return result
+
+async def run_command_async(command: typing.List[str], cwd: typing.Optional[str]=None,
+    env: typing.Optional[typing.Dict[str, str]]=None,
+    consumers: typing.Optional[typing.List[OutputConsumer]]=None, phase: str="") -> CommandResult:
+    '''
+    The asyncio version of run_command.  Any number of these can run at once on one
+    event loop, each with its own working directory and environment.
+
+    The child is waited for on a thread of its own rather than by the event loop,
+    so its cpu time and peak memory are known where wait4 is, as with run_command.
+    '''
+    result = CommandResult(command=list(command), cwd=cwd, phase=phase, consumers=list(consumers or []))
+    start = time.monotonic()
+    await _run_async(command, cwd, env, consumers, result)
+    result.duration = time.monotonic() - start
+    return result
+
+async def _run_async(command: typing.List[str], cwd: typing.Optional[str], env: typing.Optional[typing.Dict[str, str]],
+    consumers: typing.Optional[typing.List[OutputConsumer]], result: CommandResult) -> None:
+    import asyncio
+    loop = asyncio.get_running_loop()
+    options = {"cwd": cwd, "env": child_environment(env)}
+    if consumers is not None:
+        options.update(stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    process = subprocess.Popen(command, **options)
+    finished = loop.create_future()
+    def wait() -> None:
+        try:
+            _wait(process, result)
+        finally:
+            try:
+                loop.call_soon_threadsafe(lambda: finished.done() or finished.set_result(None))
+            except RuntimeError: #the loop is gone
+                pass
+    threading.Thread(target=wait, name="wait4", daemon=True).start()
+    try:
+        if consumers is not None:
+            reader = asyncio.StreamReader()
+            transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), process.stdout)
+            pipe = OutputPipe(consumers)
+            try:
+                while True:
+                    chunk = await reader.read(CHUNK_SIZE)
+                    if len(chunk) == 0:
+                        break
+                    pipe.feed(chunk)
+                pipe.close()
+            finally:
+                transport.close()
+            result.line_count = pipe.line_count
+        await finished
+    except asyncio.CancelledError:
+        process.kill()
+        raise
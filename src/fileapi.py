@@ -0,0 +1,210 @@
+'''
+Reads the target graph of a configured project through the CMake File API
+(cmake 3.14+), to work out which targets a set of changed files affects.
+
+A query is written into the build directory before every configure, and cmake
+answers it with a codemodel reply.  The reply is parsed once and the result is
+cached, in memory and in the build directory, until the next configure
+replaces the reply.
+'''
+import dataclasses, glob, json, logging, os, threading, typing
+
+logger = logging.getLogger(__name__)
+
+CLIENT: str = "client-cppbuilder"
+
+# files that are compiled only by being included, so they are not always listed as target sources
+HEADER_EXTENSIONS = {".h", ".hh", ".hpp", ".hxx", ".h++", ".inl", ".ipp", ".tpp", ".tcc", ".cuh"}
+
+def _api_directory(build_directory: str) -> str:
+    return os.path.join(build_directory, ".cmake", "api", "v1")
+
+def _normal(path: str) -> str:
+    return os.path.normcase(os.path.normpath(path))
+
+def write_query(build_directory: str) -> None:
+    '''
+    Asks the next configure of build_directory to write a codemodel reply.
+    '''
+    directory = os.path.join(_api_directory(build_directory), "query", CLIENT)
+    path = os.path.join(directory, "query.json")
+    if os.path.isfile(path):
+        return
+    os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"requests": [{"kind": "codemodel", "version": 2}]}, f)
+
+def reply_index(build_directory: str) -> typing.Optional[str]:
+    '''
+    Returns the path of the newest reply index, or None if cmake has not
+    answered a query in build_directory (yet).
+    '''
+    indexes = glob.glob(os.path.join(glob.escape(os.path.join(_api_directory(build_directory), "reply")), "index-*.json"))
+    return max(indexes) if len(indexes) > 0 else None #the names sort by the time they were written
+
+@dataclasses.dataclass
+class Target:
+    name: str
+    id: str
+    type: str
+    source_directory: str #absolute
+    sources: typing.List[str] = dataclasses.field(default_factory=list) #absolute
+    include_directories: typing.List[str] = dataclasses.field(default_factory=list)
+    dependencies: typing.List[str] = dataclasses.field(default_factory=list) #ids
+
+class CodeModel:
+    '''
+    The targets of a configured project, with their sources, include
+    directories and dependencies.
+    '''
+    def __init__(self, source_directory: str, targets: typing.List[Target]):
+        self.source_directory = source_directory
+        self.targets = {t.id: t for t in targets}
+        self._owners: typing.Dict[str, typing.List[str]] = {}
+        self._dependents: typing.Dict[str, typing.List[str]] = {t.id: [] for t in targets}
+        for t in targets:
+            for source in t.sources:
+                self._owners.setdefault(_normal(source), []).append(t.id)
+            for d in t.dependencies:
+                if d in self._dependents:
+                    self._dependents[d].append(t.id)
+
+    def owners(self, path: str) -> typing.Optional[typing.Set[str]]:
+        '''
+        Returns the ids of the targets that compile path.  A header no target lists
+        belongs to the targets that have an include directory above it.  Returns
+        None if path can not be attributed to targets at all.
+        '''
+        path = _normal(path)
+        owners = self._owners.get(path)
+        if owners is not None:
+            return set(owners)
+        if os.path.splitext(path)[1].lower() not in HEADER_EXTENSIONS:
+            return None
+        found = set()
+        for t in self.targets.values():
+            for include in t.include_directories:
+                if path.startswith(_normal(include) + os.sep):
+                    found.add(t.id)
+                    break
+        return found if len(found) > 0 else None
+
+    def affected(self, changed: typing.Iterable[str]) -> typing.Optional[typing.List[str]]:
+        '''
+        Returns the names of the fewest targets that, built, bring the build up to
+        date after the changed files changed: the targets compiling them and every
+        target linking those, leaving out any that another of them depends on (it
+        is built along with it).  Returns None if some change can not be attributed
+        to targets, and everything has to be built.
+        '''
+        affected = set()
+        for path in changed:
+            owners = self.owners(path)
+            if owners is None:
+                logger.debug(f"{path} is not part of any target; building everything")
+                return None
+            affected |= owners
+        stack = list(affected)
+        while len(stack) > 0:
+            for dependent in self._dependents.get(stack.pop(), []):
+                if dependent not in affected:
+                    affected.add(dependent)
+                    stack.append(dependent)
+        covered = set()
+        for t in affected:
+            covered |= self._dependencies(t)
+        return sorted(self.targets[t].name for t in affected - covered)
+
+    def _dependencies(self, target: str) -> typing.Set[str]:
+        found, stack = set(), list(self.targets[target].dependencies)
+        while len(stack) > 0:
+            d = stack.pop()
+            if d not in found and d in self.targets:
+                found.add(d)
+                stack.extend(self.targets[d].dependencies)
+        return found
+
+    def todict(self) -> dict:
+        return {"source": self.source_directory, "targets": [dataclasses.asdict(t) for t in self.targets.values()]}
+
+    @staticmethod
+    def fromdict(data: dict) -> "CodeModel":
+        return CodeModel(data["source"], [Target(**t) for t in data["targets"]])
+
+def parse_reply(index_path: str, configuration: str="") -> CodeModel:
+    '''
+    Parses the codemodel reply that index_path refers to.  Multi-config
+    generators describe every configuration; the named one (default: the first)
+    is used.
+    '''
+    reply = os.path.dirname(index_path)
+    with open(index_path, "r") as f:
+        index = json.load(f)
+    responses = index["reply"][CLIENT]["query.json"]["responses"]
+    codemodel_file = next(r["jsonFile"] for r in responses if r.get("kind") == "codemodel")
+    with open(os.path.join(reply, codemodel_file), "r") as f:
+        codemodel = json.load(f)
+    source_directory = codemodel["paths"]["source"]
+    configurations = codemodel["configurations"]
+    chosen = next((c for c in configurations if c["name"] == configuration), configurations[0])
+
+    targets = []
+    for entry in chosen["targets"]:
+        with open(os.path.join(reply, entry["jsonFile"]), "r") as f:
+            t = json.load(f)
+        includes = []
+        for group in t.get("compileGroups", []):
+            for include in group.get("includes", []):
+                if include["path"] not in includes:
+                    includes.append(include["path"])
+        targets.append(Target(name=t["name"], id=t["id"], type=t["type"],
+            source_directory=os.path.join(source_directory, t["paths"]["source"]),
+            sources=[os.path.join(source_directory, s["path"]) for s in t.get("sources", [])],
+            include_directories=includes,
+            dependencies=[d["id"] for d in t.get("dependencies", [])]))
+    return CodeModel(source_directory, targets)
+
+_CACHE_FILENAME = ".cppbuilder_codemodel.json"
+_loaded: typing.Dict[str, typing.Tuple[str, CodeModel]] = {} #build directory -> (reply index, model)
+_lock = threading.Lock()
+
+def load(build_directory: str) -> typing.Optional[CodeModel]:
+    '''
+    Returns the code model of the last configure of build_directory, or None if
+    there is no reply to read.  The reply is parsed once per configure.
+    '''
+    index = reply_index(build_directory)
+    if index is None:
+        return None
+    key = os.path.abspath(build_directory)
+    name = os.path.basename(index)
+    with _lock:
+        cached = _loaded.get(key)
+    if cached is not None and cached[0] == name:
+        return cached[1]
+
+    model = None
+    cache_path = os.path.join(build_directory, _CACHE_FILENAME)
+    try:
+        with open(cache_path, "r") as f:
+            stored = json.load(f)
+        if stored.get("index") == name:
+            model = CodeModel.fromdict(stored["model"])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    if model is None:
+        try:
+            model = parse_reply(index)
+        except (OSError, ValueError, KeyError, TypeError, StopIteration) as e:
+            logger.warning(f"Could not read the CMake File API reply in {build_directory}: {e!r}")
+            return None
+        try:
+            temporary = cache_path + f".{os.getpid()}.tmp"
+            with open(temporary, "w") as f:
+                json.dump({"index": name, "model": model.todict()}, f)
+            os.replace(temporary, cache_path)
+        except OSError as e:
+            logger.debug(f"Could not cache the code model: {e!r}")
+    with _lock:
+        _loaded[key] = (name, model)
+    return model
@@ -0,0 +1,63 @@
+import logging, os, time, typing
+
+try:
+    import fcntl
+except ImportError: #windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+class FileLock:
+    '''
+    An exclusive lock shared by every process that uses the same lock file path,
+    for read-modify-write cycles on files in Configuration.program_home.  Use it
+    as a context manager.  The lock file itself is left in place; it holds no data.
+
+    The lock is advisory and is released by the operating system if the process
+    dies, so a crash can not leave it held.
+    '''
+    def __init__(self, path: str, timeout: float=30.0):
+        self.path = path
+        self.timeout = timeout
+        self._fd: typing.Optional[int] = None
+
+    def acquire(self) -> None:
+        directory = os.path.dirname(self.path)
+        if len(directory) > 0:
+            os.makedirs(directory, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    os.close(fd)
+                    raise TimeoutError(f"{FileLock.acquire.__qualname__}: \"{self.path}\" is locked by another process")
+                time.sleep(0.01)
+        self._fd = fd
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exception) -> None:
+        self.release()
@@ -1,14 +1,17 @@
 import logging, os
 
 from data import Configuration
+from logsetup import LEVELS as LOG_LEVELS, parse_levels
 
+# nothing is read until a setting is first used
 CONFIG = Configuration()
-LOG_LEVEL = {
-    "critical": logging.CRITICAL,
-    "error":    logging.ERROR,
-    "warning":  logging.WARNING,
-    "info":     logging.INFO,
-    "debug":    logging.DEBUG,
-    "notset":   logging.NOTSET}[CONFIG['DEFAULT']['loglevel']]
-
-LOGFILE = Configuration.program_home + os.path.sep + "builder.log"
\ No newline at end of file
+
+LOGFILE = Configuration.program_home + os.path.sep + "builder.log"
+
+def __getattr__(name: str):
+    #LOG_LEVEL is looked up when it is first used, so importing this module reads no files
+    if name == "LOG_LEVEL":
+        return LOG_LEVELS.get(CONFIG.get("DEFAULT", "loglevel").lower(), logging.INFO)
+    if name == "LOG_SUBSYSTEM_LEVELS":
+        return parse_levels(CONFIG.get("DEFAULT", "loglevels"))
+    raise AttributeError(f"module {__name__} has no attribute {name}")
@@ -0,0 +1,189 @@
+'''
+Fast linkers: finding the ones a compiler can use, telling cmake to link with
+one, and timing the links.
+
+The linker setting of a project is one of:
+    "" / "default": whatever the compiler links with.
+    "auto": the first of KNOWN_LINKERS the project's c++ compiler can use.
+    "mold", "lld", "gold", "bfd": that linker.
+
+CMake 3.29 and newer pick the flags for the compiler themselves
+(CMAKE_LINKER_TYPE).  With older versions cppbuilder's project include (see
+buildmodes.py) adds -fuse-ld=<LINKER_VARIABLE> to the link options of every
+target, which gcc and clang understand and msvc does not; the project's own
+linker flags and $LDFLAGS are left alone.
+
+Whether a compiler can use a linker is found out by running it once, and
+stored with the rest of what the ToolchainCache knows about the compiler.
+
+Link timing runs every link through this file as the linker launcher
+(CMAKE_<LANG>_LINKER_LAUNCHER, cmake 3.21 and newer, make and ninja
+generators), which appends how long each link took to LINK_LOG_FILENAME in
+the build directory:
+
+    python linker.py --time LOG <link command...>
+'''
+import logging, os, subprocess, sys, time, typing
+
+if typing.TYPE_CHECKING:
+    from toolchain import ToolchainCache
+
+logger = logging.getLogger(__name__)
+
+# fastest first; "auto" takes the first one that works
+KNOWN_LINKERS: typing.List[str] = ["mold", "lld", "gold"]
+
+LINK_LOG_FILENAME = ".cppbuilder_links.log"
+
+# the linker, for the project include to use with cmake older than 3.29
+LINKER_VARIABLE = "CPPBUILDER_LINKER"
+
+LAUNCHER_VARIABLES: typing.List[str] = ["CMAKE_C_LINKER_LAUNCHER", "CMAKE_CXX_LINKER_LAUNCHER"]
+
+# every cache entry cmake_definitions and timing set, taken out again once cppbuilder no longer sets them
+CACHE_ENTRIES: typing.List[str] = ["CMAKE_LINKER_TYPE", LINKER_VARIABLE] + LAUNCHER_VARIABLES
+
+_LINKER_TYPES = {"mold": "MOLD", "lld": "LLD", "gold": "GOLD", "bfd": "BFD"}
+
+def _version_tuple(version: str) -> typing.Tuple[int, ...]:
+    try:
+        return tuple(int(part) for part in version.split("."))
+    except ValueError:
+        return ()
+
+def _is_msvc(compiler: str) -> bool:
+    return os.path.splitext(os.path.basename(compiler))[0].lower() in ("cl", "clang-cl")
+
+def usable(compiler: str, linker: str, toolchains: typing.Optional["ToolchainCache"]=None) -> bool:
+    '''
+    Returns whether compiler (a path) can link with linker, by asking it to
+    run the linker for its version.  The answer is kept in toolchains (default:
+    the shared one) for as long as the compiler binary does not change.
+    '''
+    if _is_msvc(compiler):
+        return False
+    if toolchains is None:
+        from data import toolchains as shared
+        toolchains = shared()
+    info = toolchains.probe(compiler)
+    if info is None:
+        return False
+    if linker in info.linkers:
+        return info.linkers[linker]
+    try:
+        works = subprocess.run([info.path, f"-fuse-ld={linker}", "-Wl,--version"], stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL, stdin=subprocess.DEVNULL, timeout=30).returncode == 0
+    except (OSError, subprocess.SubprocessError):
+        works = False
+    logger.debug(f"{compiler} {'can' if works else 'can not'} link with {linker}")
+    toolchains.remember_linker(info.path, linker, works)
+    return works
+
+def available(compiler: str, toolchains: typing.Optional["ToolchainCache"]=None) -> typing.List[str]:
+    '''
+    Returns the KNOWN_LINKERS compiler (a path) can use, fastest first.
+    '''
+    return [name for name in KNOWN_LINKERS if usable(compiler, name, toolchains)]
+
+def find_linker(setting: str, compiler: str, toolchains: typing.Optional["ToolchainCache"]=None) -> typing.Optional[str]:
+    '''
+    Resolves a linker setting (see above) to the name of a linker compiler (a
+    path) can use, or None for the compiler's own.
+    '''
+    setting = setting.strip().lower()
+    if setting in ("", "default", "none"):
+        return None
+    if len(compiler) == 0:
+        logger.warning(f"Linker \"{setting}\" needs a c++ compiler to check it against; using the default.")
+        return None
+    if setting == "auto":
+        for name in KNOWN_LINKERS:
+            if usable(compiler, name, toolchains):
+                return name
+        logger.info(f"None of {', '.join(KNOWN_LINKERS)} work with {compiler}; using its default linker.")
+        return None
+    if setting not in _LINKER_TYPES:
+        logger.warning(f"Unknown linker \"{setting}\"; using the default.")
+        return None
+    if not usable(compiler, setting, toolchains):
+        logger.warning(f"{compiler} can not link with {setting}; using its default linker.")
+        return None
+    return setting
+
+def cmake_definitions(linker: typing.Optional[str], compiler: str, cmake_version: str) -> typing.Dict[str, str]:
+    '''
+    Returns the cmake definitions that make compiler link with linker (a name
+    from find_linker).  With cmake older than 3.29 that is LINKER_VARIABLE,
+    which only works with the project include.
+    '''
+    if linker is None:
+        return {}
+    if _version_tuple(cmake_version) >= (3, 29):
+        return {"CMAKE_LINKER_TYPE": _LINKER_TYPES[linker]}
+    if _is_msvc(compiler):
+        logger.warning(f"Selecting a linker for {compiler} needs cmake 3.29 or newer; using the default.")
+        return {}
+    return {LINKER_VARIABLE: linker}
+
+def timing_supported(cmake_version: str, generator_name: str) -> bool:
+    return _version_tuple(cmake_version) >= (3, 21) and ("Makefiles" in generator_name or "Ninja" in generator_name) \
+        and "NMake" not in generator_name
+
+def timing_launcher(build_directory: str) -> typing.List[str]:
+    '''
+    Returns the linker launcher command that records link times in build_directory.
+    '''
+    #-I -S: the launcher only needs the standard library, and starts faster without site packages.
+    #The log path is absolute, as links run in the directories of their targets.
+    return [sys.executable, "-I", "-S", os.path.abspath(__file__), "--time",
+        os.path.abspath(link_log_path(build_directory))]
+
+def link_log_path(build_directory: str) -> str:
+    return os.path.join(build_directory, LINK_LOG_FILENAME)
+
+def take_link_times(build_directory: str) -> typing.List[typing.Tuple[str, float]]:
+    '''
+    Returns the (output, seconds) of every link recorded in build_directory
+    since the last call, and forgets them.
+    '''
+    path = link_log_path(build_directory)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        os.remove(path)
+    except OSError:
+        return []
+    times = []
+    for line in lines:
+        seconds, _, output = line.partition("\t")
+        try:
+            times.append((output, float(seconds)))
+        except ValueError:
+            pass #a line cut short by a link that was killed
+    return times
+
+def _time(log: str, command: typing.List[str]) -> int:
+    start = time.perf_counter()
+    try:
+        returncode = subprocess.call(command)
+    except OSError as e:
+        print(f"linker.py: can not run {command[0] if len(command) > 0 else 'the linker'}: {e}", file=sys.stderr)
+        return 127
+    seconds = time.perf_counter() - start
+    output = command[command.index("-o") + 1] if "-o" in command[:-1] else ""
+    #one short write per link, so links finishing at once do not interleave
+    try:
+        fd = os.open(log, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, f"{seconds:.6f}\t{output}\n".encode("utf-8"))
+        finally:
+            os.close(fd)
+    except OSError as e: #a lost measurement must not fail the link
+        print(f"linker.py: can not record the link time in {log}: {e}", file=sys.stderr)
+    return returncode
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4 or sys.argv[1] != "--time":
+        print("usage: linker.py --time LOG <link command...>", file=sys.stderr)
+        sys.exit(2)
+    sys.exit(_time(sys.argv[2], sys.argv[3:]))
@@ -0,0 +1,191 @@
+'''
+The program's logging pipeline.  Code that logs only puts the record on a
+bounded queue; one listener thread formats records and writes them to the
+console and the log file.  A slow disk or a flood of build output therefore
+never holds up the thread that logs: when the queue is full, records are
+dropped (and counted) instead.
+'''
+import atexit, enum, logging, logging.handlers, queue, sys, threading, typing
+
+logger = logging.getLogger(__name__)
+
+LOG_FORMAT = "%(asctime)s [%(name)s] [%(levelname)s] -> %(message)s"
+
+LEVELS: typing.Dict[str, int] = {
+    "critical": logging.CRITICAL,
+    "error":    logging.ERROR,
+    "warning":  logging.WARNING,
+    "info":     logging.INFO,
+    "debug":    logging.DEBUG,
+    "notset":   logging.NOTSET}
+
+class OverflowPolicy(enum.Enum):
+    '''
+    Which record is lost when the queue is full.
+    '''
+    DROP_NEW = "new" #the one being logged
+    DROP_OLDEST = "oldest" #the oldest one still waiting
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    '''
+    Puts records on a bounded queue without ever waiting.  What happens when the
+    queue is full is decided by policy, except that warnings and errors always
+    make room for themselves by dropping the oldest record.
+    '''
+    def __init__(self, maxsize: int=10000, policy: OverflowPolicy=OverflowPolicy.DROP_NEW):
+        super().__init__(queue.Queue(maxsize))
+        self.policy = policy
+        self._lock = threading.Lock()
+        self.dropped: typing.Dict[str, int] = {} #level name -> records lost
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        #only merge the arguments into the message, so later changes to them can not
+        #change what is logged.  Formatting happens on the listener thread.
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+        if self.policy == OverflowPolicy.DROP_NEW and record.levelno < logging.WARNING:
+            self._count(record)
+            return
+        try:
+            self._count(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self._count(record)
+
+    def _count(self, record: logging.LogRecord) -> None:
+        if record is None: #the listener's stop sentinel
+            return
+        with self._lock:
+            self.dropped[record.levelname] = self.dropped.get(record.levelname, 0) + 1
+
+    def take_dropped(self) -> typing.Dict[str, int]:
+        '''
+        Returns the records dropped since the last call, by level name.
+        '''
+        with self._lock:
+            dropped, self.dropped = self.dropped, {}
+        return dropped
+
+class _DropReporter(logging.Handler):
+    '''
+    Runs on the listener thread after each record and reports any records that
+    were dropped, so the loss shows up in the log itself.
+    '''
+    def __init__(self, pipeline: "LoggingPipeline"):
+        super().__init__(logging.NOTSET)
+        self.pipeline = pipeline
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.pipeline._report_drops()
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self) -> None:
+        #the queue may be full when stopping; wait for the listener to make room
+        self.queue.put(self._sentinel)
+
+class LoggingPipeline:
+    '''
+    The installed pipeline: the queue handler on the root logger and the listener
+    that empties it.
+    '''
+    def __init__(self, handler: BoundedQueueHandler, handlers: typing.List[logging.Handler]):
+        self.handler = handler
+        self.handlers = handlers
+        self.total_dropped: typing.Dict[str, int] = {}
+        self._listener = _Listener(handler.queue, *handlers, _DropReporter(self),
+            respect_handler_level=True)
+        self._listener.start()
+        self._stopped = False
+
+    def _report_drops(self) -> None:
+        dropped = self.handler.take_dropped()
+        if len(dropped) == 0:
+            return
+        for level, count in dropped.items():
+            self.total_dropped[level] = self.total_dropped.get(level, 0) + count
+        record = logging.LogRecord(__name__, logging.WARNING, __file__, 0,
+            "Logging could not keep up; dropped " + ", ".join(f"{c} {l.lower()}" for l, c in sorted(dropped.items()))
+            + " message(s).", None, None)
+        for h in self.handlers:
+            if record.levelno >= h.level:
+                h.handle(record)
+
+    def stats(self) -> dict:
+        self._report_drops()
+        return {"queued": self.handler.queue.qsize(), "dropped": dict(self.total_dropped)}
+
+    def stop(self) -> None:
+        '''
+        Writes everything still queued, and stops the listener.
+        '''
+        if self._stopped:
+            return
+        self._stopped = True
+        logging.getLogger().removeHandler(self.handler)
+        self._listener.stop()
+        self._report_drops()
+        for h in self.handlers:
+            h.flush()
+            h.close()
+
+def parse_levels(settings: typing.Iterable[str]) -> typing.Dict[str, int]:
+    '''
+    Reads per-subsystem levels written as "logger=level" ("execution=warning",
+    "UI=info").  Entries that can not be understood are ignored.
+    '''
+    levels = {}
+    for setting in settings:
+        name, _, level = setting.partition("=")
+        if len(name.strip()) > 0 and level.strip().lower() in LEVELS:
+            levels[name.strip()] = LEVELS[level.strip().lower()]
+        else:
+            logger.warning(f"Ignoring the log level setting \"{setting}\"")
+    return levels
+
+_pipeline: typing.Optional[LoggingPipeline] = None
+
+def setup(level: int=logging.INFO, levels: typing.Optional[typing.Dict[str, int]]=None,
+    logfile: str="", stream: typing.Optional[typing.TextIO]=None, maxsize: int=10000,
+    policy: OverflowPolicy=OverflowPolicy.DROP_NEW) -> LoggingPipeline:
+    '''
+    Replaces the root logger's handlers with the queued pipeline.  Records go to
+    stream (default: stdout) and, if logfile is given, to a rotating log file.
+    levels sets the level of individual loggers (and their children), by name.
+    Calling it again replaces the previous pipeline.
+    '''
+    global _pipeline
+    if _pipeline is not None:
+        _pipeline.stop()
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = []
+    console = logging.StreamHandler(stream if stream is not None else sys.stdout)
+    handlers.append(console)
+    if len(logfile) > 0:
+        handlers.append(logging.handlers.RotatingFileHandler(logfile, mode="a", maxBytes=int((2**20) * 2.5),
+            backupCount=2, encoding="utf-8", delay=True))
+    for h in handlers:
+        h.setFormatter(formatter)
+
+    root = logging.getLogger()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    queued = BoundedQueueHandler(maxsize=maxsize, policy=policy)
+    root.addHandler(queued)
+    root.setLevel(level)
+    for name, sublevel in (levels or {}).items():
+        logging.getLogger(name).setLevel(sublevel)
+
+    _pipeline = LoggingPipeline(queued, handlers)
+    atexit.register(_pipeline.stop)
+    return _pipeline
@@ -1,31 +1,11 @@
 import logging, sys
 
-from globaldata import LOG_LEVEL, LOGFILE, CONFIG
-from logging.handlers import RotatingFileHandler
+import logsetup
+from globaldata import LOG_LEVEL, LOG_SUBSYSTEM_LEVELS, LOGFILE, CONFIG
 
-def setup_logging():
-    root = logging.getLogger()
-    f = logging.Formatter("%(asctime)s [%(name)s] [%(levelname)s] -> %(message)s")
-    sh = logging.StreamHandler(sys.stdout)
-    sh.setFormatter(f)
-    root.addHandler(sh)
-
-    if CONFIG['DEFAULT']['logfile'] == "on":
-        fh = logging.FileHandler(LOGFILE)
-        fh = RotatingFileHandler(
-            LOGFILE,
-            mode='a',
-            maxBytes=((2**20) * 2.5),
-            backupCount=2,
-            encoding=None,
-            delay=False)
-        
-        fh.setFormatter(f)
-        root.addHandler(fh)
-
-    root.setLevel(LOG_LEVEL)
-
-setup_logging()
+#records are only queued here; a listener thread formats and writes them
+logsetup.setup(level=LOG_LEVEL, levels=LOG_SUBSYSTEM_LEVELS,
+    logfile=LOGFILE if CONFIG.get('DEFAULT', 'logfile') else "")
 logger = logging.getLogger(__name__)
 
 from PyQt5.QtWidgets import QApplication
@@ -39,4 +19,4 @@ def showiu():
     return app.exec()
 
 if __name__ == "__main__":
-    showiu()
\ No newline at end of file
+    showiu()
@@ -0,0 +1,196 @@
+'''
+Builds one project in several configurations at once: every combination of
+build types, compilers, generators and extra cmake definitions, each in a
+build directory of its own under the project's.
+
+    matrix = BuildMatrix(project, build_types=["Debug", "Release"],
+        compilers=[("gcc", "g++"), ("clang", "clang++")])
+    results = matrix.run(stop_on_failure=True)
+    print(report(results))
+
+The cells share one cpu budget: cells build side by side, and each one's
+make -j gets its share of the budget.
+'''
+import dataclasses, itertools, logging, os, re, threading, time, typing
+
+from buildgraph import BuildStatus
+from data import ProjectCommands, ProjectInformation, SupportedCmakeGenerators, available_cpus
+from outputpipe import LogFileConsumer, OutputConsumer, TailConsumer
+
+if typing.TYPE_CHECKING:
+    import buildhistory
+
+logger = logging.getLogger(__name__)
+
+LOG_FILENAME = "cppbuilder-build.log" #each cell's output, in its build directory
+
+_GENERATOR_NAMES = {
+    SupportedCmakeGenerators.NMAKE_MAKEFILE: "nmake",
+    SupportedCmakeGenerators.UNIX_MAKEFILE: "make",
+    SupportedCmakeGenerators.NINJA: "ninja",
+    SupportedCmakeGenerators.NINJA_MULTI_CONFIG: "ninja-multi"}
+
+@dataclasses.dataclass
+class MatrixCell:
+    '''
+    One configuration of the matrix.
+    '''
+    name: str
+    project: ProjectInformation
+
+@dataclasses.dataclass
+class CellResult:
+    name: str
+    status: BuildStatus = BuildStatus.PENDING
+    duration: float = 0.0
+    phases: typing.Dict[str, float] = dataclasses.field(default_factory=dict) #phase -> seconds
+    build_directory: str = ""
+    reason: str = ""
+
+def _safe(text: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._=+-]+", "_", text).strip("_")
+
+class BuildMatrix:
+    '''
+    The cells of a build matrix.  An axis left empty keeps the project's own setting.
+    '''
+    def __init__(self, project: ProjectInformation, build_types: typing.Sequence[str]=(),
+        compilers: typing.Sequence[typing.Tuple[str, str]]=(),
+        generators: typing.Sequence[SupportedCmakeGenerators]=(),
+        definitions: typing.Sequence[typing.Dict[str, str]]=()):
+        '''
+        compilers: (c compiler, c++ compiler) pairs.
+        definitions: sets of extra cmake definitions, added to the project's own.
+        '''
+        self.project = project
+        self.build_types = list(build_types)
+        self.compilers = list(compilers)
+        self.generators = list(generators)
+        self.definitions = [dict(d) for d in definitions]
+
+    def cells(self) -> typing.List[MatrixCell]:
+        cells = []
+        for build_type, compilers, generator, definitions in itertools.product(
+            self.build_types or [None], self.compilers or [None], self.generators or [None], self.definitions or [None]):
+            project = self.project.copy()
+            parts = []
+            if build_type is not None:
+                project.build_type = build_type
+                parts.append(build_type)
+            if compilers is not None:
+                project.c_compiler, project.cpp_compiler = compilers
+                parts.append(os.path.basename(compilers[1]))
+            if generator is not None:
+                project.generator_type = generator
+                parts.append(_GENERATOR_NAMES[generator])
+            if definitions is not None:
+                project.cmake_definitions = dict(project.cmake_definitions, **definitions)
+                parts += [f"{k}={v}" for k, v in sorted(definitions.items())]
+            name = _safe("-".join(parts)) or "default"
+            build = self.project.build_directory
+            if not os.path.isabs(build):
+                build = os.path.join(self.project.project_directory, build)
+            project.build_directory = os.path.join(build, name)
+            cells.append(MatrixCell(name=name, project=project))
+        names = [c.name for c in cells]
+        if len(set(names)) != len(names):
+            raise ValueError(f"{BuildMatrix.cells.__qualname__}: two cells would share a build directory: {names}")
+        return cells
+
+    def run(self, commands: ProjectCommands=(ProjectCommands.CMAKE | ProjectCommands.MAKE),
+        cpu_budget: int=0, max_parallel: int=0, stop_on_failure: bool=False,
+        history: typing.Optional["buildhistory.BuildHistory"]=None,
+        consumers: typing.Optional[typing.Callable[[MatrixCell], typing.List[OutputConsumer]]]=None
+        ) -> typing.Dict[str, CellResult]:
+        '''
+        Builds every cell and returns their results, keyed by cell name, in cell order.
+
+        cpu_budget: the make jobs of all cells together (0: one per available cpu).
+        max_parallel: the most cells built at once (0: as many as the budget allows).
+        stop_on_failure: on the first failure, cancel the running cells and skip
+            the rest.
+        consumers: returns the output consumers of a cell.  By default each cell's
+            output goes to a log file in its build directory.
+        '''
+        import concurrent.futures
+        cells = self.cells()
+        budget = cpu_budget if cpu_budget > 0 else available_cpus()
+        parallel = max(1, min(len(cells), max_parallel if max_parallel > 0 else budget))
+        jobs = max(1, budget // parallel)
+        results = {c.name: CellResult(name=c.name, build_directory=c.project.build_directory) for c in cells}
+        stop = threading.Event()
+        logger.info(f"Building {len(cells)} configuration(s), {parallel} at a time with {jobs} job(s) each.")
+
+        def build(cell: MatrixCell) -> None:
+            result = results[cell.name]
+            if stop.is_set():
+                result.status = BuildStatus.SKIPPED
+                result.reason = "stopped after a failure"
+                return
+            cell.project.build_jobs = jobs
+            tail = TailConsumer(maxlines=1)
+            outputs = self._consumers(cell, consumers)
+            start = time.monotonic()
+            try:
+                success = cell.project.execute(commands, consumers=outputs + [tail], history=history, cancel=stop)
+            except Exception as e:
+                logger.exception(f"Build of {cell.name} raised an exception")
+                success, result.reason = False, repr(e)
+            finally:
+                if consumers is None:
+                    for c in outputs:
+                        c.close()
+            result.duration = time.monotonic() - start
+            executed = cell.project.last_result
+            if executed is not None:
+                for c in executed.commands:
+                    result.phases[c.phase] = result.phases.get(c.phase, 0.0) + c.duration
+            if success:
+                result.status = BuildStatus.SUCCEEDED
+            elif executed is not None and executed.cancelled:
+                result.status = BuildStatus.SKIPPED
+                result.reason = "cancelled after another configuration failed"
+            else:
+                result.status = BuildStatus.FAILED
+                if len(result.reason) == 0 and not cell.project.isvalid():
+                    result.reason = "the project settings are not valid"
+                elif len(result.reason) == 0:
+                    failed = next((c for c in reversed(executed.commands) if not c.success), None) if executed else None
+                    result.reason = (f"{failed.phase} failed" if failed is not None else "failed") + \
+                        (f": {tail.lines[-1]}" if len(tail.lines) > 0 else "")
+                if stop_on_failure and not stop.is_set():
+                    logger.error(f"{cell.name} failed; stopping the other configurations.")
+                    stop.set()
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=parallel, thread_name_prefix="cppbuilder-matrix") as pool:
+            for future in [pool.submit(build, c) for c in cells]:
+                future.result()
+        return results
+
+    def _consumers(self, cell: MatrixCell,
+        consumers: typing.Optional[typing.Callable[[MatrixCell], typing.List[OutputConsumer]]]) -> typing.List[OutputConsumer]:
+        if consumers is not None:
+            return list(consumers(cell))
+        os.makedirs(cell.project.build_directory, exist_ok=True)
+        return [LogFileConsumer(os.path.join(cell.project.build_directory, LOG_FILENAME))]
+
+def report(results: typing.Dict[str, CellResult]) -> str:
+    '''
+    Returns a table of the results: one line per cell with its status and the
+    time each phase took, and a line of totals.
+    '''
+    phases = []
+    for r in results.values():
+        phases += [p for p in r.phases if p not in phases]
+    width = max([len("configuration")] + [len(name) for name in results])
+    lines = ["configuration".ljust(width) + "  status     " + "".join(f"{p:>11}" for p in phases) + "      total"]
+    for r in results.values():
+        line = r.name.ljust(width) + f"  {r.status.value:<9}  " + \
+            "".join((f"{r.phases[p]:10.2f}s" if p in r.phases else " " * 11) for p in phases) + f"{r.duration:10.2f}s"
+        if len(r.reason) > 0:
+            line += "  " + r.reason
+        lines.append(line)
+    counts = {s: sum(1 for r in results.values() if r.status == s) for s in BuildStatus}
+    lines.append(f"{counts[BuildStatus.SUCCEEDED]} succeeded, {counts[BuildStatus.FAILED]} failed, "
+        f"{counts[BuildStatus.SKIPPED]} skipped")
+    return os.linesep.join(lines)
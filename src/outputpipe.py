@@ -0,0 +1,172 @@
+import collections, logging, os, sys, threading, typing
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE: int = 2**16
+MAX_LINE_LENGTH: int = 2**16 #longer lines are split, so a runaway line can not use unbounded memory
+
+class LineSplitter:
+    '''
+    Turns a stream of byte chunks into lines of text.  Only the unfinished
+    last line of each chunk is kept between calls, and it is never allowed to
+    grow beyond max_line bytes.
+    '''
+    def __init__(self, max_line: int=MAX_LINE_LENGTH, encoding: str="utf-8"):
+        self.max_line = max_line
+        self.encoding = encoding
+        self._partial = b""
+
+    def feed(self, chunk: bytes) -> typing.List[str]:
+        '''
+        Returns the lines completed by chunk, without their line endings.
+        '''
+        if len(self._partial) > 0:
+            chunk = self._partial + chunk
+        end = chunk.rfind(b"\n")
+        if end < 0:
+            self._partial = chunk
+            if len(chunk) > self.max_line:
+                return self.finish()
+            return []
+        self._partial = chunk[end + 1:]
+        #decoding the whole chunk at once is much cheaper than decoding line by line
+        text = chunk[:end].decode(self.encoding, errors="replace")
+        if "\r" in text:
+            lines = [line.rstrip("\r") for line in text.split("\n")]
+        else:
+            lines = text.split("\n")
+        if len(self._partial) > self.max_line:
+            lines += self.finish()
+        return lines
+
+    def finish(self) -> typing.List[str]:
+        '''
+        Returns whatever is left over as a final line.
+        '''
+        if len(self._partial) == 0:
+            return []
+        line = self._partial.decode(self.encoding, errors="replace").rstrip("\r")
+        self._partial = b""
+        return [line]
+
+class OutputConsumer:
+    '''
+    Receives the output of a command as batches of lines.  Inherit from this
+    and implement consume.
+
+    One consumer can be used for several commands in a row; flush is called
+    when each command finishes, while close is left to whoever created it.
+    '''
+    def consume(self, lines: typing.List[str]) -> None:
+        raise NotImplementedError(OutputConsumer.consume.__qualname__ + ": Not implemented!")
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+class StreamConsumer(OutputConsumer):
+    '''
+    Writes output to a text stream.  If no stream is given, whatever sys.stdout is
+    at the time of writing is used, so output reaches the UI when UIStream has
+    redirected stdout.
+    '''
+    def __init__(self, stream: typing.Optional[typing.TextIO]=None):
+        self.stream = stream
+
+    def consume(self, lines: typing.List[str]) -> None:
+        stream = self.stream if self.stream is not None else sys.stdout
+        stream.write("\n".join(lines) + "\n")
+
+    def flush(self) -> None:
+        stream = self.stream if self.stream is not None else sys.stdout
+        stream.flush()
+
+class LogFileConsumer(OutputConsumer):
+    '''
+    Appends output to a file.
+    '''
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._file = open(filename, "a", encoding="utf-8", buffering=CHUNK_SIZE)
+
+    def consume(self, lines: typing.List[str]) -> None:
+        self._file.write("\n".join(lines) + "\n")
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+class CallbackConsumer(OutputConsumer):
+    '''
+    Calls a function with every line of output.
+    '''
+    def __init__(self, callback: typing.Callable[[str], None]):
+        self.callback = callback
+
+    def consume(self, lines: typing.List[str]) -> None:
+        for line in lines:
+            self.callback(line)
+
+class TailConsumer(OutputConsumer):
+    '''
+    Keeps only the last few lines of output, for error reports.
+    '''
+    def __init__(self, maxlines: int=50):
+        self.lines = collections.deque(maxlen=maxlines)
+
+    def consume(self, lines: typing.List[str]) -> None:
+        self.lines.extend(lines)
+
+class OutputPipe:
+    '''
+    Splits raw process output into lines and hands each batch to every consumer.
+    A consumer that raises is logged and dropped so it can not break the build.
+    '''
+    def __init__(self, consumers: typing.Iterable[OutputConsumer]=()):
+        self.consumers = list(consumers)
+        self.splitter = LineSplitter()
+        self.line_count = 0
+        self.byte_count = 0
+        self._lock = threading.Lock()
+
+    def feed(self, chunk: bytes) -> None:
+        self.byte_count += len(chunk)
+        self._dispatch(self.splitter.feed(chunk))
+
+    def close(self) -> None:
+        '''
+        Passes on the unfinished last line, if any, and flushes every consumer.
+        '''
+        self._dispatch(self.splitter.finish())
+        for c in self.consumers:
+            try:
+                c.flush()
+            except Exception:
+                logger.exception(f"Output consumer {c!r} failed to flush")
+
+    def _dispatch(self, lines: typing.List[str]) -> None:
+        if len(lines) == 0:
+            return
+        self.line_count += len(lines)
+        with self._lock:
+            for c in list(self.consumers):
+                try:
+                    c.consume(lines)
+                except Exception:
+                    logger.exception(f"Output consumer {c!r} failed, removing it")
+                    self.consumers.remove(c)
+
+def pump(fd: int, pipe: OutputPipe) -> None:
+    '''
+    Reads fd in large chunks until end of file, feeding everything to pipe.
+    '''
+    while True:
+        chunk = os.read(fd, CHUNK_SIZE)
+        if len(chunk) == 0:
+            break
+        pipe.feed(chunk)
+    pipe.close()
@@ -1,57 +1,165 @@
-import threading, time, logging
-from PyQt5.QtCore import pyqtSignal, QObject
+import threading, time, logging, typing
+from PyQt5.QtCore import pyqtSignal, QObject, QRunnable, QThreadPool
 
 logger = logging.getLogger(__name__)
 
-class WindowUpdateThread(QObject, threading.Thread):
+class TaskCancelled(Exception):
     '''
-    Represents a general worker thread for the UI (based on Qt5).
-    This worker thread initializes data from a passed ThreadData object 
-    when the thread of execution is initialized.
+    Raised inside a task when its CancellationToken has been cancelled.
+    '''
+    pass
 
-    WindowUpdateThread.abort can be set to false to make the thread stop
-    on the next iteration.
+class CancellationToken:
+    '''
+    Lets the UI ask a background task to stop.  Tasks check it at convenient
+    points (or wait on it instead of sleeping) and return early.
     '''
+    def __init__(self):
+        self._event = threading.Event()
 
-    update = pyqtSignal(tuple)
-    started = pyqtSignal(tuple)
-    finished = pyqtSignal(tuple)
+    def cancel(self) -> None:
+        self._event.set()
 
-    def __init__(self):
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: typing.Optional[float]=None) -> bool:
         '''
-        __init__(threaddata)
-            initializes this object with threaddata.  the threaddata object also contains
-            the action the thread is to perform.  This allows the 'thread function' to
-            have access to all the data.
+        Sleeps until cancelled or until timeout expires.  Returns True if cancelled.
         '''
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self) -> None:
+        if self.cancelled:
+            raise TaskCancelled()
+
+class UITaskSignals(QObject):
+    '''
+    The signals of a UITask.  QRunnable is not a QObject, so they live here.
+    Every signal is delivered in the GUI thread.
+    '''
+    started = pyqtSignal()
+    progress = pyqtSignal(object)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+class UITask(QRunnable):
+    '''
+    Represents a general background task for the UI (based on Qt5), run on the
+    shared thread pool.
+
+    When you inherit from this object, implement doAction.  It runs on a pool
+    thread and should call self.report(data) whenever it has something new for
+    the UI; its return value is emitted with signals.finished.
+
+    Progress is only sent when there is new data, and at most once every
+    min_interval seconds: reports in between replace each other, and the last
+    one is delivered when the interval is up, even if the task has gone quiet,
+    and always before finished.
+    '''
+    min_interval = 0.05 #seconds
+
+    def __init__(self):
         super().__init__()
-        self.abort = False
-        self.finished = False
-        self.local = None
-        self.windowdata = None
+        self.signals = UITaskSignals()
+        self.token = CancellationToken()
+        self._lock = threading.RLock() #progress is emitted holding it, so it arrives in order
+        self._last_emit = 0.0
+        self._pending = None
+        self._has_pending = False
+        self._timer: typing.Optional[threading.Timer] = None #sends a held back report once the interval is up
 
     def run(self) -> None:
-        if not self.local:
-            self.locals()
-        
-        self.started.emit(self.threaddata)
-        while not self.abort and not self.finished:
-            time.sleep(1 / 60)
-            if self.doAction():
-                self.update.emit(self.windowdata)
-        self.finished.emit(self.windowdata)
-
-    def doAction(self) -> bool:
+        self.signals.started.emit()
+        try:
+            result = self.doAction(self.token)
+        except TaskCancelled:
+            self._flush_progress()
+            self.signals.cancelled.emit()
+            return
+        except Exception as e:
+            logger.exception(f"{type(self).__qualname__} failed")
+            self._flush_progress()
+            self.signals.failed.emit(repr(e))
+            return
+        self._flush_progress()
+        if self.token.cancelled:
+            self.signals.cancelled.emit()
+        else:
+            self.signals.finished.emit(result)
+
+    def doAction(self, token: CancellationToken) -> typing.Any:
+        '''
+        The body of the task.  Check token (or call token.raise_if_cancelled())
+        regularly so cancel() takes effect quickly.
         '''
-        When you inherit from this object, implement this function.  This
-        is the thread.
+        raise NotImplementedError(UITask.doAction.__qualname__ + ": Not implemented!")
 
-        self.windowdata should store data the will be used to update the UI, and 
-            should be set if not set.
+    def cancel(self) -> None:
+        self.token.cancel()
 
-        Return true to update the UI with whatever info you need.
+    def report(self, data: typing.Any) -> None:
         '''
-        raise NotImplementedError(WindowUpdateThread.doAction.__qualname__ + ": Not implemented!")
+        Hands new data to the UI, subject to the rate limit.
+        '''
+        with self._lock:
+            now = time.monotonic()
+            wait = self.min_interval - (now - self._last_emit)
+            if wait > 0:
+                self._pending = data
+                self._has_pending = True
+                if self._timer is None:
+                    self._timer = threading.Timer(wait, self._flush_progress)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+            self._last_emit = now
+            self._has_pending = False
+            self._pending = None
+            self.signals.progress.emit(data)
+
+    def _flush_progress(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._has_pending:
+                return
+            data = self._pending
+            self._has_pending = False
+            self._pending = None
+            self._last_emit = time.monotonic()
+            self.signals.progress.emit(data)
+
+class FunctionTask(UITask):
+    '''
+    A UITask that runs function(token, report), for when a subclass is overkill.
+    '''
+    def __init__(self, function: typing.Callable[[CancellationToken, typing.Callable[[typing.Any], None]], typing.Any]):
+        super().__init__()
+        self._function = function
 
-    def locals(self) -> None:
-        raise NotImplementedError(WindowUpdateThread.locals.__qualname__ + ": Not implemented!")
\ No newline at end of file
+    def doAction(self, token: CancellationToken) -> typing.Any:
+        return self._function(token, self.report)
+
+_pool: typing.Optional[QThreadPool] = None
+
+def shared_pool() -> QThreadPool:
+    '''
+    The thread pool every UI task runs on.
+    '''
+    global _pool
+    if _pool is None:
+        _pool = QThreadPool()
+        logger.debug(f"UI thread pool created with {_pool.maxThreadCount()} threads")
+    return _pool
+
+def start(task: UITask) -> UITask:
+    '''
+    Runs task on the shared pool and returns it, so its signals can be connected
+    and it can be cancelled.
+    '''
+    shared_pool().start(task)
+    return task
@@ -0,0 +1,229 @@
+'''
+An indexed store of every known project and its settings, so projects can be
+listed, searched and opened without walking the filesystem.
+'''
+import logging, os, sqlite3, threading, time, typing
+
+from data import Configuration, ProjectInformation
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS projects (
+    path TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    settings TEXT NOT NULL,
+    added REAL NOT NULL,
+    last_used REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS projects_by_name ON projects (name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS projects_by_use ON projects (last_used DESC);
+'''
+
+# directories that are never searched for projects
+_SKIPPED_DIRECTORIES = {"node_modules", "__pycache__", "CMakeFiles", "_deps"}
+
+def _key(path: str) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+def _upper_bound(prefix: str) -> str:
+    '''
+    The smallest string greater than every string starting with prefix, so that
+    "prefix <= x < bound" is an indexed prefix search.
+    '''
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+class ProjectRegistry:
+    '''
+    Projects and their settings, stored in an sqlite database under
+    Configuration.program_home and keyed by project directory.  Listing and
+    search are ordered most recently used first and are paged with limit and
+    offset, so a menu only loads what it shows.
+    '''
+    default_filename: str = os.path.join(Configuration.program_home, "projects.db")
+
+    def __init__(self, filename: str="", config: typing.Optional[Configuration]=None):
+        '''
+        Projects registered without settings of their own get config applied.
+        '''
+        self.filename = filename if len(filename) > 0 else ProjectRegistry.default_filename
+        self.config = config
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.filename)
+        if len(directory) > 0:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.filename, timeout=30)
+        with self._lock:
+            if not self._initialized:
+                connection.executescript(_SCHEMA)
+                self._initialized = True
+        return connection
+
+    def save(self, project: ProjectInformation, used: bool=False) -> None:
+        '''
+        Adds project, or replaces the stored settings of the project in the same
+        directory.  If used is true it also becomes the most recently used project.
+        '''
+        path = _key(project.project_directory)
+        now = time.time()
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute(
+                    "INSERT INTO projects (path, name, settings, added, last_used) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(path) DO UPDATE SET settings = excluded.settings, "
+                    "last_used = MAX(projects.last_used, excluded.last_used)",
+                    (path, os.path.basename(path), project.tojson(), now, (now if used else 0.0)))
+        finally:
+            connection.close()
+
+    def get(self, path: str) -> typing.Optional[ProjectInformation]:
+        '''
+        Returns the stored settings of the project in directory path, or None if
+        it is not registered.
+        '''
+        connection = self._connect()
+        try:
+            row = connection.execute("SELECT settings FROM projects WHERE path = ?", (_key(path),)).fetchone()
+        finally:
+            connection.close()
+        if row is None:
+            return None
+        project = ProjectInformation()
+        project.fromjson(row[0])
+        return project
+
+    def open(self, path: str) -> ProjectInformation:
+        '''
+        Returns the settings of the project in directory path and marks it as the
+        most recently used.  Unknown directories are registered with default settings.
+        '''
+        project = self.get(path)
+        if project is None:
+            project = self.new_project(path)
+            self.save(project, used=True)
+        else:
+            self.touch(path)
+        return project
+
+    def touch(self, path: str) -> None:
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute("UPDATE projects SET last_used = ? WHERE path = ?", (time.time(), _key(path)))
+        finally:
+            connection.close()
+
+    def remove(self, path: str) -> bool:
+        connection = self._connect()
+        try:
+            with connection:
+                return connection.execute("DELETE FROM projects WHERE path = ?", (_key(path),)).rowcount > 0
+        finally:
+            connection.close()
+
+    def search(self, text: str="", limit: int=50, offset: int=0) -> typing.List[typing.Tuple[str, str]]:
+        '''
+        Returns (path, name) of registered projects, most recently used first.
+        Text that looks like a path matches the beginning of project directories;
+        anything else matches the beginning of project (directory) names,
+        ignoring case.  Empty text matches everything.
+        '''
+        where, arguments = self._condition(text)
+        connection = self._connect()
+        try:
+            return [tuple(r) for r in connection.execute(
+                "SELECT path, name FROM projects" + where + " ORDER BY last_used DESC, name COLLATE NOCASE LIMIT ? OFFSET ?",
+                arguments + [limit, offset])]
+        finally:
+            connection.close()
+
+    def count(self, text: str="") -> int:
+        where, arguments = self._condition(text)
+        connection = self._connect()
+        try:
+            return connection.execute("SELECT COUNT(*) FROM projects" + where, arguments).fetchone()[0]
+        finally:
+            connection.close()
+
+    def _condition(self, text: str) -> typing.Tuple[str, typing.List[str]]:
+        text = text.strip()
+        if len(text) == 0:
+            return ("", [])
+        if os.sep in text or "/" in text or text.startswith("~"):
+            prefix = os.path.normcase(os.path.expanduser(text))
+            return (" WHERE path >= ? AND path < ?", [prefix, _upper_bound(prefix)])
+        #NOCASE folds ascii letters to lower case, so the bound must be computed from lower case too
+        text = text.lower()
+        return (" WHERE name >= ? COLLATE NOCASE AND name < ? COLLATE NOCASE", [text, _upper_bound(text)])
+
+    def import_tree(self, root: str, max_workers: int=8) -> typing.List[str]:
+        '''
+        Finds every CMake project under root and registers the ones that are not
+        registered yet, keeping the settings of those that are.  Returns the
+        directories of all the projects found.
+        '''
+        found = find_projects(root, max_workers=max_workers)
+        now = time.time()
+        rows = []
+        for path in found:
+            rows.append((_key(path), os.path.basename(path), self.new_project(path).tojson(), now))
+        connection = self._connect()
+        try:
+            with connection:
+                connection.executemany(
+                    "INSERT OR IGNORE INTO projects (path, name, settings, added) VALUES (?, ?, ?, ?)", rows)
+        finally:
+            connection.close()
+        logger.info(f"Found {len(found)} project(s) under \"{root}\"")
+        return found
+
+    def new_project(self, path: str) -> ProjectInformation:
+        '''
+        Default settings for the project in directory path.
+        '''
+        path = os.path.abspath(path)
+        project = ProjectInformation(project_directory=path, source_directory=".",
+            build_directory=os.path.join(path, "build"), dist_directory=os.path.join(path, "dist"))
+        if self.config is not None:
+            project.applyconfig(self.config)
+        return project
+
+def _scan(directory: str) -> typing.Tuple[bool, typing.List[str]]:
+    '''
+    Returns whether directory holds a CMakeLists.txt, and its subdirectories.
+    '''
+    subdirectories, islist = [], False
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name == "CMakeLists.txt":
+                    islist = True
+                elif (entry.is_dir(follow_symlinks=False) and not entry.name.startswith(".")
+                    and entry.name not in _SKIPPED_DIRECTORIES):
+                    subdirectories.append(entry.path)
+    except OSError as e:
+        logger.debug(f"Not searching {directory}: {e!r}")
+    return (islist, subdirectories)
+
+def find_projects(root: str, max_workers: int=8) -> typing.List[str]:
+    '''
+    Returns the project roots under root: directories holding a CMakeLists.txt
+    that are not inside another such directory.  Directories are listed in
+    parallel, one level of the tree at a time.
+    '''
+    import concurrent.futures
+    found, level = [], [os.path.abspath(root)]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        while len(level) > 0:
+            following = []
+            for directory, (islist, subdirectories) in zip(level, pool.map(_scan, level)):
+                if islist:
+                    found.append(directory) #subprojects belong to this project; do not descend
+                else:
+                    following.extend(subdirectories)
+            level = following
+    return sorted(found)
@@ -6,6 +6,31 @@ included in a release build of this software.
 import unittest, logging, sys
 
 from unit_tests.datatests import ProjectInformationTestCase # noqa: F401
+from unit_tests.buildgraphtests import BuildGraphTestCase # noqa: F401
+from unit_tests.configcachetests import ConfigureCacheTestCase # noqa: F401
+from unit_tests.cleanertests import CleanerTestCase # noqa: F401
+from unit_tests.outputpipetests import OutputPipeTestCase # noqa: F401
+from unit_tests.executiontests import ExecutionTestCase # noqa: F401
+from unit_tests.threadstests import ThreadsTestCase # noqa: F401
+from unit_tests.buildhistorytests import BuildHistoryTestCase # noqa: F401
+from unit_tests.diagnosticstests import DiagnosticIndexTestCase # noqa: F401
+from unit_tests.compilercachetests import CompilerCacheTestCase # noqa: F401
+from unit_tests.toolchaintests import ToolchainCacheTestCase # noqa: F401
+from unit_tests.registrytests import ProjectRegistryTestCase # noqa: F401
+from unit_tests.watchertests import WatcherTestCase # noqa: F401
+from unit_tests.fileapitests import FileApiTestCase # noqa: F401
+from unit_tests.clitests import CliTestCase # noqa: F401
+from unit_tests.configurationtests import ConfigurationTestCase # noqa: F401
+from unit_tests.logsetuptests import LogSetupTestCase # noqa: F401
+from unit_tests.benchmarktests import BenchmarkTestCase # noqa: F401
+from unit_tests.uireplaytests import UIReplayTestCase # noqa: F401
+from unit_tests.distributedtests import DistributedTestCase # noqa: F401
+from unit_tests.matrixtests import BuildMatrixTestCase # noqa: F401
+from unit_tests.buildmodestests import BuildModesTestCase # noqa: F401
+from unit_tests.linkertests import LinkerTestCase # noqa: F401
+from unit_tests.stdredirecttests import UIStreamTestCase # noqa: F401
+from unit_tests.asyncbridgetests import AsyncRunnerTestCase # noqa: F401
+from unit_tests.quithreadtests import UITaskTestCase # noqa: F401
 
 def setup_logging():
     root = logging.getLogger()
@@ -1,37 +1,56 @@
-import threading, time, logging
+import concurrent.futures, enum, itertools, queue, threading, logging, typing
 
 logger = logging.getLogger(__name__)
 
+_STOP = object() #queued to wake a thread up so it notices it should stop
+
 class Worker(threading.Thread):
     '''
-    An arbitrary worker thread.
+    An arbitrary worker thread that processes submitted work items in order.
+
+    The thread sleeps until work is submitted and wakes up as soon as it is, so
+    an idle worker costs nothing and a new item is started without delay.
     '''
-    def __init__(self, functor):
+    def __init__(self, functor: typing.Optional[typing.Callable]=None):
         '''
-        functor: the function to execute on each iteration.  Takes no arguments.
+        functor: the function to call for each submitted work item, with the arguments
+        the item was submitted with.
 
         If the functor is None, Worker.doWork will be the function used for implimentation,
         allowing for polymorphic implimentation much like threading.Thread, where doWork is the
         implemented function instead of run.
         '''
-        super(Worker, self).__init__()
-        self.throttle = 30 #iterates 30 times per second
+        super(Worker, self).__init__(daemon=True)
         self._running = False #True when the thread is running
         self._stopthread = False #True when the caller wants the thread to stop
         self._functor = functor
-    
-    def halt_thread(self) -> None:
+        self._queue = queue.Queue()
+
+    def submit(self, *args, **kwargs) -> None:
         '''
-        Stops this worker thread.
+        Queues a work item.  The functor (or doWork) is called with these arguments.
+        '''
+        if self._stopthread:
+            raise RuntimeError(Worker.submit.__qualname__ + ": the worker has been halted.")
+        self._queue.put((args, kwargs))
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def halt_thread(self, timeout: typing.Optional[float]=None) -> None:
+        '''
+        Stops this worker thread.  The work item being processed is finished; anything
+        still queued is discarded.
         '''
-        if not self.isAlive():
-            return
         self._stopthread = True
-        self.join()
-        if self._running:
+        if not self.is_alive():
+            return
+        self._queue.put(_STOP)
+        self.join(timeout)
+        if self.is_alive():
             raise RuntimeError("Failed to stop thread")
-    
-    def doWork(self) -> None:
+
+    def doWork(self, *args, **kwargs) -> None:
         raise NotImplementedError(Worker.doWork.__qualname__ + ": Not implemented.")
 
     def tryLog(self, message) -> bool:
@@ -43,10 +62,83 @@ class Worker(threading.Thread):
 
     def run(self):
         self._running = True
-        while(not self._stopthread):
-            if self._functor is not None:
-                self._functor()
-            else:
-                self.doWork()
-            time.sleep(1 / self.throttle)
-        self._running = False
\ No newline at end of file
+        while not self._stopthread:
+            item = self._queue.get() #blocks until there is something to do
+            if item is _STOP or self._stopthread:
+                break
+            args, kwargs = item
+            try:
+                if self._functor is not None:
+                    self._functor(*args, **kwargs)
+                else:
+                    self.doWork(*args, **kwargs)
+            except Exception:
+                logger.exception(f"{self.name}: work item failed")
+        self._running = False
+
+class TaskPriority(enum.IntEnum):
+    '''
+    Priorities for WorkerPool tasks.  Lower values run first.
+    '''
+    PARSE = 0 #short and the UI is waiting on it
+    BUILD = 1
+    CLEAN = 2 #background deletion can always wait
+
+class WorkerPool:
+    '''
+    A fixed number of worker threads sharing one priority queue.  Whenever a
+    thread becomes free it takes the highest priority task that is waiting;
+    tasks of equal priority run in the order they were submitted.
+    '''
+    def __init__(self, threads: int=2, name: str="cppbuilder-worker"):
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._shutdown = False
+        self._threads = [threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True) for i in range(threads)]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, function: typing.Callable, *args,
+        priority: TaskPriority=TaskPriority.BUILD, **kwargs) -> concurrent.futures.Future:
+        '''
+        Queues function(*args, **kwargs) and returns a Future for its result.
+        '''
+        if self._shutdown:
+            raise RuntimeError(WorkerPool.submit.__qualname__ + ": the pool has been shut down.")
+        future = concurrent.futures.Future()
+        self._queue.put((int(priority), next(self._sequence), (future, function, args, kwargs)))
+        return future
+
+    def shutdown(self, wait: bool=True, cancel_pending: bool=False) -> None:
+        '''
+        Stops the pool once the queued tasks are done (or, with cancel_pending,
+        as soon as the running tasks are done).
+        '''
+        self._shutdown = True
+        if cancel_pending:
+            while True:
+                try:
+                    _, _, task = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if task is not _STOP:
+                    task[0].cancel()
+        for _ in self._threads:
+            #sorts after every real task, so the queue drains first
+            self._queue.put((len(TaskPriority) + 1, next(self._sequence), _STOP))
+        if wait:
+            for t in self._threads:
+                t.join()
+
+    def _run(self) -> None:
+        while True:
+            _, _, task = self._queue.get()
+            if task is _STOP:
+                return
+            future, function, args, kwargs = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(function(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
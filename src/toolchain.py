@@ -0,0 +1,188 @@
+import dataclasses, glob, json, logging, os, re, shutil, subprocess, threading, typing
+
+logger = logging.getLogger(__name__)
+
+# tool kind -> program names to look for.  Versioned names (gcc-12, clang++-15) are found too.
+TOOL_NAMES: typing.Dict[str, typing.List[str]] = {
+    "c": ["gcc", "clang", "cc"],
+    "cpp": ["g++", "clang++", "c++"],
+    "cmake": ["cmake"],
+    "ninja": ["ninja"],
+    "make": ["make", "gmake", "nmake"]}
+
+COMMON_PREFIXES: typing.List[str] = ["/usr/bin", "/usr/local/bin", "/opt/homebrew/bin", "/opt/local/bin",
+    r"C:\Program Files\LLVM\bin", r"C:\Program Files\CMake\bin", r"C:\msys64\mingw64\bin"]
+
+_VERSION = re.compile(r"(\d+\.\d+(?:\.\d+)?)")
+
+@dataclasses.dataclass
+class ToolInfo:
+    '''
+    What probing a tool binary found out.  mtime_ns and size identify the binary
+    the information belongs to.
+    '''
+    path: str
+    kind: str
+    version: str = ""
+    target: str = "" #target triple, for compilers
+    mtime_ns: int = 0
+    size: int = 0
+    linkers: typing.Dict[str, bool] = dataclasses.field(default_factory=dict) #for compilers: can use -fuse-ld=<name>
+
+def _stat(path: str) -> typing.Optional[typing.Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def _kind_of(path: str) -> str:
+    name = os.path.splitext(os.path.basename(path))[0].lower()
+    for kind in ("cpp", "c", "cmake", "ninja", "make"): #c++ names before c names, they overlap
+        for base in TOOL_NAMES[kind]:
+            if name == base or re.match(re.escape(base) + r"-\d+(\.\d+)*$", name):
+                return kind
+    return ""
+
+def _first_line(command: typing.List[str]) -> str:
+    try:
+        completed = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            stdin=subprocess.DEVNULL, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return ""
+    lines = completed.stdout.decode("utf-8", errors="replace").strip().splitlines()
+    return lines[0].strip() if len(lines) > 0 else ""
+
+class ToolchainCache:
+    '''
+    Finds compilers and build tools and remembers what they are.
+
+    Probing a binary (running it to learn its version and target) happens once;
+    the result is stored on disk keyed by the binary's path, and is reused for as
+    long as the binary's modification time and size stay the same.  Resolving a
+    bare program name to a path is remembered for the life of the process and
+    rechecked with a single stat.
+    '''
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._tools: typing.Optional[typing.Dict[str, ToolInfo]] = None
+        self._resolved: typing.Dict[typing.Tuple[str, str], typing.Tuple[str, typing.Tuple[int, int]]] = {}
+        self._lock = threading.RLock()
+
+    def resolve(self, name: str) -> typing.Optional[str]:
+        '''
+        Returns the absolute path of the program name refers to (a path, or a
+        program name searched for on PATH), or None if there is no such program.
+        '''
+        if len(name) == 0:
+            return None
+        key = (name, os.environ.get("PATH", ""))
+        with self._lock:
+            cached = self._resolved.get(key)
+        if cached is not None and _stat(cached[0]) == cached[1]:
+            return cached[0]
+        if os.path.dirname(name) != "" or os.path.isabs(name):
+            path = os.path.abspath(name) if os.path.isfile(name) else None
+        else:
+            path = shutil.which(name)
+            path = os.path.abspath(path) if path is not None else None
+        if path is None:
+            return None
+        identity = _stat(path)
+        if identity is not None:
+            with self._lock:
+                self._resolved[key] = (path, identity)
+        return path
+
+    def probe(self, name: str) -> typing.Optional[ToolInfo]:
+        '''
+        Returns what is known about the program name refers to, running it only if
+        it has not been seen before or has changed since.
+        '''
+        path = self.resolve(name)
+        if path is None:
+            return None
+        identity = _stat(path)
+        with self._lock:
+            tools = self._load()
+            info = tools.get(path)
+            if info is not None and (info.mtime_ns, info.size) == identity:
+                return info
+        info = self._probe(path, identity)
+        with self._lock:
+            tools[path] = info
+            self._save()
+        return info
+
+    def remember_linker(self, compiler: str, linker: str, usable: bool) -> None:
+        '''
+        Stores whether compiler can link with linker (see linker.py), along with
+        what probe() found out about it, so it is not asked again.
+        '''
+        info = self.probe(compiler)
+        if info is None:
+            return
+        with self._lock:
+            info.linkers[linker] = usable
+            self._save()
+
+    def discover(self, extra_directories: typing.Iterable[str]=()) -> typing.List[ToolInfo]:
+        '''
+        Searches PATH, COMMON_PREFIXES and extra_directories for every kind of tool in
+        TOOL_NAMES and returns them all, probing new or changed binaries in parallel.
+        '''
+        directories, seen = [], set()
+        for d in os.environ.get("PATH", "").split(os.pathsep) + COMMON_PREFIXES + list(extra_directories):
+            real = os.path.realpath(d) if len(d) > 0 else ""
+            if len(real) > 0 and real not in seen and os.path.isdir(real):
+                seen.add(real) #/bin is often a link to /usr/bin
+                directories.append(os.path.abspath(d))
+
+        candidates = []
+        for d in directories:
+            for names in TOOL_NAMES.values():
+                for base in names:
+                    for pattern in (base, base + ".exe", base + "-[0-9]*"):
+                        for path in glob.glob(os.path.join(glob.escape(d), pattern)):
+                            real = os.path.realpath(path)
+                            if os.path.isfile(real) and os.access(real, os.X_OK) and _kind_of(path) != "":
+                                candidates.append(path)
+
+        import concurrent.futures
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+            found = [info for info in pool.map(self.probe, sorted(set(candidates))) if info is not None]
+        return found
+
+    def _probe(self, path: str, identity: typing.Optional[typing.Tuple[int, int]]) -> ToolInfo:
+        kind = _kind_of(path)
+        info = ToolInfo(path=path, kind=kind, mtime_ns=(identity or (0, 0))[0], size=(identity or (0, 0))[1])
+        if os.path.splitext(os.path.basename(path))[0].lower() != "nmake": #nmake has no --version
+            versions = _VERSION.findall(_first_line([path, "--version"]))
+            info.version = versions[-1] if len(versions) > 0 else ""
+        if kind in ("c", "cpp"):
+            info.target = _first_line([path, "-dumpmachine"])
+        logger.debug(f"Probed {path}: {kind} {info.version} {info.target}")
+        return info
+
+    def _load(self) -> typing.Dict[str, ToolInfo]:
+        if self._tools is None:
+            self._tools = {}
+            try:
+                with open(self.filename, "r") as f:
+                    for entry in json.load(f):
+                        self._tools[entry["path"]] = ToolInfo(**entry)
+            except (OSError, ValueError, TypeError, KeyError):
+                pass
+        return self._tools
+
+    def _save(self) -> None:
+        directory = os.path.dirname(self.filename)
+        temporary = self.filename + f".{os.getpid()}.tmp"
+        try:
+            if len(directory) > 0:
+                os.makedirs(directory, exist_ok=True)
+            with open(temporary, "w") as f:
+                json.dump([dataclasses.asdict(t) for t in self._tools.values()], f, indent=1)
+            os.replace(temporary, self.filename)
+        except OSError as e:
+            logger.warning("Unable to save the toolchain cache: " + repr(e))
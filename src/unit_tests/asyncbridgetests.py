@@ -0,0 +1,96 @@
+import unittest, logging, asyncio, os, tempfile, threading, time
+
+try:
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    from UI.asyncbridge import AsyncRunner
+    from UI.stdredirect import UIStream
+    from UI.widgets import MainBuildMenu
+except ImportError:
+    QApplication = None
+
+from benchmarks.synthetic import SyntheticSpec, generate
+from unit_tests import testdata
+
+logger = logging.getLogger("TEST: " + __name__)
+
+@unittest.skipIf(QApplication is None, "needs PyQt5")
+class AsyncRunnerTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.app = QApplication.instance() or QApplication([])
+
+    def setUp(self) -> None:
+        self.runner = AsyncRunner()
+        self.finished, self.failed, self.threads = [], [], set()
+        def finished(tag, result) -> None:
+            self.finished.append((tag, result))
+            self.threads.add(threading.get_ident())
+        def failed(tag, error) -> None:
+            self.failed.append((tag, error))
+            self.threads.add(threading.get_ident())
+        self.runner.finished.connect(finished)
+        self.runner.failed.connect(failed)
+
+    def tearDown(self) -> None:
+        self.runner.shutdown()
+        self.assertFalse(self.runner._thread.is_alive())
+
+    def _wait_for(self, count: int) -> None:
+        deadline = time.monotonic() + 10
+        while len(self.finished) + len(self.failed) < count and time.monotonic() < deadline:
+            self.app.processEvents()
+            time.sleep(0.005)
+
+    def test_results_reach_the_gui_thread(self) -> None:
+        async def value(v: int) -> int:
+            await asyncio.sleep(0.01)
+            return v * 2
+        async def broken() -> None:
+            raise RuntimeError("no")
+        futures = [self.runner.submit(value(i), tag=i) for i in range(3)] + [self.runner.submit(broken(), tag="broken")]
+        self._wait_for(4)
+        self.assertEqual(sorted(self.finished), [(0, 0), (1, 2), (2, 4)])
+        self.assertEqual(self.failed, [("broken", repr(RuntimeError("no")))])
+        self.assertEqual(self.threads, {threading.get_ident()})
+        self.assertEqual(futures[1].result(), 2)
+
+    def test_cancel(self) -> None:
+        started = threading.Event()
+        async def forever() -> None:
+            started.set()
+            await asyncio.sleep(3600)
+        future = self.runner.submit(forever(), tag="slow")
+        self.assertTrue(started.wait(10))
+        future.cancel()
+        self._wait_for(1)
+        self.assertEqual(self.failed, [("slow", "cancelled")])
+        self.assertEqual(self.finished, [])
+
+    @testdata.requires_toolchain()
+    def test_build_menu(self) -> None:
+        self.addCleanup(AsyncRunner.shutdown_instance)
+        self.addCleanup(UIStream.reset_streams)
+        with tempfile.TemporaryDirectory() as directory:
+            project = generate(directory, SyntheticSpec(targets=2, sources=2))
+            menu = MainBuildMenu(None, project)
+            menu.buildbutton.click()
+            self.assertFalse(menu.buildbutton.isEnabled())
+            deadline = time.monotonic() + 60
+            while menu._build is not None and time.monotonic() < deadline:
+                self.app.processEvents()
+                time.sleep(0.005)
+            self.assertTrue(menu.buildbutton.isEnabled())
+            #build output still waiting for its batch must not reach later tests' widgets
+            UIStream.stdout().flush_ui()
+            UIStream.stderr().flush_ui()
+            self.assertTrue(project.last_result.success)
+            self.assertEqual([c.phase for c in project.last_result.commands], ["configure", "build"])
+            #the build's output went through the diagnostics list's index
+            self.assertGreater(menu.diagnostics.index.lines_seen, 0)
+            menu.diagnostics.index.consume(["main.cpp:3:5: error: 'x' was not declared in this scope"])
+            menu.diagnostics.refresh()
+            tree = menu.diagnostics.tree
+            self.assertIn("main.cpp", [tree.topLevelItem(i).text(0) for i in range(tree.topLevelItemCount())])
+            menu.deleteLater()
@@ -0,0 +1,39 @@
+import logging, os
+
+from benchmarks.synthetic import SyntheticSpec, generate
+from benchmarks.run import METRICS, compare, run_benchmark
+from unit_tests import testdata
+
+logger = logging.getLogger("TEST: " + __name__)
+
+@testdata.requires_toolchain()
+class BenchmarkTestCase(testdata.TemporaryDirectoryTestCase):
+
+    def test_generated_project_builds(self) -> None:
+        spec = SyntheticSpec(targets=3, sources=4, include_depth=2)
+        project = generate(self.tempdir.name, spec)
+        self.assertTrue(project.isvalid())
+        self.assertTrue(os.path.isfile(os.path.join(self.tempdir.name, "src", "lib0", "include", "lib0_1.h")))
+        self.assertFalse(os.path.exists(os.path.join(self.tempdir.name, "src", "lib0", "include", "lib0_2.h")))
+        self.assertTrue(project.execute(consumers=[]))
+        self.assertEqual([c.phase for c in project.last_result.commands], ["configure", "build"])
+        self.assertTrue(os.path.isfile(os.path.join(project.build_directory, "app", "app")))
+        self.assertTrue(os.path.isfile(os.path.join(project.build_directory, "lib1", "liblib1.a")))
+        with self.assertRaises(ValueError):
+            generate(self.tempdir.name, SyntheticSpec(targets=0))
+
+    def test_results(self) -> None:
+        results = run_benchmark(SyntheticSpec(targets=2, sources=2, include_depth=1), repeat=1,
+            directory=self.tempdir.name)
+        self.assertEqual(sorted(results["metrics"]), sorted(METRICS))
+        for name in METRICS:
+            self.assertEqual(len(results["metrics"][name]["samples"]), 1)
+            self.assertGreaterEqual(results["metrics"][name]["median"], 0.0)
+        self.assertGreater(results["derived"]["throughput.raw"], 0.0)
+        self.assertEqual(results["spec"]["sources"], 2)
+
+        slower = dict(results, metrics=dict(results["metrics"],
+            **{"raw.build": dict(results["metrics"]["raw.build"], median=results["metrics"]["raw.build"]["median"] * 2)}))
+        self.assertEqual(compare(results, results), [])
+        self.assertEqual(len(compare(results, slower)), 1)
+        self.assertTrue(compare(results, slower)[0].startswith("raw.build:"))
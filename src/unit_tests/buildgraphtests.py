@@ -0,0 +1,65 @@
+import unittest, logging, threading
+
+from data import ProjectInformation
+from buildgraph import BuildGraph, BuildOrchestrator, BuildStatus
+
+logger = logging.getLogger("TEST: " + __name__)
+
+def _graph(names: list, edges: dict) -> BuildGraph:
+    graph = BuildGraph()
+    for n in names:
+        graph.add_project(n, ProjectInformation(build_directory=n), depends_on=edges.get(n, []))
+    return graph
+
+class BuildGraphTestCase(unittest.TestCase):
+
+    def test_topological_order(self) -> None:
+        graph = _graph(["app", "lib", "core", "tool"], {"app": ["lib"], "lib": ["core"], "tool": ["core"]})
+        order = graph.topological_order()
+        self.assertLess(order.index("core"), order.index("lib"))
+        self.assertLess(order.index("lib"), order.index("app"))
+        self.assertLess(order.index("core"), order.index("tool"))
+
+    def test_cycle_detection(self) -> None:
+        graph = _graph(["a", "b"], {"a": ["b"], "b": ["a"]})
+        self.assertRaises(ValueError, graph.validate)
+        graph = _graph(["a"], {"a": ["missing"]})
+        self.assertRaises(ValueError, graph.validate)
+
+    def test_failure_skips_dependents(self) -> None:
+        graph = _graph(["core", "lib", "app", "other"], {"lib": ["core"], "app": ["lib"]})
+        built = []
+
+        def runner(project, commands) -> bool:
+            built.append(project.build_directory)
+            return project.build_directory != "core"
+
+        results = BuildOrchestrator(graph, max_concurrency=2, runner=runner).run()
+        self.assertEqual(results["core"].status, BuildStatus.FAILED)
+        self.assertEqual(results["lib"].status, BuildStatus.SKIPPED)
+        self.assertEqual(results["app"].status, BuildStatus.SKIPPED)
+        self.assertEqual(results["other"].status, BuildStatus.SUCCEEDED)
+        self.assertEqual(sorted(built), ["core", "other"])
+
+    def test_concurrency_cap(self) -> None:
+        graph = _graph([str(i) for i in range(6)], {})
+        lock = threading.Lock()
+        active = [0, 0] #current, peak
+        full = threading.Event()
+        waited = []
+
+        def runner(project, commands) -> bool:
+            with lock:
+                active[0] += 1
+                active[1] = max(active[1], active[0])
+                if active[0] == 3:
+                    full.set()
+            waited.append(full.wait(10.0)) #the first builds only finish once three run together
+            with lock:
+                active[0] -= 1
+            return True
+
+        results = BuildOrchestrator(graph, max_concurrency=3, runner=runner).run()
+        self.assertTrue(all(r.status == BuildStatus.SUCCEEDED for r in results.values()))
+        self.assertTrue(all(waited))
+        self.assertEqual(active[1], 3)
@@ -0,0 +1,49 @@
+import unittest, logging, os, sys, tempfile
+
+from data import ProjectInformation
+from buildhistory import BuildHistory, report
+from execution import CommandResult, ExecutionResult
+import execution
+
+logger = logging.getLogger("TEST: " + __name__)
+
+def _result(configure: float, build: float, success: bool=True) -> ExecutionResult:
+    return ExecutionResult(success=success, commands=[
+        CommandResult(command=["cmake"], returncode=0, duration=configure, phase="configure", cpu_time=configure),
+        CommandResult(command=["make"], returncode=(0 if success else 2), duration=build, phase="build")])
+
+class BuildHistoryTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.history = BuildHistory(os.path.join(self.tempdir.name, "history.db"))
+        self.project = ProjectInformation(project_directory=self.tempdir.name)
+
+    def tearDown(self) -> None:
+        self.tempdir.cleanup()
+
+    def test_record_and_query(self) -> None:
+        self.assertEqual(self.history.runs(), [])
+        for i, build in enumerate([10.0, 11.0, 10.5]):
+            self.history.record(self.project, _result(1.0, build), started=1000.0 + i)
+        runs = self.history.runs(project=self.tempdir.name)
+        self.assertEqual(len(runs), 3)
+        self.assertEqual(runs[0].phase("build").wall, 10.5)
+        self.assertEqual(runs[0].phase("configure").cpu, 1.0)
+        self.assertEqual([w for _, w in self.history.trend(self.tempdir.name, "build")], [10.0, 11.0, 10.5])
+
+    def test_regressions(self) -> None:
+        for i, build in enumerate([10.0, 10.2, 9.8, 14.0]):
+            self.history.record(self.project, _result(1.0, build), started=1000.0 + i)
+        self.history.record(self.project, _result(1.0, 30.0, success=False), started=2000.0)
+        regressions = self.history.regressions(threshold=0.2)
+        self.assertEqual([r.phase for r in regressions], ["build"])
+        self.assertAlmostEqual(regressions[0].baseline, 10.0)
+        self.assertIn("Regressions:", report(self.history))
+
+    def test_process_measurements(self) -> None:
+        result = execution.run_command([sys.executable, "-c", "sum(range(10**6))"])
+        self.assertTrue(result.success)
+        if hasattr(os, "wait4"):
+            self.assertGreater(result.cpu_time, 0.0)
+            self.assertGreater(result.peak_rss, 2**20)
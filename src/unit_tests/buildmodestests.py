@@ -0,0 +1,97 @@
+import logging, glob, os, re
+
+from benchmarks.synthetic import SyntheticSpec, generate
+from buildmodes import CACHE_ENTRIES, HEADERS_VARIABLE, ModeComparison, compare_modes, describe, project_include_path, write_project_include
+from data import ProjectInformation
+from unit_tests import testdata
+
+logger = logging.getLogger("TEST: " + __name__)
+
+class BuildModesTestCase(testdata.TemporaryDirectoryTestCase):
+
+    def test_settings(self) -> None:
+        project = ProjectInformation()
+        project.build_directory = self.tempdir.name
+        command = project.cmake()
+        #unity settings made by hand, in a preset or by the project are left alone
+        self.assertFalse(any("UNITY" in arg or HEADERS_VARIABLE in arg or "PROJECT_INCLUDE" in arg for arg in command))
+        command = project.cmake(owned=CACHE_ENTRIES) #unless an earlier configure of ours set them
+        for name in CACHE_ENTRIES:
+            self.assertIn(f"-U{name}", command)
+        self.assertEqual(describe(project), "plain")
+
+        project.unity_build = True
+        project.unity_batch_size = 16
+        project.precompiled_headers = ["<vector>", "include/pch.h"]
+        copy = ProjectInformation()
+        copy.fromjson(project.tojson())
+        self.assertEqual((copy.unity_build, copy.unity_batch_size, copy.precompiled_headers),
+            (True, 16, ["<vector>", "include/pch.h"]))
+        command = project.cmake(owned=CACHE_ENTRIES)
+        self.assertFalse(any(arg.startswith("-U") and "UNITY" in arg for arg in command))
+        self.assertIn("-DCMAKE_UNITY_BUILD=ON", command)
+        self.assertIn("-DCMAKE_UNITY_BUILD_BATCH_SIZE=16", command)
+        self.assertIn("-DCMAKE_PROJECT_INCLUDE=" + project_include_path(self.tempdir.name), command)
+        self.assertIn(f"-D{HEADERS_VARIABLE}=<vector>;include/pch.h", command)
+        self.assertEqual(describe(project), "unity (batch 16) + pch <vector>, include/pch.h")
+
+        path = write_project_include(self.tempdir.name)
+        modified = os.stat(path).st_mtime_ns
+        self.assertEqual(write_project_include(self.tempdir.name), path)
+        self.assertEqual(os.stat(path).st_mtime_ns, modified) #unchanged, so it is not rewritten
+
+    def test_comparison(self) -> None:
+        comparison = ModeComparison(baseline="plain", variant="unity",
+            baseline_runs=[{"configure": 1.0, "build": 9.0}, {"configure": 1.0, "build": 11.0}, {"configure": 1.0, "build": 30.0}],
+            variant_runs=[{"configure": 1.0, "build": 4.0}, {"configure": 2.0, "build": 4.0}, {"configure": 1.0, "build": 6.0}])
+        self.assertEqual(comparison.median(False, "build"), 11.0)
+        self.assertEqual(comparison.difference("build"), 7.0)
+        self.assertEqual(comparison.difference("total"), 6.0) #medians of the totals, not sums of medians
+        self.assertEqual(comparison.speedup(), 2.0)
+        self.assertEqual(comparison.todict()["difference"], {"configure": 0.0, "build": 7.0, "total": 6.0})
+        self.assertIn("unity is 2.00x as fast as plain", comparison.summary())
+
+    @testdata.requires_toolchain(fake_toolchain=False)
+    def test_modes_turned_off(self) -> None:
+        project = generate(self.tempdir.name, SyntheticSpec(targets=2, sources=3, fake_toolchain=False))
+        #relative to the working directory, as a project's own build directory may be
+        project.build_directory = os.path.relpath(project.build_directory)
+        project.unity_build = True
+        project.precompiled_headers = ["<vector>"]
+        self.assertTrue(project.execute(consumers=[]))
+        self.assertGreater(len(glob.glob(os.path.join(project.build_directory, "**", "cmake_pch.hxx"), recursive=True)), 0)
+
+        project.unity_build = False
+        project.precompiled_headers = []
+        self.assertTrue(project.execute(consumers=[])) #reconfigured over the same cache
+        with open(os.path.join(project.build_directory, "CMakeCache.txt")) as f:
+            cache = f.read()
+        self.assertIsNone(re.search(r"^CMAKE_UNITY_BUILD:", cache, re.MULTILINE))
+        self.assertNotIn(HEADERS_VARIABLE, cache)
+        self.assertNotIn("CMAKE_PROJECT_INCLUDE", cache)
+        for path in glob.glob(os.path.join(project.build_directory, "**", "*.make"), recursive=True):
+            with open(path) as f:
+                rules = f.read()
+            self.assertNotIn("cmake_pch", rules, path)
+            self.assertNotIn("unity_", rules, path)
+
+    @testdata.requires_toolchain(fake_toolchain=False)
+    def test_compare_modes(self) -> None:
+        project = generate(self.tempdir.name, SyntheticSpec(targets=2, sources=3, fake_toolchain=False))
+        with self.assertRaises(ValueError):
+            compare_modes(project)
+        variant = ProjectInformation()
+        variant.fromjson(project.tojson())
+        variant.unity_build = True
+        variant.precompiled_headers = ["<vector>"]
+        comparison = compare_modes(project, variant)
+        self.assertEqual(comparison.error, "")
+        self.assertEqual((len(comparison.baseline_runs), len(comparison.variant_runs)), (1, 1))
+        self.assertEqual(set(comparison.variant_runs[0]), {"configure", "build"})
+        built = os.path.join(project.build_directory, "ab-variant")
+        self.assertTrue(os.path.isfile(os.path.join(built, "app", "app")))
+        self.assertGreater(len(glob.glob(os.path.join(built, "**", "unity_*_cxx.cxx"), recursive=True)), 0)
+        self.assertGreater(len(glob.glob(os.path.join(built, "**", "cmake_pch.hxx"), recursive=True)), 0)
+        self.assertEqual(glob.glob(os.path.join(project.build_directory, "ab-baseline", "**", "cmake_pch.hxx"),
+            recursive=True), [])
+        self.assertFalse(os.path.exists(os.path.join(project.build_directory, "CMakeCache.txt")))
@@ -0,0 +1,60 @@
+import unittest, logging, os, tempfile
+from unittest import mock
+
+import cleaner
+
+logger = logging.getLogger("TEST: " + __name__)
+
+def _touch(path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "w").close()
+
+class CleanerTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tempdir.name, "src")
+        self.build = os.path.join(self.tempdir.name, "build")
+
+    def tearDown(self) -> None:
+        self.tempdir.cleanup()
+
+    def test_discard_directory(self) -> None:
+        _touch(os.path.join(self.build, "deep", "tree", "file.o"))
+        self.assertTrue(cleaner.discard_directory(self.build))
+        self.assertFalse(os.path.exists(self.build))
+        os.makedirs(self.build) #the path is usable right away
+        self.assertTrue(cleaner.wait_for_discards(timeout=10))
+        self.assertEqual(os.listdir(self.tempdir.name), ["build"])
+
+    def test_discard_unmovable_directory(self) -> None:
+        _touch(os.path.join(self.build, "deep", "tree", "file.o"))
+        _touch(os.path.join(self.build, "CMakeCache.txt"))
+        with mock.patch("os.rename", side_effect=OSError(16, "Device or resource busy")):
+            self.assertTrue(cleaner.discard_directory(self.build))
+        self.assertEqual(os.listdir(self.build), []) #emptied, but still there
+
+    def test_prune_orphans(self) -> None:
+        _touch(os.path.join(self.source, "main.cpp"))
+        _touch(os.path.join(self.source, "lib", "kept.cpp"))
+        #generated into the build tree by moc/autogen and configure_file
+        _touch(os.path.join(self.build, "lib", "lib_autogen", "mocs_compilation.cpp"))
+        _touch(os.path.join(self.build, "version.cpp"))
+        kept = [os.path.join(self.build, "CMakeFiles", "app.dir", "main.cpp.o"),
+            os.path.join(self.build, "lib", "CMakeFiles", "lib.dir", "kept.cpp.o"),
+            os.path.join(self.build, "CMakeFiles", "app.dir", "__", "outside.cpp.o"),
+            os.path.join(self.build, "lib", "CMakeFiles", "lib.dir", "lib_autogen", "mocs_compilation.cpp.o"),
+            os.path.join(self.build, "CMakeFiles", "app.dir", "version.cpp.o"),
+            #binary directories that mirror no source directory: FetchContent, add_subdirectory(lib other)
+            os.path.join(self.build, "_deps", "foo-build", "CMakeFiles", "foo.dir", "src", "foo.cpp.o"),
+            os.path.join(self.build, "other", "CMakeFiles", "lib.dir", "kept.cpp.o")]
+        orphans = [os.path.join(self.build, "CMakeFiles", "app.dir", "gone.cpp.o"),
+            os.path.join(self.build, "lib", "CMakeFiles", "lib.dir", "sub", "gone.c.obj")]
+        for path in kept + orphans:
+            _touch(path)
+        _touch(orphans[0] + ".d")
+
+        self.assertEqual(cleaner.prune_orphans(self.build, self.source), 2)
+        self.assertTrue(all(os.path.exists(p) for p in kept))
+        self.assertFalse(any(os.path.exists(p) for p in orphans))
+        self.assertFalse(os.path.exists(orphans[0] + ".d"))
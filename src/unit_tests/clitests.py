@@ -0,0 +1,76 @@
+import unittest, logging, contextlib, io, json, os, shutil, subprocess, sys, tempfile, time
+
+from data import ProjectInformation, SupportedCmakeGenerators
+import cli
+
+logger = logging.getLogger("TEST: " + __name__)
+
+class CliTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.directory = self.tempdir.name
+        with open(os.path.join(self.directory, "CMakeLists.txt"), "w") as f:
+            f.write("cmake_minimum_required(VERSION 3.14)\nproject(hello C)\nadd_executable(hello main.c)\n")
+        with open(os.path.join(self.directory, "main.c"), "w") as f:
+            f.write("int main(void) { return 0; }\n")
+        project = ProjectInformation(project_directory=self.directory, source_directory=".",
+            build_directory=os.path.join(self.directory, "build"), generator_type=SupportedCmakeGenerators.UNIX_MAKEFILE,
+            c_compiler="gcc", cpp_compiler="g++")
+        self.settings = os.path.join(self.directory, "settings.json")
+        with open(self.settings, "w") as f:
+            f.write(project.tojson())
+
+    def tearDown(self) -> None:
+        self.tempdir.cleanup()
+
+    def _run(self, *arguments: str) -> tuple:
+        output, errors = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(errors):
+            code = cli.main(["--project", self.directory, "--settings", self.settings, "--json"] + list(arguments))
+        return code, json.loads(output.getvalue())
+
+    def test_status(self) -> None:
+        code, report = self._run("status")
+        self.assertEqual(code, 0)
+        self.assertEqual(report["command"], "status")
+        self.assertFalse(report["configured"])
+        self.assertEqual(report["settings"]["projectdir"], self.directory)
+
+    @unittest.skipUnless(all(shutil.which(t) is not None for t in ("cmake", "make", "gcc", "g++")),
+        "needs cmake, make and gcc")
+    def test_build(self) -> None:
+        code, report = self._run("build", "--no-history")
+        self.assertEqual(code, 0, report)
+        self.assertEqual([p["phase"] for p in report["phases"]], ["configure", "build"])
+        self.assertEqual(report["diagnostics"]["error"], 0)
+        code, report = self._run("build", "--no-history", "--target", "hello")
+        self.assertEqual(code, 0)
+        self.assertTrue(report["phases"][0]["skipped"])
+        self.assertEqual(report["phases"][1]["command"][-1], "hello")
+        code, report = self._run("status")
+        self.assertEqual(report["configure_reason"], "")
+        self.assertEqual(report["targets"], ["hello"])
+
+    def test_failure_exit_code(self) -> None:
+        with open(os.path.join(self.directory, "main.c"), "w") as f:
+            f.write("int main(void) { return undeclared; }\n")
+        if shutil.which("cmake") is None or shutil.which("gcc") is None:
+            self.skipTest("needs cmake and gcc")
+        code, report = self._run("build", "--no-history")
+        self.assertEqual(code, cli.EXIT_FAILURE)
+        self.assertFalse(report["success"])
+        self.assertGreater(report["diagnostics"]["error"], 0)
+
+    def test_agent_needs_a_token(self) -> None:
+        code, report = self._run("agent", "--listen", "127.0.0.1:0", "--token", "")
+        self.assertEqual(code, cli.EXIT_FAILURE)
+        self.assertIn("token", report["error"])
+
+    def test_startup_does_not_import_qt(self) -> None:
+        script = ("import sys, cli; sys.exit(any(m.startswith(('PyQt5', 'globaldata', 'asyncio', 'execution', 'configcache', "
+            "'toolchain', 'compilercache', 'linker', 'subprocess')) for m in sys.modules))")
+        start = time.monotonic()
+        completed = subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(os.path.abspath(cli.__file__)))
+        logger.debug(f"cli import: {time.monotonic() - start:.3f}s")
+        self.assertEqual(completed.returncode, 0)
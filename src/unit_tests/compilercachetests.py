@@ -0,0 +1,48 @@
+import unittest, logging, os, stat, tempfile
+
+import compilercache
+from data import ProjectInformation
+
+logger = logging.getLogger("TEST: " + __name__)
+
+_CCACHE_STATS = "stats_updated_timestamp\t1700000000\ndirect_cache_hit\t7\npreprocessed_cache_hit\t3\ncache_miss\t5\n"
+_SCCACHE_STATS = '{"stats": {"cache_hits": {"counts": {"C/C++": 9}}, "cache_misses": {"counts": {"C/C++": 1, "Rust": 2}}}}'
+
+@unittest.skipIf(os.name != "posix", "uses a shell script as a fake ccache")
+class CompilerCacheTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.ccache = os.path.join(self.tempdir.name, "ccache")
+        with open(self.ccache, "w") as f:
+            f.write("#!/bin/sh\nprintf '" + _CCACHE_STATS.replace("\t", "\\t").replace("\n", "\\n") + "'\n")
+        os.chmod(self.ccache, os.stat(self.ccache).st_mode | stat.S_IEXEC)
+        self.path = os.environ.get("PATH", "")
+        os.environ["PATH"] = self.tempdir.name + os.pathsep + self.path
+
+    def tearDown(self) -> None:
+        os.environ["PATH"] = self.path
+        self.tempdir.cleanup()
+
+    def test_find_launcher(self) -> None:
+        self.assertEqual(compilercache.find_launcher("auto"), self.ccache)
+        self.assertEqual(compilercache.find_launcher("ccache"), self.ccache)
+        self.assertIsNone(compilercache.find_launcher("none"))
+        self.assertIsNone(compilercache.find_launcher(""))
+        self.assertIsNone(compilercache.find_launcher("no-such-launcher"))
+
+    def test_cmake_arguments(self) -> None:
+        info = ProjectInformation(compiler_launcher="auto")
+        self.assertIn("-DCMAKE_CXX_COMPILER_LAUNCHER=" + self.ccache, info.cmake())
+        self.assertIn("-DCMAKE_C_COMPILER_LAUNCHER=" + self.ccache, info.cmake())
+        info.compiler_launcher = ""
+        self.assertFalse(any("COMPILER_LAUNCHER" in arg for arg in info.cmake()))
+
+    def test_statistics(self) -> None:
+        before = compilercache.read_stats(self.ccache)
+        self.assertEqual((before.hits, before.misses), (10, 5))
+        delta = compilercache.CacheStats(self.ccache, hits=25, misses=6) - before
+        self.assertEqual((delta.hits, delta.misses), (15, 1))
+        self.assertAlmostEqual(delta.hit_rate, 15 / 16)
+        sccache = compilercache._parse_sccache("sccache", _SCCACHE_STATS)
+        self.assertEqual((sccache.hits, sccache.misses), (9, 3))
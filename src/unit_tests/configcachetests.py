@@ -0,0 +1,73 @@
+import unittest, logging, os, tempfile
+
+from configcache import ConfigureCache
+
+logger = logging.getLogger("TEST: " + __name__)
+
+def _write(path: str, text: str="") -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+class ConfigureCacheTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tempdir.name, "src")
+        self.build = os.path.join(self.tempdir.name, "build")
+        _write(os.path.join(self.source, "CMakeLists.txt"), "project(test)")
+        _write(os.path.join(self.source, "cmake", "deps.cmake"), "")
+        _write(os.path.join(self.build, "CMakeCache.txt"), "")
+        self.command = ["cmake", "-G", "Unix Makefiles", self.source]
+
+    def tearDown(self) -> None:
+        self.tempdir.cleanup()
+
+    def test_skip_when_unchanged(self) -> None:
+        cache = ConfigureCache(self.build, self.source)
+        state = cache.state(self.command)
+        self.assertIn("no record", cache.reason(state))
+        cache.store(state)
+        self.assertEqual(cache.reason(cache.state(self.command)), "")
+
+    def test_reasons(self) -> None:
+        cache = ConfigureCache(self.build, self.source)
+        cache.store(cache.state(self.command))
+
+        self.assertIn("command line", cache.reason(cache.state(self.command + ["-DFOO=1"])))
+
+        _write(os.path.join(self.source, "sub", "CMakeLists.txt"), "add_library(x x.cpp)")
+        reason = cache.reason(cache.state(self.command))
+        self.assertIn("CMake input files changed", reason)
+        self.assertIn(os.path.join("sub", "CMakeLists.txt"), reason)
+
+        #ordinary source files are not configure inputs
+        cache.store(cache.state(self.command))
+        _write(os.path.join(self.source, "main.cpp"), "int main() {}")
+        self.assertEqual(cache.reason(cache.state(self.command)), "")
+
+    def test_owned_entries(self) -> None:
+        cache = ConfigureCache(self.build, self.source)
+        self.assertEqual(cache.owned_entries(), set())
+        cache.record_entries(["CMAKE_UNITY_BUILD"])
+        self.assertEqual(ConfigureCache(self.build, self.source).owned_entries(), {"CMAKE_UNITY_BUILD"})
+        #taking out entries follows the record, so it does not make a configure out of date
+        cache.store(cache.state(self.command + ["-UCMAKE_UNITY_BUILD"]))
+        self.assertEqual(cache.reason(cache.state(self.command)), "")
+
+    def test_invalidate(self) -> None:
+        cache = ConfigureCache(self.build, self.source)
+        cache.store(cache.state(self.command))
+        cache.invalidate()
+        self.assertNotEqual(cache.reason(cache.state(self.command)), "")
+        os.remove(os.path.join(self.build, "CMakeCache.txt"))
+        cache.store(cache.state(self.command))
+        self.assertIn("CMakeCache.txt", cache.reason(cache.state(self.command)))
+
+    @unittest.skipUnless(hasattr(os, "symlink") and os.name == "posix", "needs symlinks")
+    def test_dangling_symlink(self) -> None:
+        os.symlink(os.path.join(self.source, "missing.cmake"), os.path.join(self.source, "cmake", "broken.cmake"))
+        cache = ConfigureCache(self.build, self.source)
+        state = cache.state(self.command)
+        cache.store(state)
+        self.assertEqual(cache.reason(cache.state(self.command)), "")
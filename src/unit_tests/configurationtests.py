@@ -0,0 +1,98 @@
+import unittest, logging, multiprocessing, os, tempfile
+
+from data import Configuration, ProjectInformation
+
+logger = logging.getLogger("TEST: " + __name__)
+
+def _save_jobs(filename: str, jobs: int) -> None:
+    config = Configuration(filename)
+    config.set("SYSTEMCONFIG", "jobs", jobs)
+    config.set("SECTION" + str(jobs), "value", str(jobs))
+    config.save()
+
+class ConfigurationTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tempdir.name, "home", "cppbuilder.conf")
+
+    def tearDown(self) -> None:
+        self.tempdir.cleanup()
+
+    def test_lazy_and_dirty_tracking(self) -> None:
+        config = Configuration(self.filename)
+        self.assertFalse(config.dirty)
+        self.assertFalse(config.save()) #never even read
+        self.assertFalse(os.path.exists(self.filename))
+
+        self.assertEqual(config.get("SYSTEMCONFIG", "jobs"), 0)
+        self.assertTrue(config.dirty) #there is no file yet, so the defaults are unsaved
+        self.assertTrue(config.save())
+        self.assertFalse(config.dirty)
+        mtime = os.stat(self.filename).st_mtime_ns
+        self.assertFalse(config.save())
+        self.assertEqual(os.stat(self.filename).st_mtime_ns, mtime)
+
+        config["SYSTEMCONFIG"]["cmakecmd"] = "cmake3"
+        self.assertTrue(config.dirty)
+        self.assertTrue(config.save())
+        self.assertEqual(Configuration(self.filename).get("SYSTEMCONFIG", "cmakecmd"), "cmake3")
+        self.assertEqual([n for n in os.listdir(os.path.dirname(self.filename)) if n.endswith(".tmp")], [])
+
+    def test_typed_values(self) -> None:
+        config = Configuration(self.filename)
+        config.set("SYSTEMCONFIG", "libfolders", ["/opt/lib", "C:\\libs"])
+        config.set("SYSTEMCONFIG", "jobs", "4")
+        config.set("DEFAULT", "logfile", False)
+        with self.assertRaises(ValueError):
+            config.set("SYSTEMCONFIG", "jobs", "many")
+        config.set("DEFAULT", "loglevels", '["execution=debug"]')
+        with self.assertRaises(ValueError): #not split into characters
+            config.set("DEFAULT", "loglevels", "execution=debug")
+        config.save()
+
+        loaded = Configuration(self.filename)
+        self.assertEqual(loaded.get("SYSTEMCONFIG", "libfolders"), ["/opt/lib", "C:\\libs"])
+        self.assertEqual(loaded.get("SYSTEMCONFIG", "jobs"), 4)
+        self.assertIs(loaded.get("DEFAULT", "logfile"), False)
+        self.assertEqual(loaded.get("DEFAULT", "loglevels"), ["execution=debug"])
+
+        project = ProjectInformation()
+        project.applyconfig(loaded)
+        self.assertEqual(project.cmake_library_path, ["/opt/lib", "C:\\libs"])
+        self.assertEqual(project.cmake_include_path, [])
+        self.assertEqual(project.build_jobs, 4)
+
+    def test_reads_older_files(self) -> None:
+        os.makedirs(os.path.dirname(self.filename))
+        with open(self.filename, "w") as f:
+            f.write("[DEFAULT]\nloglevel = info\n\n[SYSTEMCONFIG]\nlibfolders = ['/usr/lib', '/opt/lib']\n"
+                "includefolders = []\njobs = lots\n")
+        config = Configuration(self.filename)
+        self.assertEqual(config.get("SYSTEMCONFIG", "libfolders"), ["/usr/lib", "/opt/lib"])
+        self.assertEqual(config.get("SYSTEMCONFIG", "jobs"), 0) #not a number: the default
+        self.assertEqual(config.get("DEFAULT", "loglevel"), "info")
+
+    def test_concurrent_saves_merge(self) -> None:
+        first, second = Configuration(self.filename), Configuration(self.filename)
+        first.set("SYSTEMCONFIG", "cmakecmd", "cmake3")
+        second.set("SYSTEMCONFIG", "jobs", 6)
+        first.save()
+        second.save()
+        self.assertEqual(second.get("SYSTEMCONFIG", "cmakecmd"), "cmake3") #picked up when saving
+        merged = Configuration(self.filename)
+        self.assertEqual(merged.get("SYSTEMCONFIG", "cmakecmd"), "cmake3")
+        self.assertEqual(merged.get("SYSTEMCONFIG", "jobs"), 6)
+
+    def test_concurrent_processes(self) -> None:
+        context = multiprocessing.get_context("spawn" if os.name == "nt" else "fork")
+        processes = [context.Process(target=_save_jobs, args=(self.filename, i)) for i in range(1, 9)]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join(30)
+            self.assertEqual(p.exitcode, 0)
+        config = Configuration(self.filename)
+        for i in range(1, 9):
+            self.assertEqual(config["SECTION" + str(i)]["value"], str(i))
+        self.assertIn(config.get("SYSTEMCONFIG", "jobs"), range(1, 9))
@@ -1,5 +1,7 @@
-import unittest, logging, sys
+import unittest, logging, sys, tempfile
+from unittest import mock
 
+from benchmarks.synthetic import SyntheticSpec, generate
 from data import OsType, SupportedCmakeGenerators, ProjectCommands, ProjectInformation
 import data
 from unit_tests import testdata
@@ -18,18 +20,15 @@ class ProjectInformationTestCase(unittest.TestCase):
         logger.debug(info.cmake())
         logger.debug(info.make())
     
-    @unittest.skip("Skipping test_command_execution")
+    @testdata.requires_toolchain()
     def test_command_execution(self) -> None:
-        try:
-            info = testdata.actual_project_information()
+        with tempfile.TemporaryDirectory() as directory:
+            info = generate(directory, SyntheticSpec(targets=2, sources=2))
             self.assertEqual(info.execute(commands=(ProjectCommands.CLEAN | ProjectCommands.CMAKE | ProjectCommands.MAKE)), True)
             self.assertEqual(info.execute(commands=(ProjectCommands.CMAKE | ProjectCommands.MAKE)), True)
             self.assertEqual(info.execute(commands=(ProjectCommands.CMAKE)), True)
             self.assertEqual(info.execute(commands=(ProjectCommands.MAKE)), True)
             self.assertEqual(info.execute(commands=(ProjectCommands.CLEAN)), True)
-        except Exception as e:
-            logger.error(repr(e))
-            self.assertTrue(False)
     
     @unittest.skip("Skipping test_ostype_enum")
     def test_ostype_enum(self) -> None:
@@ -51,4 +50,36 @@ class ProjectInformationTestCase(unittest.TestCase):
         newinfo = ProjectInformation()
         newinfo.fromjson(data)
 
-        self.assertEqual(testinformation, newinfo)
\ No newline at end of file
+        self.assertEqual(testinformation, newinfo)
+
+        copy = testinformation.copy()
+        self.assertEqual(testinformation, copy)
+        copy.build_targets.append("another")
+        self.assertNotEqual(testinformation, copy)
+
+    def test_make_job_count(self) -> None:
+        info = ProjectInformation(generator_type=SupportedCmakeGenerators.UNIX_MAKEFILE, build_jobs=8)
+        self.assertEqual(info.make(), ["make", "-j8"])
+
+        info.build_jobs = 0
+        self.assertEqual(info.make(), ["make", "-j" + str(data.available_cpus())])
+
+        info.make_arguments = ["-j2"]
+        self.assertEqual(info.make(), ["make", "-j2"])
+
+        info = ProjectInformation(generator_type=SupportedCmakeGenerators.NMAKE_MAKEFILE, build_jobs=8)
+        self.assertEqual(info.make(), ["nmake"])
+
+    def test_ninja_generators(self) -> None:
+        for generator in (SupportedCmakeGenerators.NINJA, SupportedCmakeGenerators.NINJA_MULTI_CONFIG):
+            info = ProjectInformation(generator_type=generator, build_jobs=4, build_targets=["all"])
+            self.assertEqual(info.make(), ["ninja", "-j4", "all"])
+            self.assertIn(generator.generator_name, info.cmake())
+        self.assertGreaterEqual(data.available_cpus(), 1)
+
+    def test_malformed_cgroup_quota(self) -> None:
+        for text in ["garbage 100000", "100000 0", "max 100000"]:
+            with mock.patch("builtins.open", mock.mock_open(read_data=text)):
+                self.assertIsNone(data._cgroup_cpu_limit())
+        with mock.patch("builtins.open", mock.mock_open(read_data="150000 100000")):
+            self.assertEqual(data._cgroup_cpu_limit(), 2)
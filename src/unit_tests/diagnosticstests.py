@@ -0,0 +1,58 @@
+import unittest, logging, json, time
+
+from diagnostics import DiagnosticIndex, Severity
+
+logger = logging.getLogger("TEST: " + __name__)
+
+_OUTPUT = """[ 10%] Building CXX object src/CMakeFiles/core.dir/util/strings.cpp.o
+/home/me/project/src/util/strings.cpp:12:5: error: 'foo' was not declared in this scope
+/home/me/project/src/util/strings.h:3:1: warning: unused variable 'x' [-Wunused-variable]
+[ 20%] Building CXX object app/CMakeFiles/app.dir/main.cpp.o
+/home/me/project/app/main.cpp:7: note: candidate is here
+C:\\project\\src\\widget.cpp(44,9): error C2065: 'bar': undeclared identifier
+LINK : fatal error LNK1181: cannot open input file 'core.lib'
+collect2: error: ld returned 1 exit status
+CMake Error at src/CMakeLists.txt:15 (add_library):
+  Cannot find source file:
+
+    missing.cpp
+
+-- Configuring incomplete, errors occurred!
+make[2]: *** [src/CMakeFiles/core.dir/build.make:76: strings.cpp.o] Error 1
+"""
+
+class DiagnosticIndexTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.index = DiagnosticIndex()
+        self.index.consume(_OUTPUT.splitlines())
+
+    def test_formats(self) -> None:
+        d = self.index.diagnostics()
+        self.assertEqual([x.tool for x in d], ["gcc", "gcc", "gcc", "msvc", "msvc", "gcc", "cmake"])
+        self.assertEqual((d[0].line, d[0].column, d[0].severity), (12, 5, Severity.ERROR))
+        self.assertEqual((d[3].file, d[3].line, d[3].column, d[3].code), ("C:\\project\\src\\widget.cpp", 44, 9, "C2065"))
+        self.assertEqual((d[4].file, d[4].code, d[4].severity), ("LINK", "LNK1181", Severity.ERROR))
+        self.assertEqual((d[6].file, d[6].line), ("src/CMakeLists.txt", 15))
+        self.assertEqual(d[6].message, "Cannot find source file: missing.cpp")
+
+    def test_queries(self) -> None:
+        self.assertEqual(self.index.counts(), {"error": 5, "warning": 1, "note": 1})
+        self.assertEqual(self.index.first().line, 12)
+        self.assertEqual(self.index.diagnostics(target="core", severity=Severity.ERROR)[0].line, 12)
+        #the header is not compiled directly, so it is put on the target being built
+        self.assertEqual(self.index.diagnostics(file="/home/me/project/src/util/strings.h")[0].target, "core")
+        self.assertEqual(self.index.diagnostics(file="/home/me/project/app/main.cpp")[0].target, "app")
+        exported = json.loads(self.index.tojson())
+        self.assertEqual(exported["counts"]["error"], 5)
+        self.assertEqual(exported["diagnostics"][0]["severity"], "error")
+
+    def test_throughput(self) -> None:
+        lines = [f"[{i}/200000] Building CXX object src/CMakeFiles/t{i % 50}.dir/f{i}.cpp.o" for i in range(100000)]
+        lines += ["/usr/bin/c++ -O2 -c foo.cpp -o foo.o"] * 100000
+        index = DiagnosticIndex()
+        start = time.monotonic()
+        index.consume(lines)
+        logger.debug(f"parsed {len(lines)} lines in {time.monotonic() - start:.3f}s")
+        self.assertEqual(index.counts()["error"], 0)
+        self.assertEqual(index.lines_seen, 200000)
@@ -0,0 +1,159 @@
+import logging, os, socket, threading, time
+
+from agent import BuildAgent, ProtocolError, default_builder, receive_message, send_message
+from benchmarks.synthetic import SyntheticSpec, generate
+from buildgraph import BuildGraph, BuildOrchestrator, BuildStatus
+from data import ProjectInformation
+from distributed import RESTART_MARKER, NoAgentError, RemoteExecutor, Scheduler
+from execution import CommandResult, ExecutionResult
+from outputpipe import TailConsumer
+from unit_tests import testdata
+
+logger = logging.getLogger("TEST: " + __name__)
+
+class _Builder:
+    '''
+    Stands in for ProjectInformation.execute on an agent; optionally hangs
+    until released or cancelled.
+    '''
+    def __init__(self, name: str, hang: bool=False):
+        self.name = name
+        self.hang = hang
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.jobs = []
+
+    def __call__(self, project, commands, targets, consumers, cancel) -> bool:
+        self.jobs.append(targets)
+        self.started.set()
+        for c in consumers:
+            c.consume([f"built by {self.name}"])
+        if self.hang:
+            while not (self.release.is_set() or cancel.is_set()):
+                time.sleep(0.01)
+        project.last_result = ExecutionResult(success=True,
+            commands=[CommandResult(command=["make"], returncode=0, duration=0.5, phase="build")])
+        return not cancel.is_set()
+
+class DistributedTestCase(testdata.TemporaryDirectoryTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.agents = []
+        self.project = ProjectInformation()
+        self.project.project_directory = self.tempdir.name
+        self.project.build_directory = os.path.join(self.tempdir.name, "build")
+
+    def tearDown(self) -> None:
+        for a in self.agents:
+            a.stop()
+
+    def _agent(self, builder, capacity: int=1, **kwargs) -> BuildAgent:
+        kwargs.setdefault("insecure", "token" not in kwargs)
+        agent = BuildAgent("127.0.0.1:0", capacity=capacity, builder=builder, heartbeat_interval=0.1, **kwargs).start()
+        self.agents.append(agent)
+        return agent
+
+    def test_messages(self) -> None:
+        left, right = socket.socketpair()
+        with left, right:
+            send_message(left, {"type": "output", "lines": ["é", "x" * 100000]})
+            self.assertEqual(receive_message(right), {"type": "output", "lines": ["é", "x" * 100000]})
+            left.sendall(b"\x00\x00\x00\x02[]")
+            with self.assertRaises(ProtocolError):
+                receive_message(right)
+            left.sendall(b"\xff\xff\xff\xff")
+            with self.assertRaises(ProtocolError):
+                receive_message(right)
+            left.close()
+            with self.assertRaises(ConnectionError):
+                receive_message(right)
+
+    def test_placement_by_free_slots(self) -> None:
+        small = self._agent(_Builder("small"), capacity=1)
+        large = self._agent(_Builder("large"), capacity=3)
+        scheduler = Scheduler([small.address, large.address, "127.0.0.1:1"])
+        scheduler.refresh()
+        self.assertEqual([a.alive for a in scheduler.agents], [True, True, False])
+        placed = [scheduler.acquire(timeout=0).address for _ in range(4)]
+        self.assertEqual(placed.count(large.address), 3)
+        self.assertEqual(placed.count(small.address), 1)
+        with self.assertRaises(NoAgentError):
+            scheduler.acquire(timeout=0.1)
+        scheduler.release(scheduler.agents[0])
+        self.assertEqual(scheduler.acquire(timeout=0).address, small.address)
+
+    def test_output_and_result(self) -> None:
+        builder = _Builder("one")
+        agent = self._agent(builder)
+        tail = TailConsumer(maxlines=10)
+        remote = RemoteExecutor(Scheduler([agent.address]))
+        self.assertTrue(remote.execute(self.project, consumers=[tail], targets=["app"]))
+        self.assertEqual(list(tail.lines), ["built by one"])
+        self.assertEqual(builder.jobs, [["app"]])
+        self.assertEqual([(c.phase, c.duration) for c in self.project.last_result.commands], [("build", 0.5)])
+
+        graph = BuildGraph()
+        graph.add_project("a", self.project)
+        results = BuildOrchestrator(graph, runner=remote.runner).run()
+        self.assertEqual(results["a"].status, BuildStatus.SUCCEEDED)
+
+    def test_retry_when_agent_is_lost(self) -> None:
+        hanging = _Builder("hanging", hang=True)
+        lost = self._agent(hanging, capacity=2)
+        spare = self._agent(_Builder("spare"), capacity=1)
+        scheduler = Scheduler([lost.address, spare.address]) #the agent with more slots is tried first
+        tail = TailConsumer(maxlines=10)
+        outcome = []
+        build = threading.Thread(target=lambda: outcome.append(RemoteExecutor(scheduler).execute(self.project,
+            consumers=[tail])))
+        build.start()
+        self.assertTrue(hanging.started.wait(10))
+        lost.stop()
+        self.agents.remove(lost)
+        build.join(10)
+        self.assertEqual(outcome, [True])
+        #the output of the lost attempt is not taken back, but marked as such
+        self.assertEqual(len(tail.lines), 3)
+        self.assertEqual((tail.lines[0], tail.lines[2]), ("built by hanging", "built by spare"))
+        self.assertTrue(tail.lines[1].startswith(RESTART_MARKER))
+        self.assertFalse(scheduler.agents[0].alive)
+        self.assertEqual(scheduler.agents[0].failures, 1)
+
+    def test_silent_agent_is_given_up(self) -> None:
+        silent = self._agent(_Builder("silent", hang=True), capacity=2)
+        silent.heartbeat_interval = 60
+        spare = self._agent(_Builder("spare"))
+        remote = RemoteExecutor(Scheduler([silent.address, spare.address]), heartbeat_timeout=0.5)
+        start = time.monotonic()
+        self.assertTrue(remote.execute(self.project, consumers=[]))
+        self.assertLess(time.monotonic() - start, 10)
+
+        remote = RemoteExecutor(Scheduler([silent.address]), retries=0, heartbeat_timeout=0.5)
+        self.assertFalse(remote.execute(self.project, consumers=[]))
+
+    def test_token(self) -> None:
+        with self.assertRaises(ValueError):
+            BuildAgent("127.0.0.1:0", builder=_Builder("open"))
+        agent = self._agent(_Builder("secret"), token="s3cret")
+        with self.assertRaisesRegex(NoAgentError, "not authorized"): #not just "no build agent is available"
+            Scheduler([agent.address], token="wrong").acquire()
+        self.assertFalse(RemoteExecutor(Scheduler([agent.address], token="wrong"), retries=0).execute(self.project,
+            consumers=[]))
+        self.assertTrue(RemoteExecutor(Scheduler([agent.address], token="s3cret")).execute(self.project, consumers=[]))
+
+    @testdata.requires_toolchain()
+    def test_build_with_artifacts(self) -> None:
+        first = self._agent(default_builder, workspace=os.path.join(self.tempdir.name, "first"))
+        second = self._agent(default_builder, capacity=2,
+            workspace=os.path.join(self.tempdir.name, "second"))
+        project = generate(os.path.join(self.tempdir.name, "project"), SyntheticSpec(targets=3, sources=2))
+        remote = RemoteExecutor(Scheduler([first.address, second.address]), artifacts=["app/app", "**/*.a"])
+        self.assertTrue(remote.execute(project, consumers=[]))
+        self.assertEqual([c.phase for c in project.last_result.commands], ["configure", "build"])
+        self.assertTrue(os.access(os.path.join(project.build_directory, "app", "app"), os.X_OK))
+        self.assertTrue(os.path.isfile(os.path.join(project.build_directory, "lib0", "liblib0.a")))
+        self.assertFalse(os.path.exists(os.path.join(project.build_directory, "CMakeCache.txt")))
+
+        self.assertEqual(remote.execute_targets(project, ["lib0", "lib1", "app"], consumers=[]),
+            {"lib0": True, "lib1": True, "app": True})
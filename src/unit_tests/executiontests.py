@@ -0,0 +1,79 @@
+import unittest, logging, asyncio, os, sys, tempfile, time
+
+from benchmarks.synthetic import SyntheticSpec, generate
+import execution
+from outputpipe import TailConsumer
+from unit_tests import testdata
+
+logger = logging.getLogger("TEST: " + __name__)
+
+class ExecutionTestCase(unittest.TestCase):
+
+    def test_run_command(self) -> None:
+        with tempfile.TemporaryDirectory() as cwd:
+            tail = TailConsumer()
+            result = execution.run_command([sys.executable, "-c", "import os; print(os.getcwd())"],
+                cwd=cwd, consumers=[tail], phase="test")
+            self.assertTrue(result.success)
+            self.assertEqual(os.path.realpath(tail.lines[-1]), os.path.realpath(cwd))
+            self.assertEqual(result.phase, "test")
+            self.assertEqual(result.line_count, 1)
+
+    def test_concurrent_async_commands(self) -> None:
+        original = os.getcwd()
+        script = "import os, time; time.sleep(0.5); print(os.getcwd(), os.environ['CPPBUILDER_TEST'])"
+
+        async def run_all(directories: list) -> list:
+            return await asyncio.gather(*[execution.run_command_async([sys.executable, "-c", script],
+                cwd=d, env={"CPPBUILDER_TEST": str(i)}, consumers=[TailConsumer()])
+                for i, d in enumerate(directories)])
+
+        with tempfile.TemporaryDirectory() as a, tempfile.TemporaryDirectory() as b, \
+            tempfile.TemporaryDirectory() as c:
+            start = time.monotonic()
+            results = asyncio.run(run_all([a, b, c]))
+            elapsed = time.monotonic() - start
+            for i, (d, r) in enumerate(zip([a, b, c], results)):
+                self.assertEqual(r.returncode, 0)
+                path, value = r.consumers[0].lines[-1].rsplit(" ", 1)
+                self.assertEqual(os.path.realpath(path), os.path.realpath(d))
+                self.assertEqual(value, str(i))
+            #each sleeps 0.5s: one after the other they would take at least 1.5s
+            self.assertTrue(all(r.duration >= 0.5 for r in results))
+            self.assertLess(elapsed, 1.4)
+        self.assertEqual(os.getcwd(), original)
+
+    @unittest.skipUnless(hasattr(os, "wait4"), "needs wait4")
+    def test_async_cpu_time_is_the_commands_own(self) -> None:
+        busy = "import time\nend = time.process_time() + 0.5\nwhile time.process_time() < end: pass"
+        others = []
+
+        async def run() -> execution.CommandResult:
+            task = asyncio.ensure_future(execution.run_command_async([sys.executable, "-c", "import time; time.sleep(1.5)"]))
+            await asyncio.sleep(0.1)
+            #a synchronous command reaped meanwhile must not be charged to the asynchronous one
+            await asyncio.get_running_loop().run_in_executor(None,
+                lambda: others.append(execution.run_command([sys.executable, "-c", busy])))
+            return await task
+
+        result = asyncio.run(run())
+        self.assertGreaterEqual(others[0].cpu_time, 0.5)
+        self.assertIsNotNone(result.cpu_time)
+        self.assertLess(result.cpu_time, 0.4)
+        self.assertIsNotNone(result.peak_rss)
+
+    def test_failure_exit_code(self) -> None:
+        result = asyncio.run(execution.run_command_async([sys.executable, "-c", "raise SystemExit(4)"]))
+        self.assertEqual(result.returncode, 4)
+        self.assertFalse(result.success)
+
+    @testdata.requires_toolchain()
+    def test_execute_async_skips_an_up_to_date_configure(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            project = generate(directory, SyntheticSpec(targets=2, sources=2))
+            first = asyncio.run(project.execute_async())
+            self.assertTrue(first.success)
+            self.assertFalse(first.commands[0].skipped)
+            second = asyncio.run(project.execute_async())
+            self.assertTrue(second.success)
+            self.assertEqual([(c.phase, c.skipped) for c in second.commands], [("configure", True), ("build", False)])
@@ -0,0 +1,67 @@
+import unittest, logging, os, subprocess, tempfile
+
+from data import ProjectInformation
+import fileapi
+from unit_tests import testdata
+
+logger = logging.getLogger("TEST: " + __name__)
+
+_FILES = {
+    "CMakeLists.txt": "cmake_minimum_required(VERSION 3.14)\nproject(fa CXX)\nadd_subdirectory(lib)\nadd_subdirectory(app)\n",
+    "lib/CMakeLists.txt": "add_library(core core.cpp)\ntarget_include_directories(core PUBLIC include)\n",
+    "lib/include/core.h": "int f();\n",
+    "lib/core.cpp": "#include \"core.h\"\nint f() { return 1; }\n",
+    "app/CMakeLists.txt": "add_executable(app main.cpp)\ntarget_link_libraries(app core)\nadd_executable(tool tool.cpp)\n",
+    "app/main.cpp": "#include \"core.h\"\nint main() { return f(); }\n",
+    "app/tool.cpp": "int main() { return 0; }\n",
+    "README.md": "\n"}
+
+@testdata.requires_toolchain(fake_toolchain=False)
+class FileApiTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.tempdir = tempfile.TemporaryDirectory()
+        cls.source = os.path.join(cls.tempdir.name, "src")
+        cls.build = os.path.join(cls.tempdir.name, "build")
+        for name, text in _FILES.items():
+            path = os.path.join(cls.source, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(text)
+        os.makedirs(cls.build)
+        fileapi.write_query(cls.build)
+        subprocess.run(["cmake", cls.source], cwd=cls.build, check=True, stdout=subprocess.DEVNULL)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.tempdir.cleanup()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.source, name)
+
+    def test_affected_targets(self) -> None:
+        model = fileapi.load(self.build)
+        self.assertEqual(sorted(t.name for t in model.targets.values()), ["app", "core", "tool"])
+        #app links core, so building app rebuilds core too
+        self.assertEqual(model.affected([self._path("lib/core.cpp")]), ["app"])
+        self.assertEqual(model.affected([self._path("app/main.cpp")]), ["app"])
+        self.assertEqual(model.affected([self._path("app/tool.cpp"), self._path("lib/core.cpp")]), ["app", "tool"])
+        self.assertEqual(model.affected([self._path("lib/include/core.h")]), ["app"])
+        self.assertIsNone(model.affected([self._path("README.md")]))
+        self.assertEqual(model.affected([]), [])
+
+    def test_cached_until_reconfigure(self) -> None:
+        model = fileapi.load(self.build)
+        self.assertIs(fileapi.load(self.build), model)
+        self.assertTrue(os.path.isfile(os.path.join(self.build, fileapi._CACHE_FILENAME)))
+        fileapi._loaded.clear()
+        self.assertEqual(fileapi.load(self.build).todict(), model.todict()) #read back from the build directory
+
+    def test_project_targets(self) -> None:
+        project = ProjectInformation(project_directory=self.tempdir.name, source_directory="src",
+            build_directory=self.build)
+        self.assertEqual(project.affected_targets([self._path("app/tool.cpp")]), ["tool"])
+        self.assertEqual(project.make(["tool"])[-1], "tool")
+        project.build_targets = ["all"]
+        self.assertIsNone(project.affected_targets([self._path("app/tool.cpp")]))
@@ -0,0 +1,132 @@
+import unittest, logging, glob, os, subprocess, sys
+
+from benchmarks.synthetic import SyntheticSpec, generate
+from buildmodes import project_include_path
+from data import ProjectInformation, toolchains
+from toolchain import ToolchainCache
+import linker
+from unit_tests import testdata
+
+logger = logging.getLogger("TEST: " + __name__)
+
+class LinkerTestCase(testdata.TemporaryDirectoryTestCase):
+
+    def test_cmake_definitions(self) -> None:
+        self.assertEqual(linker.cmake_definitions(None, "/usr/bin/g++", "3.29.0"), {})
+        self.assertEqual(linker.cmake_definitions("mold", "/usr/bin/g++", "3.29.2"), {"CMAKE_LINKER_TYPE": "MOLD"})
+        self.assertEqual(linker.cmake_definitions("lld", "/usr/bin/g++", "3.25.1"), {linker.LINKER_VARIABLE: "lld"})
+        self.assertEqual(linker.cmake_definitions("lld", "C:/msvc/bin/cl.exe", "3.25.1"), {})
+        self.assertTrue(linker.timing_supported("3.21.0", "Ninja"))
+        self.assertFalse(linker.timing_supported("3.20.5", "Unix Makefiles"))
+        self.assertFalse(linker.timing_supported("3.28.0", "NMake Makefiles"))
+
+    @unittest.skipUnless(os.name == "posix", "needs a posix shell")
+    def test_find_linker(self) -> None:
+        compiler = os.path.join(self.tempdir.name, "fake-c++")
+        with open(compiler, "w") as f:
+            f.write("#!/bin/sh\n[ \"$1\" = \"-fuse-ld=lld\" ] || [ \"$1\" = \"-fuse-ld=gold\" ]\n")
+        os.chmod(compiler, 0o755)
+        toolchains = ToolchainCache(os.path.join(self.tempdir.name, "toolchains.json"))
+        self.assertEqual(linker.available(compiler, toolchains), ["lld", "gold"])
+        self.assertEqual(linker.find_linker("auto", compiler, toolchains), "lld")
+        self.assertEqual(linker.find_linker("Gold", compiler, toolchains), "gold")
+        self.assertIsNone(linker.find_linker("mold", compiler, toolchains))
+        self.assertIsNone(linker.find_linker("default", compiler, toolchains))
+        self.assertIsNone(linker.find_linker("ld.fast", compiler, toolchains))
+        #kept on disk with the compiler's other probe results
+        stored = ToolchainCache(toolchains.filename).probe(compiler)
+        self.assertEqual(stored.linkers, {"mold": False, "lld": True, "gold": True})
+
+    def test_cmake_command(self) -> None:
+        project = ProjectInformation(build_directory=self.tempdir.name)
+        command = project.cmake()
+        #a linker or launcher set by hand or in a preset is left alone
+        self.assertFalse(any(arg.startswith("-U") for arg in command))
+        self.assertFalse(any("PROJECT_INCLUDE" in arg for arg in command))
+        command = project.cmake(owned=linker.CACHE_ENTRIES) #unless an earlier configure of ours set it
+        for name in linker.CACHE_ENTRIES:
+            self.assertIn(f"-U{name}", command)
+        command = project.cmake({linker.LINKER_VARIABLE: "gold"}, owned=linker.CACHE_ENTRIES)
+        self.assertIn(f"-D{linker.LINKER_VARIABLE}=gold", command)
+        self.assertNotIn(f"-U{linker.LINKER_VARIABLE}", command)
+        self.assertIn("-UCMAKE_LINKER_TYPE", command)
+        self.assertIn("-DCMAKE_PROJECT_INCLUDE=" + project_include_path(self.tempdir.name), command)
+        self.assertEqual(ProjectInformation(build_directory=self.tempdir.name).configure_command(),
+            ProjectInformation(build_directory=self.tempdir.name).cmake())
+
+    def test_link_times(self) -> None:
+        launcher = linker.timing_launcher(self.tempdir.name)
+        for output, code in [("app", 0), ("libfoo.so", 3)]:
+            completed = subprocess.run(launcher + [sys.executable, "-c", f"import sys; sys.exit({code})", "-o", output])
+            self.assertEqual(completed.returncode, code)
+        times = linker.take_link_times(self.tempdir.name)
+        self.assertEqual([output for output, _ in times], ["app", "libfoo.so"])
+        self.assertTrue(all(seconds > 0 for _, seconds in times))
+        self.assertEqual(linker.take_link_times(self.tempdir.name), [])
+
+    def test_link_times_with_a_relative_build_directory(self) -> None:
+        build = os.path.relpath(os.path.join(self.tempdir.name, "build"))
+        target = os.path.join(self.tempdir.name, "build", "app")
+        os.makedirs(target)
+        launcher = linker.timing_launcher(build)
+        completed = subprocess.run(launcher + [sys.executable, "-c", "", "-o", "app"], cwd=target) #where make links
+        self.assertEqual(completed.returncode, 0)
+        self.assertEqual([output for output, _ in linker.take_link_times(build)], ["app"])
+
+        missing = os.path.join(self.tempdir.name, "missing", "links.log")
+        completed = subprocess.run([sys.executable, linker.__file__, "--time", missing, sys.executable, "-c",
+            "import sys; sys.exit(3)"], stderr=subprocess.DEVNULL)
+        self.assertEqual(completed.returncode, 3) #the link's own exit code, though the time was not recorded
+
+    def test_settings(self) -> None:
+        project = ProjectInformation()
+        project.linker = "auto"
+        project.time_links = True
+        copy = ProjectInformation()
+        copy.fromjson(project.tojson())
+        self.assertEqual((copy.linker, copy.time_links), ("auto", True))
+
+    @testdata.requires_toolchain(fake_toolchain=False)
+    def test_link_phase(self) -> None:
+        project = generate(self.tempdir.name, SyntheticSpec(targets=2, sources=2, fake_toolchain=False))
+        project.linker = "auto"
+        project.time_links = True
+        self.assertTrue(project.execute(consumers=[]))
+        result = project.last_result
+        self.assertEqual([c.phase for c in result.commands], ["configure", "build", "link"])
+        link = result.commands[-1]
+        self.assertEqual(link.part_of, "build")
+        self.assertGreater(link.duration, 0)
+        self.assertAlmostEqual(result.duration, result.commands[0].duration + result.commands[1].duration)
+
+    @testdata.requires_toolchain(fake_toolchain=False)
+    def test_linker_turned_off(self) -> None:
+        project = generate(self.tempdir.name, SyntheticSpec(targets=2, sources=2, fake_toolchain=False))
+        compiler = toolchains().resolve("c++")
+        if compiler is None or not linker.usable(compiler, "gold"):
+            self.skipTest("needs a compiler that can link with gold")
+        project.cpp_compiler = compiler
+        project.linker = "gold"
+        project.time_links = True
+        project.cmake_definitions = {"CMAKE_EXE_LINKER_FLAGS": "-Wl,-O1"}
+        self.assertTrue(project.execute(consumers=[]))
+        links = self._link_commands(project)
+        self.assertTrue(all("-Wl,-O1" in link for link in links)) #the project's own flags are kept
+        self.assertTrue(all("gold" in link for link in links))
+
+        project.linker = ""
+        project.time_links = False
+        self.assertTrue(project.execute(consumers=[])) #reconfigured over the same cache
+        links = self._link_commands(project)
+        self.assertTrue(all("-Wl,-O1" in link for link in links))
+        self.assertFalse(any("gold" in link or "linker.py" in link for link in links))
+
+    def _link_commands(self, project: ProjectInformation) -> list:
+        links = []
+        for path in glob.glob(os.path.join(project.build_directory, "**", "link.txt"), recursive=True):
+            with open(path) as f:
+                text = f.read()
+            if " -o " in text: #static libraries are archived, not linked
+                links.append(text)
+        self.assertGreater(len(links), 0)
+        return links
@@ -0,0 +1,101 @@
+import unittest, logging, io, os, tempfile, threading, time
+
+import logsetup
+from logsetup import BoundedQueueHandler, OverflowPolicy
+
+logger = logging.getLogger("TEST: " + __name__)
+
+class _BlockingStream(io.StringIO):
+    '''
+    A console that hangs until it is released, like a terminal nobody reads.
+    '''
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def write(self, text: str) -> int:
+        self.release.wait(10)
+        return super().write(text)
+
+class LogSetupTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        root = logging.getLogger()
+        self.saved = (list(root.handlers), root.level)
+        self.tempdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        if logsetup._pipeline is not None:
+            logsetup._pipeline.stop()
+            logsetup._pipeline = None
+        root = logging.getLogger()
+        for h in list(root.handlers):
+            root.removeHandler(h)
+        for h in self.saved[0]:
+            root.addHandler(h)
+        root.setLevel(self.saved[1])
+        for name in ("logsetuptest", "logsetuptest.quiet"):
+            logging.getLogger(name).setLevel(logging.NOTSET)
+        self.tempdir.cleanup()
+
+    def test_records_reach_console_and_file(self) -> None:
+        stream = io.StringIO()
+        logfile = os.path.join(self.tempdir.name, "builder.log")
+        pipeline = logsetup.setup(level=logging.INFO, logfile=logfile, stream=stream)
+        items = ["a"]
+        logging.getLogger("logsetuptest").info("items: %s", items)
+        items.append("b") #changed after logging, before the listener formats it
+        logging.getLogger("logsetuptest").debug("not shown")
+        pipeline.stop()
+        self.assertIn("[logsetuptest] [INFO] -> items: ['a']", stream.getvalue())
+        self.assertNotIn("not shown", stream.getvalue())
+        with open(logfile, "r") as f:
+            self.assertIn("items: ['a']", f.read())
+
+    def test_subsystem_levels(self) -> None:
+        stream = io.StringIO()
+        levels = logsetup.parse_levels(["logsetuptest=debug", "logsetuptest.quiet = error", "broken", "x=loud"])
+        self.assertEqual(levels, {"logsetuptest": logging.DEBUG, "logsetuptest.quiet": logging.ERROR})
+        pipeline = logsetup.setup(level=logging.WARNING, levels=levels, stream=stream)
+        logging.getLogger("logsetuptest.child").debug("child debug")
+        logging.getLogger("logsetuptest.quiet").warning("quiet warning")
+        logging.getLogger("other").info("other info")
+        pipeline.stop()
+        self.assertIn("child debug", stream.getvalue())
+        self.assertNotIn("quiet warning", stream.getvalue())
+        self.assertNotIn("other info", stream.getvalue())
+
+    def test_overflow_policies(self) -> None:
+        def fill(policy: OverflowPolicy, levels: list) -> BoundedQueueHandler:
+            handler = BoundedQueueHandler(maxsize=3, policy=policy)
+            for i, level in enumerate(levels):
+                handler.handle(logging.LogRecord("t", level, __file__, 0, str(i), None, None))
+            return handler
+
+        newest = fill(OverflowPolicy.DROP_NEW, [logging.INFO] * 5)
+        self.assertEqual([newest.queue.get_nowait().msg for _ in range(3)], ["0", "1", "2"])
+        self.assertEqual(newest.take_dropped(), {"INFO": 2})
+        self.assertEqual(newest.take_dropped(), {})
+
+        oldest = fill(OverflowPolicy.DROP_OLDEST, [logging.INFO] * 5)
+        self.assertEqual([oldest.queue.get_nowait().msg for _ in range(3)], ["2", "3", "4"])
+
+        #a warning is kept even when new records are the ones dropped
+        warned = fill(OverflowPolicy.DROP_NEW, [logging.DEBUG] * 3 + [logging.WARNING])
+        self.assertEqual([warned.queue.get_nowait().msg for _ in range(3)], ["1", "2", "3"])
+        self.assertEqual(warned.take_dropped(), {"DEBUG": 1})
+
+    def test_logging_never_waits_for_output(self) -> None:
+        stream = _BlockingStream()
+        pipeline = logsetup.setup(level=logging.DEBUG, stream=stream, maxsize=100)
+        build = logging.getLogger("logsetuptest")
+        start = time.monotonic()
+        for i in range(5000):
+            build.info(f"output line {i}")
+        self.assertLess(time.monotonic() - start, 5.0) #would hang for 10s per line if it waited
+        stream.release.set()
+        pipeline.stop()
+        dropped = pipeline.total_dropped.get("INFO", 0)
+        self.assertGreater(dropped, 0)
+        self.assertIn(f"dropped {dropped} info message(s)", stream.getvalue())
+        self.assertEqual(stream.getvalue().count("output line"), 5000 - dropped)
@@ -0,0 +1,72 @@
+import logging, os
+
+from benchmarks.synthetic import SyntheticSpec, generate
+from buildgraph import BuildStatus
+from buildhistory import configuration_name
+from data import ProjectInformation, SupportedCmakeGenerators
+from matrix import LOG_FILENAME, BuildMatrix, report
+from unit_tests import testdata
+
+logger = logging.getLogger("TEST: " + __name__)
+
+class BuildMatrixTestCase(testdata.TemporaryDirectoryTestCase):
+
+    def test_settings(self) -> None:
+        project = ProjectInformation()
+        project.build_type = "Release"
+        project.cmake_definitions = {"WITH_TESTS": "OFF", "A": "1"}
+        copy = ProjectInformation()
+        copy.fromjson(project.tojson())
+        self.assertEqual((copy.build_type, copy.cmake_definitions), ("Release", {"WITH_TESTS": "OFF", "A": "1"}))
+        command = project.cmake()
+        self.assertIn("-DCMAKE_BUILD_TYPE=Release", command)
+        self.assertLess(command.index("-DA=1"), command.index("-DWITH_TESTS=OFF"))
+        project.generator_type = SupportedCmakeGenerators.NINJA_MULTI_CONFIG
+        self.assertIn("-DCMAKE_DEFAULT_BUILD_TYPE=Release", project.cmake())
+
+        project.cpp_compiler = "/usr/bin/clang++"
+        self.assertEqual(configuration_name(project), "Release clang++ A=1 WITH_TESTS=OFF")
+        self.assertEqual(configuration_name(ProjectInformation()), "default")
+        self.assertEqual(configuration_name(ProjectInformation(cpp_compiler="/usr/bin/g++")), "default")
+        self.assertEqual(configuration_name(ProjectInformation(cpp_compiler="g++", cmake_definitions={"A": "1"})),
+            "default g++ A=1")
+
+    def test_cells(self) -> None:
+        project = ProjectInformation()
+        project.project_directory = self.tempdir.name
+        project.build_directory = "build"
+        project.cmake_definitions = {"BASE": "1"}
+        cells = BuildMatrix(project, build_types=["Debug", "Release"], compilers=[("gcc", "g++"), ("clang", "clang++")],
+            definitions=[{}, {"SAN": "address"}]).cells()
+        self.assertEqual(len(cells), 8)
+        self.assertEqual(cells[0].name, "Debug-g++")
+        self.assertEqual(cells[-1].name, "Release-clang++-SAN=address")
+        self.assertEqual(cells[-1].project.cmake_definitions, {"BASE": "1", "SAN": "address"})
+        self.assertEqual(cells[-1].project.c_compiler, "clang")
+        self.assertEqual(len({c.project.build_directory for c in cells}), 8)
+        self.assertTrue(all(c.project.build_directory.startswith(os.path.join(self.tempdir.name, "build") + os.sep)
+            for c in cells))
+        self.assertEqual(project.cmake_definitions, {"BASE": "1"}) #the original is left alone
+        self.assertEqual([c.name for c in BuildMatrix(project).cells()], ["default"])
+
+    @testdata.requires_toolchain()
+    def test_run(self) -> None:
+        project = generate(self.tempdir.name, SyntheticSpec(targets=2, sources=2))
+        results = BuildMatrix(project, build_types=["Debug", "Release"], definitions=[{}, {"FOO": "1"}]).run(cpu_budget=4)
+        self.assertEqual(list(results), ["Debug", "Debug-FOO=1", "Release", "Release-FOO=1"])
+        for r in results.values():
+            self.assertEqual(r.status, BuildStatus.SUCCEEDED)
+            self.assertEqual(set(r.phases), {"configure", "build"})
+            self.assertTrue(os.path.isfile(os.path.join(r.build_directory, "app", "app")))
+            self.assertTrue(os.path.isfile(os.path.join(r.build_directory, LOG_FILENAME)))
+        with open(os.path.join(results["Release-FOO=1"].build_directory, "CMakeCache.txt"), "r") as f:
+            cache = f.read()
+        self.assertIn("CMAKE_BUILD_TYPE:STRING=Release", cache)
+        self.assertIn("FOO:UNINITIALIZED=1", cache)
+        self.assertIn("4 succeeded, 0 failed, 0 skipped", report(results))
+
+        results = BuildMatrix(project, build_types=["Debug", "Release"],
+            compilers=[("cc", "c++"), ("missing-cc", "missing-c++")]).run(stop_on_failure=True, max_parallel=1)
+        self.assertEqual([r.status for r in results.values()],
+            [BuildStatus.SUCCEEDED, BuildStatus.FAILED, BuildStatus.SKIPPED, BuildStatus.SKIPPED])
+        self.assertEqual(results["Debug-missing-c++"].reason, "the project settings are not valid")
@@ -0,0 +1,48 @@
+import unittest, logging, sys
+
+from data import ProjectInformation
+from outputpipe import LineSplitter, OutputPipe, TailConsumer, CallbackConsumer
+
+logger = logging.getLogger("TEST: " + __name__)
+
+class OutputPipeTestCase(unittest.TestCase):
+
+    def test_line_splitting(self) -> None:
+        splitter = LineSplitter()
+        self.assertEqual(splitter.feed(b"first li"), [])
+        self.assertEqual(splitter.feed(b"ne\r\nsecond\nthi"), ["first line", "second"])
+        self.assertEqual(splitter.feed("rd é".encode("utf-8")[:-1]), [])
+        self.assertEqual(splitter.feed("é\n".encode("utf-8")[-2:]), ["third é"])
+        self.assertEqual(splitter.feed(b"unterminated"), [])
+        self.assertEqual(splitter.finish(), ["unterminated"])
+
+    def test_long_lines_are_bounded(self) -> None:
+        splitter = LineSplitter(max_line=10)
+        self.assertEqual(splitter.feed(b"x" * 25), ["x" * 25])
+        self.assertEqual(splitter.feed(b"y" * 5 + b"\n" + b"z" * 11), ["y" * 5, "z" * 11])
+        self.assertEqual(splitter.finish(), [])
+
+    def test_failing_consumer_is_dropped(self) -> None:
+        tail = TailConsumer(maxlines=2)
+
+        def fail(line: str) -> None:
+            raise RuntimeError("consumer failure")
+
+        pipe = OutputPipe([CallbackConsumer(fail), tail])
+        pipe.feed(b"a\nb\nc\n")
+        pipe.feed(b"d")
+        pipe.close()
+        self.assertEqual(list(tail.lines), ["c", "d"])
+        self.assertEqual(len(pipe.consumers), 1)
+        self.assertEqual(pipe.line_count, 4)
+
+    def test_streamed_command_keeps_order(self) -> None:
+        script = ("import sys\n"
+            "for i in range(200):\n"
+            "    s = sys.stderr if i % 2 else sys.stdout\n"
+            "    s.write(str(i) + '\\n'); s.flush()\n")
+        tail = TailConsumer(maxlines=1000)
+        info = ProjectInformation()
+        self.assertTrue(info._run_command([sys.executable, "-c", script], consumers=[tail]))
+        self.assertEqual(list(tail.lines), [str(i) for i in range(200)])
+        self.assertFalse(info._run_command([sys.executable, "-c", "raise SystemExit(3)"], consumers=[tail]))
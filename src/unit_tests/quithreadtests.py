@@ -0,0 +1,74 @@
+import unittest, logging, os, threading, time
+
+try:
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    import quithread
+except ImportError:
+    QApplication = None
+
+logger = logging.getLogger("TEST: " + __name__)
+
+@unittest.skipIf(QApplication is None, "needs PyQt5")
+class UITaskTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.app = QApplication.instance() or QApplication([])
+
+    def _start(self, function) -> dict:
+        task = quithread.FunctionTask(function)
+        seen = {"task": task, "progress": [], "finished": [], "failed": [], "cancelled": 0}
+        task.signals.progress.connect(seen["progress"].append)
+        task.signals.finished.connect(seen["finished"].append)
+        task.signals.failed.connect(seen["failed"].append)
+        task.signals.cancelled.connect(lambda: seen.__setitem__("cancelled", seen["cancelled"] + 1))
+        quithread.start(task)
+        return seen
+
+    def _process_until(self, condition, timeout: float=10) -> bool:
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            self.app.processEvents()
+            time.sleep(0.005)
+        self.app.processEvents()
+        return condition()
+
+    def test_throttled_progress_arrives_while_the_task_is_quiet(self) -> None:
+        release = threading.Event()
+        def work(token, report):
+            for i in range(100):
+                report(i)
+            release.wait(10) #quiet, but not finished
+            return "done"
+        seen = self._start(work)
+        self.assertTrue(self._process_until(lambda: len(seen["progress"]) > 0 and seen["progress"][-1] == 99))
+        self.assertEqual(seen["finished"], [])
+        self.assertLess(len(seen["progress"]), 100) #throttled
+        self.assertEqual(seen["progress"], sorted(seen["progress"]))
+        release.set()
+        self.assertTrue(self._process_until(lambda: seen["finished"] == ["done"]))
+        self.assertEqual(seen["progress"][-1], 99)
+
+    def test_cancel(self) -> None:
+        started = threading.Event()
+        def work(token, report):
+            started.set()
+            while not token.wait(0.01):
+                pass
+            token.raise_if_cancelled()
+        seen = self._start(work)
+        self.assertTrue(started.wait(10))
+        seen["task"].cancel()
+        self.assertTrue(self._process_until(lambda: seen["cancelled"] == 1))
+        self.assertEqual((seen["finished"], seen["failed"]), ([], []))
+
+    def test_failure(self) -> None:
+        def work(token, report):
+            report("half way")
+            raise ValueError("broken")
+        seen = self._start(work)
+        self.assertTrue(self._process_until(lambda: len(seen["failed"]) == 1))
+        self.assertEqual(seen["failed"], [repr(ValueError("broken"))])
+        self.assertEqual(seen["progress"], ["half way"])
+        self.assertEqual(seen["finished"], [])
@@ -0,0 +1,74 @@
+import unittest, logging, os, tempfile, time
+
+from cleaner import CleanMode
+from data import ProjectInformation
+from registry import ProjectRegistry, find_projects
+
+logger = logging.getLogger("TEST: " + __name__)
+
+class ProjectRegistryTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.registry = ProjectRegistry(os.path.join(self.tempdir.name, "projects.db"))
+        self.root = os.path.join(self.tempdir.name, "code")
+
+    def tearDown(self) -> None:
+        self.tempdir.cleanup()
+
+    def _make_project(self, *parts: str) -> str:
+        path = os.path.join(self.root, *parts)
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "CMakeLists.txt"), "w") as f:
+            f.write("project(x)\n")
+        return path
+
+    def test_find_projects(self) -> None:
+        alpha = self._make_project("alpha")
+        self._make_project("alpha", "subproject") #part of alpha
+        beta = self._make_project("group", "beta")
+        self._make_project(".hidden", "gamma")
+        os.makedirs(os.path.join(self.root, "empty", "deeper"))
+        self.assertEqual(find_projects(self.root, max_workers=4), sorted([alpha, beta]))
+
+    def test_save_get_and_open(self) -> None:
+        path = self._make_project("alpha")
+        self.assertIsNone(self.registry.get(path))
+        project = ProjectInformation(project_directory=path, build_jobs=3, clean_mode=CleanMode.TARGET)
+        self.registry.save(project)
+        stored = self.registry.get(path)
+        self.assertEqual(stored.build_jobs, 3)
+        self.assertEqual(stored.clean_mode, CleanMode.TARGET)
+
+        other = self._make_project("beta")
+        opened = self.registry.open(other)
+        self.assertEqual(opened.project_directory, other)
+        self.assertEqual(self.registry.count(), 2)
+        self.assertTrue(self.registry.remove(other))
+        self.assertFalse(self.registry.remove(other))
+
+    def test_import_keeps_existing_settings(self) -> None:
+        alpha = self._make_project("alpha")
+        self.registry.save(ProjectInformation(project_directory=alpha, build_jobs=7))
+        beta = self._make_project("beta")
+        self.assertEqual(self.registry.import_tree(self.root), [alpha, beta])
+        self.assertEqual(self.registry.get(alpha).build_jobs, 7)
+        self.assertEqual(self.registry.get(beta).build_directory, os.path.join(beta, "build"))
+
+    def test_search_and_recent_order(self) -> None:
+        for name in ["Alpha", "alphabet", "beta", "gamma"]:
+            self._make_project("group", name)
+        self.registry.import_tree(self.root)
+        self.assertEqual([n for _, n in self.registry.search("ALPH")], ["Alpha", "alphabet"])
+        self.assertEqual(self.registry.count("alphab"), 1)
+        self.assertEqual(len(self.registry.search(os.path.join(self.root, "group"))), 4)
+        self.assertEqual(self.registry.search(os.path.join(self.root, "other")), [])
+
+        self.registry.touch(os.path.join(self.root, "group", "gamma"))
+        time.sleep(0.01)
+        self.registry.touch(os.path.join(self.root, "group", "beta"))
+        names = [n for _, n in self.registry.search()]
+        self.assertEqual(names[:2], ["beta", "gamma"])
+
+        pages = self.registry.search(limit=3) + self.registry.search(limit=3, offset=3)
+        self.assertEqual([n for _, n in pages], names)
@@ -0,0 +1,69 @@
+import unittest, logging, os, threading, time
+
+try:
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    from UI.stdredirect import UIStream
+except ImportError:
+    QApplication = None
+
+logger = logging.getLogger("TEST: " + __name__)
+
+@unittest.skipIf(QApplication is None, "needs PyQt5")
+class UIStreamTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.app = QApplication.instance() or QApplication([])
+
+    def test_batches_arrive_in_order_on_the_gui_thread(self) -> None:
+        threshold = UIStream.flush_threshold
+        UIStream.flush_threshold = 64 #most writes fill the buffer and flush at once
+        sink = open(os.devnull, "w")
+        try:
+            stream = UIStream(original_stream=sink)
+            received, threads = [], set()
+            def message(text: str) -> None:
+                received.append(text)
+                threads.add(threading.get_ident())
+            stream.messageWritten.connect(message)
+            def produce() -> None:
+                for i in range(2000):
+                    stream.write(f"{i:040d}\n")
+            writer = threading.Thread(target=produce)
+            writer.start()
+            deadline = time.monotonic() + 30
+            while time.monotonic() < deadline:
+                self.app.processEvents()
+                if not writer.is_alive() and not (stream._flush_pending or stream._flush_now_pending) \
+                    and stream._buffered == 0:
+                    break
+                time.sleep(0.001)
+            writer.join()
+            self.app.processEvents()
+            lines = "\n".join(received).split("\n")
+            self.assertEqual(lines, [f"{i:040d}" for i in range(2000)])
+            self.assertEqual(threads, {threading.get_ident()})
+        finally:
+            UIStream.flush_threshold = threshold
+            sink.close()
+
+    def test_lagging_gui_drops_the_oldest_output(self) -> None:
+        limit = UIStream.buffer_limit
+        UIStream.buffer_limit = 1000
+        sink = open(os.devnull, "w")
+        try:
+            stream = UIStream(original_stream=sink)
+            received = []
+            stream.messageWritten.connect(received.append)
+            for i in range(500): #no events are processed meanwhile
+                stream.write(f"{i:09d}\n")
+                self.assertLessEqual(stream._buffered, 1000)
+            stream.flush_ui()
+            lines = received[0].split("\n")
+            self.assertRegex(lines[0], r"^\[\d+ characters of output dropped\]$")
+            self.assertEqual(lines[-1], f"{499:09d}")
+            self.assertEqual(lines[1:], [f"{i:09d}" for i in range(500 - len(lines) + 1, 500)])
+        finally:
+            UIStream.buffer_limit = limit
+            sink.close()
@@ -1,5 +1,6 @@
-import logging
+import unittest, logging, shutil, tempfile
 
+from benchmarks.synthetic import fake_toolchain_supported
 from data import ProjectInformation, SupportedCmakeGenerators
 
 logger = logging.getLogger("TEST: " + __name__)
@@ -18,3 +19,22 @@ def actual_project_information() -> ProjectInformation:
     testinfo.cmake_library_path = [r"C:\Program Files\LLVM\lib\clang\9.0.0\include"]
     return testinfo
 
+
+def requires_toolchain(fake_toolchain: bool=True):
+    '''
+    Skips a test (or test case) unless cmake and a c++ compiler are installed,
+    and, with fake_toolchain, the synthetic projects' fake compiler can run.
+    '''
+    if shutil.which("cmake") is None or shutil.which("c++") is None:
+        return unittest.skip("needs cmake and a c++ compiler")
+    if fake_toolchain and not fake_toolchain_supported():
+        return unittest.skip("needs a posix shell for the fake toolchain")
+    return lambda test: test
+
+class TemporaryDirectoryTestCase(unittest.TestCase):
+    '''
+    Gives every test a temporary directory, self.tempdir, removed after it.
+    '''
+    def setUp(self) -> None:
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
@@ -0,0 +1,46 @@
+import unittest, logging, threading, time
+
+from threads import Worker, WorkerPool, TaskPriority
+
+logger = logging.getLogger("TEST: " + __name__)
+
+class ThreadsTestCase(unittest.TestCase):
+
+    def test_worker_wakes_on_submit(self) -> None:
+        done = threading.Event()
+        items = []
+
+        def work(value: int) -> None:
+            items.append(value)
+            if value == 2:
+                done.set()
+
+        worker = Worker(work)
+        worker.start()
+        time.sleep(0.05) #let it go idle first: work submitted then still has to wake it
+        self.assertEqual(worker.pending(), 0)
+        for i in range(3):
+            worker.submit(i)
+        self.assertTrue(done.wait(timeout=5))
+        self.assertEqual(worker.pending(), 0)
+        worker.halt_thread(timeout=5)
+        self.assertFalse(worker.is_alive())
+        self.assertEqual(items, [0, 1, 2])
+        self.assertRaises(RuntimeError, worker.submit, 3)
+
+    def test_pool_priorities(self) -> None:
+        pool = WorkerPool(threads=1)
+        gate = threading.Event()
+        order = []
+        blocker = pool.submit(gate.wait)
+        futures = [pool.submit(order.append, "clean", priority=TaskPriority.CLEAN),
+            pool.submit(order.append, "build", priority=TaskPriority.BUILD),
+            pool.submit(order.append, "parse", priority=TaskPriority.PARSE)]
+        gate.set()
+        for f in [blocker] + futures:
+            f.result(timeout=5)
+        self.assertEqual(order, ["parse", "build", "clean"])
+
+        failing = pool.submit(lambda: 1 / 0)
+        self.assertRaises(ZeroDivisionError, failing.result, 5)
+        pool.shutdown()
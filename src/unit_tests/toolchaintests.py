@@ -0,0 +1,50 @@
+import unittest, logging, os, shutil, tempfile
+
+from toolchain import ToolchainCache
+import toolchain
+
+logger = logging.getLogger("TEST: " + __name__)
+
+class ToolchainCacheTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tempdir.name, "toolchains.json")
+
+    def tearDown(self) -> None:
+        self.tempdir.cleanup()
+
+    def test_resolve(self) -> None:
+        cache = ToolchainCache(self.filename)
+        self.assertIsNone(cache.resolve(""))
+        self.assertIsNone(cache.resolve("no-such-compiler-anywhere"))
+        self.assertIsNone(cache.resolve(os.path.join(self.tempdir.name, "missing")))
+        cmake = shutil.which("cmake")
+        if cmake is not None:
+            self.assertEqual(cache.resolve("cmake"), os.path.abspath(cmake))
+            self.assertEqual(cache.resolve(cmake), os.path.abspath(cmake))
+
+    @unittest.skipIf(shutil.which("cmake") is None, "cmake is not installed")
+    def test_probe_is_cached(self) -> None:
+        cache = ToolchainCache(self.filename)
+        info = cache.probe("cmake")
+        self.assertEqual(info.kind, "cmake")
+        self.assertRegex(info.version, r"^\d+\.\d+")
+        self.assertTrue(os.path.isfile(self.filename))
+
+        calls = []
+        original = toolchain._first_line
+        toolchain._first_line = lambda command: calls.append(command) or ""
+        try:
+            again = ToolchainCache(self.filename).probe("cmake")
+        finally:
+            toolchain._first_line = original
+        self.assertEqual(calls, []) #answered from the cache on disk
+        self.assertEqual(again, info)
+
+    def test_kinds(self) -> None:
+        self.assertEqual(toolchain._kind_of("/usr/bin/g++-12"), "cpp")
+        self.assertEqual(toolchain._kind_of("/usr/bin/clang-15"), "c")
+        self.assertEqual(toolchain._kind_of("C:/LLVM/bin/clang++.exe"), "cpp")
+        self.assertEqual(toolchain._kind_of("/usr/bin/ninja"), "ninja")
+        self.assertEqual(toolchain._kind_of("/usr/bin/python3"), "")
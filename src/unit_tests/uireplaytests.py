@@ -0,0 +1,52 @@
+import unittest, logging, os, tempfile
+
+from benchmarks.uireplay import RecordingConsumer, compare, load_recording, replay
+
+try:
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+except ImportError:
+    QApplication = None
+
+logger = logging.getLogger("TEST: " + __name__)
+
+@unittest.skipIf(QApplication is None, "needs PyQt5")
+class UIReplayTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.app = QApplication.instance() or QApplication([])
+
+    def test_recording_round_trip(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "build.jsonl")
+            consumer = RecordingConsumer(filename)
+            consumer.consume(["[ 50%] Building CXX object a.o", "warning: \"quoted\""])
+            consumer.consume([""])
+            consumer.close()
+            recording = load_recording(filename)
+        self.assertEqual([lines for _, lines in recording],
+            [["[ 50%] Building CXX object a.o", "warning: \"quoted\""], [""]])
+        self.assertEqual(recording[0][0], 0.0)
+        self.assertGreaterEqual(recording[1][0], 0.0)
+
+    def test_replay_shows_every_line(self) -> None:
+        recording = [(i * 0.001, [f"line {i}.{j}" for j in range(5)]) for i in range(400)]
+        results = replay(recording, maxlines=5000)
+        self.assertEqual(results["lines"], 2000)
+        self.assertEqual(results["shown"], 2000)
+        self.assertEqual(results["blocks"], 2000)
+        self.assertGreater(results["lines_per_second"], 0)
+        self.assertGreater(results["signals"]["messageWritten"], 0)
+        self.assertLessEqual(results["signals"]["messageWritten"], 400) #batched, not one signal per write
+        self.assertIn("p99", results["latency_ms"])
+
+        paced = replay(recording[:20], rate=1000)
+        self.assertEqual(paced["shown"], 100)
+        self.assertGreaterEqual(paced["seconds"], 0.09)
+
+    def test_compare(self) -> None:
+        baseline = {"lines_per_second": 1000.0, "latency_ms": {"p99": 10.0, "max": 20.0}}
+        self.assertEqual(compare(baseline, baseline), [])
+        worse = compare(baseline, {"lines_per_second": 800.0, "latency_ms": {"p99": 10.5, "max": 40.0}})
+        self.assertEqual([line.split(":")[0] for line in worse], ["lines_per_second", "latency_ms.max"])
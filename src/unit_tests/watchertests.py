@@ -0,0 +1,149 @@
+import unittest, logging, os, tempfile, threading, time
+
+from data import ProjectCommands, ProjectInformation
+from execution import CommandResult, ExecutionResult
+from watcher import InotifyWatcher, MidBuildPolicy, PollingWatcher, Watcher, WatchBuilder, commands_for
+import execution, watcher
+
+logger = logging.getLogger("TEST: " + __name__)
+
+class _ScriptedWatcher(Watcher):
+    '''
+    Reports the changes the test hands it.
+    '''
+    def __init__(self):
+        super().__init__(".")
+        self.queue = []
+        self.lock = threading.Lock()
+
+    def push(self, *paths: str) -> None:
+        with self.lock:
+            self.queue.append(set(paths))
+
+    def changes(self, timeout: float) -> set:
+        with self.lock:
+            if len(self.queue) > 0:
+                return self.queue.pop(0)
+        time.sleep(timeout)
+        return set()
+
+def _write(path: str, text: str="x") -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+class WatcherTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.root = self.tempdir.name
+        _write(os.path.join(self.root, "main.cpp"))
+        _write(os.path.join(self.root, "build", "main.o"))
+
+    def tearDown(self) -> None:
+        self.tempdir.cleanup()
+
+    def test_commands_for(self) -> None:
+        self.assertEqual(commands_for([]), ProjectCommands.NO_COMMAND)
+        self.assertEqual(commands_for(["a/main.cpp", "a/b.h"]), ProjectCommands.MAKE)
+        self.assertEqual(commands_for(["a/main.cpp", "a/CMakeLists.txt"]), ProjectCommands.CMAKE | ProjectCommands.MAKE)
+        self.assertEqual(commands_for(["cmake/Find.cmake"]), ProjectCommands.CMAKE | ProjectCommands.MAKE)
+        self.assertEqual(commands_for([watcher.EVERYTHING]), ProjectCommands.CMAKE | ProjectCommands.MAKE)
+
+    def _check_watcher(self, w: Watcher) -> None:
+        try:
+            self.assertEqual(w.changes(0.05), set())
+            time.sleep(0.01) #coarse filesystem timestamps
+            _write(os.path.join(self.root, "main.cpp"), "changed")
+            _write(os.path.join(self.root, "build", "other.o"))
+            _write(os.path.join(self.root, "main.cpp.swp"))
+            changed = set()
+            deadline = time.monotonic() + 5.0
+            while os.path.join(self.root, "main.cpp") not in changed and time.monotonic() < deadline:
+                changed |= w.changes(0.5)
+            self.assertEqual(changed, {os.path.join(self.root, "main.cpp")})
+
+            _write(os.path.join(self.root, "lib", "CMakeLists.txt"))
+            changed = set()
+            deadline = time.monotonic() + 5.0
+            while os.path.join(self.root, "lib", "CMakeLists.txt") not in changed and time.monotonic() < deadline:
+                changed |= w.changes(0.5)
+            self.assertIn(os.path.join(self.root, "lib", "CMakeLists.txt"), changed)
+        finally:
+            w.close()
+
+    def test_polling_watcher(self) -> None:
+        self._check_watcher(PollingWatcher(self.root, [os.path.join(self.root, "build")], interval=0.05))
+
+    @unittest.skipUnless(watcher._libc() is not None, "inotify is not available")
+    def test_inotify_watcher(self) -> None:
+        self._check_watcher(InotifyWatcher(self.root, [os.path.join(self.root, "build")]))
+
+    def test_cancel_running_command(self) -> None:
+        if os.name != "posix":
+            self.skipTest("needs a shell")
+        cancel = threading.Event()
+        threading.Timer(0.3, cancel.set).start()
+        #the shell starts a grandchild that would keep running if only the shell were stopped
+        result = execution.run_command(["sh", "-c", "sleep 30 & wait"], cancel=cancel)
+        self.assertTrue(result.cancelled)
+        self.assertFalse(result.success)
+        self.assertLess(result.duration, 5.0)
+
+    def _builder(self, duration: float):
+        builds = []
+        def build(project: ProjectInformation, commands: ProjectCommands, targets: list,
+            cancel: threading.Event) -> ExecutionResult:
+            builds.append(commands)
+            cancelled = cancel.wait(duration)
+            return ExecutionResult(success=not cancelled,
+                commands=[CommandResult(command=["make"], returncode=0, cancelled=cancelled)])
+        return builds, build
+
+    def _watch(self, policy: MidBuildPolicy, duration: float, script) -> list:
+        '''
+        Runs a WatchBuilder on a scripted watcher; script(source) pushes changes.
+        Returns the commands of every build that was started.
+        '''
+        source = _ScriptedWatcher()
+        builds, build = self._builder(duration)
+        builder = WatchBuilder(ProjectInformation(project_directory=self.root), watcher=source,
+            debounce=0.05, policy=policy, builder=build)
+        thread = threading.Thread(target=builder.run, kwargs={"initial": ProjectCommands.NO_COMMAND})
+        thread.start()
+        try:
+            script(source)
+        finally:
+            builder.stop()
+            thread.join(10.0)
+        self.assertFalse(thread.is_alive())
+        return builds
+
+    def test_change_cancels_running_build(self) -> None:
+        def script(source: _ScriptedWatcher) -> None:
+            source.push(os.path.join(self.root, "main.cpp"))
+            time.sleep(0.5) #the first build is running
+            source.push(os.path.join(self.root, "CMakeLists.txt"))
+            time.sleep(0.5)
+        builds = self._watch(MidBuildPolicy.CANCEL, 5.0, script)
+        self.assertEqual(builds, [ProjectCommands.MAKE, ProjectCommands.CMAKE | ProjectCommands.MAKE])
+
+    def test_changes_queue_behind_running_build(self) -> None:
+        def script(source: _ScriptedWatcher) -> None:
+            source.push(os.path.join(self.root, "main.cpp"))
+            time.sleep(0.2)
+            source.push(os.path.join(self.root, "a.cpp"))
+            source.push(os.path.join(self.root, "b.cpp"))
+            time.sleep(1.2)
+        builds = self._watch(MidBuildPolicy.QUEUE, 0.6, script)
+        #the two later changes arrived during the first build and were built together after it
+        self.assertEqual(builds, [ProjectCommands.MAKE, ProjectCommands.MAKE])
+
+    def test_builder_without_a_result(self) -> None:
+        results = []
+        builder = WatchBuilder(ProjectInformation(project_directory=self.root), watcher=_ScriptedWatcher(),
+            builder=lambda project, commands, targets, cancel: None,
+            on_build=lambda commands, result: results.append(result))
+        builder._build(ProjectCommands.MAKE, set(), threading.Event())
+        self.assertEqual(len(results), 1)
+        self.assertFalse(results[0].success)
@@ -0,0 +1,402 @@
+'''
+Watch mode: rebuilds a project whenever its sources change.
+
+Changes are picked up with inotify where it is available and by polling
+otherwise.  Bursts of changes (an editor saving several files, a branch
+switch) are collected into one rebuild, and only the commands the changes
+need are run: MAKE for sources, CMAKE and MAKE for CMakeLists.txt and *.cmake.
+'''
+import ctypes, ctypes.util, enum, errno, logging, os, select, struct, sys, threading, time, typing
+
+from data import ProjectCommands, ProjectInformation
+from execution import ExecutionResult
+
+logger = logging.getLogger(__name__)
+
+# reported instead of file names when changes were lost and anything may have changed
+EVERYTHING = "*"
+
+# editor swap, backup and probe files
+_IGNORED_SUFFIXES = ("~", ".swp", ".swx", ".swo", ".tmp", ".bak", ".orig")
+_IGNORED_NAMES = {"4913", ".DS_Store"}
+
+def is_cmake_file(path: str) -> bool:
+    name = os.path.basename(path)
+    return name == "CMakeLists.txt" or name.endswith(".cmake")
+
+def commands_for(changed: typing.Iterable[str]) -> ProjectCommands:
+    '''
+    Returns the commands that bring a build up to date after changed files changed.
+    '''
+    commands = ProjectCommands.NO_COMMAND
+    for path in changed:
+        if path == EVERYTHING or is_cmake_file(path):
+            return ProjectCommands.CMAKE | ProjectCommands.MAKE
+        commands = ProjectCommands.MAKE
+    return commands
+
+class Watcher:
+    '''
+    Reports changes to files under root.  Hidden directories and the directories
+    in ignore_directories (the build directory, if it is inside the sources) are
+    not watched.
+    '''
+    def __init__(self, root: str, ignore_directories: typing.Iterable[str]=()):
+        self.root = os.path.abspath(root)
+        self.ignore_directories = {os.path.normcase(os.path.abspath(d)) for d in ignore_directories}
+
+    def changes(self, timeout: float) -> typing.Set[str]:
+        '''
+        Waits up to timeout seconds for changes and returns the paths that changed,
+        or an empty set if nothing did.
+        '''
+        raise NotImplementedError(Watcher.changes.__qualname__ + ": Not implemented!")
+
+    def close(self) -> None:
+        pass
+
+    def _skip_directory(self, name: str, path: str) -> bool:
+        return name.startswith(".") or os.path.normcase(path) in self.ignore_directories
+
+    def _skip_file(self, name: str) -> bool:
+        return name in _IGNORED_NAMES or name.endswith(_IGNORED_SUFFIXES)
+
+    def _directories(self, top: str) -> typing.Iterator[str]:
+        '''
+        Yields top and every directory under it that is watched.
+        '''
+        stack = [top]
+        while len(stack) > 0:
+            directory = stack.pop()
+            yield directory
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False) and not self._skip_directory(entry.name, entry.path):
+                            stack.append(entry.path)
+            except OSError:
+                pass
+
+# linux inotify constants, from <sys/inotify.h>
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+#IN_MODIFY is left out: it fires for every write(), while IN_CLOSE_WRITE fires once per save.
+_WATCH_MASK = (_IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE |
+    _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_ONLYDIR)
+_EVENT = struct.Struct("iIII") #wd, mask, cookie, len; followed by len bytes of name
+
+class InotifyWatcher(Watcher):
+    '''
+    A Watcher that is told about changes by the linux kernel, so it costs nothing
+    while nothing changes, however large the tree.  One watch is used per
+    directory; OSError is raised if there are not enough of them
+    (fs.inotify.max_user_watches).
+    '''
+    def __init__(self, root: str, ignore_directories: typing.Iterable[str]=()):
+        super().__init__(root, ignore_directories)
+        self._libc = _libc()
+        if self._libc is None:
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self._fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._paths: typing.Dict[int, str] = {}
+        try:
+            for directory in self._directories(self.root):
+                self._add_watch(directory)
+        except OSError:
+            self.close()
+            raise
+        logger.debug(f"Watching {len(self._paths)} directories under {self.root} with inotify")
+
+    def _add_watch(self, directory: str) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                return #gone already, or not ours to read
+            raise OSError(error, f"inotify_add_watch({directory}) failed: {os.strerror(error)}")
+        self._paths[wd] = directory
+
+    def changes(self, timeout: float) -> typing.Set[str]:
+        changed = set()
+        if self._fd < 0:
+            return changed
+        readable, _, _ = select.select([self._fd], [], [], max(0.0, timeout))
+        if len(readable) == 0:
+            return changed
+        while True:
+            try:
+                data = os.read(self._fd, 2**16)
+            except BlockingIOError:
+                break
+            if len(data) == 0:
+                break
+            self._parse(data, changed)
+        return changed
+
+    def _parse(self, data: bytes, changed: typing.Set[str]) -> None:
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0"))
+            offset += _EVENT.size + length
+            if mask & _IN_Q_OVERFLOW:
+                logger.warning("Too many changes at once; some were lost.")
+                changed.add(EVERYTHING)
+                continue
+            directory = self._paths.get(wd)
+            if directory is None:
+                continue
+            if mask & _IN_IGNORED:
+                del self._paths[wd]
+                continue
+            if mask & (_IN_DELETE_SELF | _IN_MOVE_SELF):
+                changed.add(directory)
+                continue
+            path = os.path.join(directory, name)
+            if mask & _IN_ISDIR:
+                if self._skip_directory(name, path):
+                    continue
+                changed.add(path)
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    self._watch_new_directory(path, changed)
+            elif not self._skip_file(name):
+                changed.add(path)
+
+    def _watch_new_directory(self, top: str, changed: typing.Set[str]) -> None:
+        '''
+        Watches a directory that was created or moved in, and reports the files
+        already in it: they may have been written before the watch existed.
+        '''
+        for directory in self._directories(top):
+            try:
+                self._add_watch(directory)
+            except OSError as e:
+                logger.warning(f"Changes under {directory} will be missed: {e.strerror}")
+                changed.add(EVERYTHING)
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_file(follow_symlinks=False) and not self._skip_file(entry.name):
+                            changed.add(entry.path)
+            except OSError:
+                pass
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+            self._paths.clear()
+
+class PollingWatcher(Watcher):
+    '''
+    A Watcher that finds changes by comparing the modification time and size of
+    every file with the previous scan.  The time between scans grows with how long
+    a scan takes, so that scanning uses at most about 1/cost_ratio of a cpu.
+    '''
+    def __init__(self, root: str, ignore_directories: typing.Iterable[str]=(), interval: float=0.5,
+        cost_ratio: float=20.0):
+        super().__init__(root, ignore_directories)
+        self.interval = interval
+        self.cost_ratio = cost_ratio
+        self._snapshot = self._scan()
+        self._next_scan = time.monotonic() + self._delay
+
+    def _scan(self) -> typing.Dict[str, typing.Tuple[int, int]]:
+        start = time.monotonic()
+        snapshot = {}
+        for directory in self._directories(self.root):
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if not self._skip_file(entry.name) and entry.is_file(follow_symlinks=False):
+                            st = entry.stat(follow_symlinks=False)
+                            snapshot[entry.path] = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                pass
+        self._delay = max(self.interval, (time.monotonic() - start) * self.cost_ratio)
+        return snapshot
+
+    def changes(self, timeout: float) -> typing.Set[str]:
+        wait = self._next_scan - time.monotonic()
+        if wait > timeout:
+            time.sleep(max(0.0, timeout))
+            return set()
+        if wait > 0:
+            time.sleep(wait)
+        snapshot = self._scan()
+        self._next_scan = time.monotonic() + self._delay
+        changed = {p for p, identity in snapshot.items() if self._snapshot.get(p) != identity}
+        changed.update(p for p in self._snapshot if p not in snapshot)
+        self._snapshot = snapshot
+        return changed
+
+_libc_handle = None
+
+def _libc():
+    global _libc_handle
+    if _libc_handle is None and sys.platform.startswith("linux"):
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            libc.inotify_init1.argtypes = [ctypes.c_int]
+            libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+            _libc_handle = libc
+        except (OSError, AttributeError):
+            logger.debug("inotify is not available")
+    return _libc_handle
+
+def watch(root: str, ignore_directories: typing.Iterable[str]=()) -> Watcher:
+    '''
+    Returns the best Watcher for root: inotify where the platform has it and there
+    are enough watches for the tree, polling otherwise.
+    '''
+    try:
+        return InotifyWatcher(root, ignore_directories)
+    except OSError as e:
+        logger.info(f"Polling for changes ({e.strerror or e!r})")
+    return PollingWatcher(root, ignore_directories)
+
+class MidBuildPolicy(enum.Enum):
+    '''
+    What happens to a running build when more changes arrive.
+    '''
+    CANCEL = "cancel" #stop it and start again with everything that changed
+    QUEUE = "queue" #let it finish, then build again
+
+def default_builder(project: ProjectInformation, commands: ProjectCommands,
+    targets: typing.Optional[typing.List[str]], cancel: threading.Event) -> ExecutionResult:
+    project.execute(commands, cancel=cancel, targets=targets)
+    return project.last_result
+
+class WatchBuilder:
+    '''
+    Rebuilds project whenever files under its source directory change.
+
+    Changes are collected until none have arrived for debounce seconds (or for at
+    most max_delay seconds), and then the commands they need are run.  The build
+    runs on a thread of its own so changes keep being collected during it; what
+    happens to the running build then is decided by policy.
+
+    When only sources changed, just the targets they affect are built (see
+    ProjectInformation.affected_targets).
+
+    builder(project, commands, targets, cancel) runs one build; it is there so
+    that builds can be run some other way (with output consumers, or history).
+    targets is None to build everything.
+    '''
+    def __init__(self, project: ProjectInformation, watcher: typing.Optional[Watcher]=None,
+        debounce: float=0.2, max_delay: float=2.0, policy: MidBuildPolicy=MidBuildPolicy.CANCEL,
+        builder: typing.Callable[[ProjectInformation, ProjectCommands, typing.Optional[typing.List[str]], threading.Event],
+            ExecutionResult]=default_builder,
+        on_build: typing.Optional[typing.Callable[[ProjectCommands, ExecutionResult], None]]=None):
+        self.project = project
+        source = os.path.join(project.project_directory, project.source_directory)
+        self.watcher = watcher if watcher is not None else watch(source,
+            [project.build_directory, project.dist_directory])
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.policy = policy
+        self.builder = builder
+        self.on_build = on_build
+        self.builds = 0 #builds started
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._pending = ProjectCommands.NO_COMMAND
+        self._pending_files: typing.Set[str] = set()
+        self._thread: typing.Optional[threading.Thread] = None
+        self._cancel = threading.Event()
+
+    def run(self, initial: ProjectCommands=(ProjectCommands.CMAKE | ProjectCommands.MAKE)) -> None:
+        '''
+        Builds with initial, then keeps the build up to date until stop() is called.
+        '''
+        self._pending = initial
+        try:
+            while not self._stop.is_set():
+                changed = self._collect()
+                if len(changed) > 0:
+                    self._changed(changed)
+                self._start_pending()
+        finally:
+            self._cancel.set()
+            if self._thread is not None:
+                self._thread.join()
+            self.watcher.close()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _collect(self) -> typing.Set[str]:
+        changed = self.watcher.changes(timeout=0.1)
+        if len(changed) == 0:
+            return changed
+        deadline = time.monotonic() + self.max_delay
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            more = self.watcher.changes(timeout=min(self.debounce, max(0.0, deadline - time.monotonic())))
+            if len(more) == 0:
+                break
+            changed.update(more)
+        return changed
+
+    def _changed(self, changed: typing.Set[str]) -> None:
+        commands = commands_for(changed)
+        logger.info(f"{len(changed)} file(s) changed: " + ", ".join(sorted(changed)[:5])
+            + (", ..." if len(changed) > 5 else ""))
+        with self._lock:
+            self._pending |= commands
+            self._pending_files |= changed
+            building = self._thread is not None and self._thread.is_alive()
+        if building and self.policy == MidBuildPolicy.CANCEL:
+            logger.info("Cancelling the running build.")
+            self._cancel.set()
+
+    def _start_pending(self) -> None:
+        with self._lock:
+            if self._pending == ProjectCommands.NO_COMMAND or (self._thread is not None and self._thread.is_alive()):
+                return
+            commands, self._pending = self._pending, ProjectCommands.NO_COMMAND
+            files, self._pending_files = self._pending_files, set()
+            self._cancel = threading.Event()
+            self.builds += 1
+            self._thread = threading.Thread(target=self._build, args=(commands, files, self._cancel),
+                name="watch-build", daemon=True)
+            self._thread.start()
+
+    def _build(self, commands: ProjectCommands, files: typing.Set[str], cancel: threading.Event) -> None:
+        start = time.monotonic()
+        targets = None
+        if commands == ProjectCommands.MAKE and len(files) > 0:
+            targets = self.project.affected_targets(files)
+            if targets is not None:
+                logger.info("Building " + (", ".join(targets) if len(targets) > 0 else "nothing, no target is affected"))
+                if len(targets) == 0:
+                    return
+        try:
+            result = self.builder(self.project, commands, targets, cancel)
+        except Exception:
+            logger.exception("Build failed")
+            result = ExecutionResult()
+        if result is None: #a builder that reports nothing did not build anything we can vouch for
+            result = ExecutionResult()
+        if cancel.is_set() or result.cancelled:
+            with self._lock:
+                self._pending |= commands #what it was doing still has to be done
+                self._pending_files |= files
+            logger.info("Build cancelled.")
+        else:
+            logger.info(f"Build {'succeeded' if result.success else 'FAILED'} in {time.monotonic() - start:.2f}s")
+        if self.on_build is not None:
+            self.on_build(commands, result)